@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Move old dice rolls (and old local Sheets fallback records) to cold storage.
+
+Usage:
+    python archive_rolls.py --older-than-days 90 [--dry-run] [--vacuum]
+    python archive_rolls.py --before 2026-01-01
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from src.main import app
+from src.models.user import current_round_day, db
+from src.services.archive import archive_rolls, compact_sheets_fallback, roll_archive
+from src.services.google_sheets import sheets_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive old dice rolls into compressed monthly partitions')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--older-than-days', type=int, help='archive rounds older than this many days')
+    group.add_argument('--before', help='archive rounds before this date (YYYY-MM-DD)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--dry-run', action='store_true', help='only count what would be archived')
+    parser.add_argument('--vacuum', action='store_true', help='reclaim SQLite file space afterwards')
+    args = parser.parse_args()
+
+    # Rounds are UTC days; the local date can be a day ahead or behind
+    cutoff = date.fromisoformat(args.before) if args.before else current_round_day() - timedelta(days=args.older_than_days)
+
+    print("🗄️  DICE ROLL ARCHIVAL")
+    print("=" * 50)
+    print(f"Cutoff: rounds before {cutoff.isoformat()}")
+    print(f"Archive directory: {os.path.abspath(roll_archive.directory)}")
+
+    with app.app_context():
+        rolls = archive_rolls(cutoff, batch_size=args.batch_size, dry_run=args.dry_run)
+        records = compact_sheets_fallback(sheets_service, cutoff, dry_run=args.dry_run)
+        verb = 'Would archive' if args.dry_run else 'Archived'
+        print(f"✅ {verb} {rolls} dice rolls and {records} fallback Sheets records")
+
+        if args.vacuum and not args.dry_run and db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('VACUUM')
+                conn.exec_driver_sql('PRAGMA optimize')
+            print("✅ Database vacuumed")
+
+    stats = roll_archive.stats()
+    print(f"📦 Archive: {stats['partitions']} partitions, {stats['archived_rolls']} rolls, "
+          f"{stats['archived_sheets_records']} Sheets records, {stats['bytes']:,} bytes")
+
+
+if __name__ == '__main__':
+    main()
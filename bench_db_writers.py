@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer benchmark: default SQLite settings vs the tuned engine
+configuration from src/models/database.py.
+
+Each worker process runs roll-shaped transactions (a lookup followed by an
+insert and a commit) against a shared database file and counts successful
+commits and "database is locked" failures.
+
+Usage:
+    python bench_db_writers.py [--workers 4] [--transactions 500]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.models.database import engine_options, install_sqlite_pragmas
+
+
+def make_engine(uri: str, tuned: bool):
+    if not tuned:
+        return create_engine(uri)
+    engine = create_engine(uri, **engine_options(uri))
+    install_sqlite_pragmas(engine)
+    return engine
+
+
+def writer(uri: str, tuned: bool, worker_id: int, transactions: int, results):
+    engine = make_engine(uri, tuned)
+    committed = locked = 0
+    start = time.perf_counter()
+    for i in range(transactions):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text('SELECT COUNT(*) FROM rolls WHERE worker = :w'), {'w': worker_id}).scalar()
+                conn.execute(text('INSERT INTO rolls (worker, total) VALUES (:w, :t)'), {'w': worker_id, 't': i % 18})
+            committed += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put((committed, locked, time.perf_counter() - start))
+    engine.dispose()
+
+
+def run(label: str, tuned: bool, workers: int, transactions: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(uri, tuned)
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE rolls (id INTEGER PRIMARY KEY, worker INTEGER, total INTEGER)'))
+            conn.execute(text('CREATE INDEX ix_rolls_worker ON rolls (worker)'))
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=writer, args=(uri, tuned, i, transactions, results))
+            for i in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+    committed = sum(o[0] for o in outcomes)
+    locked = sum(o[1] for o in outcomes)
+    print(f"{label:<10} {committed:>10,} {locked:>8,} {elapsed:>9.2f}s {committed / elapsed:>12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent SQLite writer benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--transactions', type=int, default=500, help='transactions per worker')
+    args = parser.parse_args()
+
+    print(f"🗄️  CONCURRENT WRITERS: {args.workers} processes x {args.transactions} transactions")
+    print("=" * 56)
+    print(f"{'config':<10} {'committed':>10} {'locked':>8} {'elapsed':>10} {'commits/s':>12}")
+    run('default', False, args.workers, args.transactions)
+    run('tuned', True, args.workers, args.transactions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Shared leaderboard benchmark: top-10 and rank lookups as the number of
+players grows, on the in-process backend and over the Redis protocol.
+
+Without --redis-url the Redis-protocol side runs against fake_redis_server.py
+started in this process. Both backends must return the same top 10 and
+ranks; timings should grow with log(players), not players.
+
+Usage:
+    python bench_leaderboard.py [--sizes 1000,10000,100000] [--lookups 2000]
+    python bench_leaderboard.py --redis-url redis://127.0.0.1:6379/15
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_redis_server import FakeRedisServer
+from src.services.shared_state import SharedLeaderboard, create_backend, pack_score
+
+
+def load(leaderboard: SharedLeaderboard, players: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    commands = []
+    for i in range(players):
+        username = f"player{i}"
+        at = start + timedelta(seconds=rng.randint(0, 86400 * 30))
+        total = sum(rng.randint(1, 6) for _ in range(3))
+        commands += [
+            ('ZADD', leaderboard.scores_key, 'GT', pack_score(total, at), username),
+            ('HSET', leaderboard.rolls_key, username, 1),
+            ('HSET', leaderboard.updated_key, username, at.isoformat()),
+        ]
+        if len(commands) >= 3000:
+            leaderboard.backend.pipeline(commands)
+            commands = []
+    if commands:
+        leaderboard.backend.pipeline(commands)
+
+
+def time_lookups(leaderboard: SharedLeaderboard, players: int, lookups: int):
+    rng = random.Random(1)
+    names = [f"player{rng.randrange(players)}" for _ in range(lookups)]
+
+    start = time.perf_counter()
+    for _ in range(lookups):
+        leaderboard.top(10)
+    top_us = (time.perf_counter() - start) / lookups * 1e6
+
+    start = time.perf_counter()
+    for name in names:
+        leaderboard.rank(name)
+    rank_us = (time.perf_counter() - start) / lookups * 1e6
+    return top_us, rank_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared leaderboard benchmark')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated player counts')
+    parser.add_argument('--lookups', type=int, default=2000, help='top-10 and rank lookups per size')
+    parser.add_argument('--redis-url', help='Redis-protocol server to use (its data under bench: is replaced)')
+    args = parser.parse_args()
+
+    server = None
+    redis_url = args.redis_url
+    if not redis_url:
+        server = FakeRedisServer().start()
+        redis_url = server.url
+
+    print("🏆 SHARED LEADERBOARD BENCHMARK")
+    print("=" * 60)
+    print(f"Redis-protocol server: {redis_url}{' (fake_redis_server.py)' if server else ''}")
+    print(f"{'backend':<8} {'players':>9} {'load s':>8} {'top10 us':>9} {'rank us':>9}")
+
+    mismatches = 0
+    try:
+        for players in [int(size) for size in args.sizes.split(',')]:
+            results = {}
+            for label, url in (('memory', 'memory://'), ('redis', redis_url)):
+                leaderboard = SharedLeaderboard(create_backend(url), 'bench:')
+                leaderboard.clear()
+                start = time.perf_counter()
+                load(leaderboard, players)
+                load_seconds = time.perf_counter() - start
+                top_us, rank_us = time_lookups(leaderboard, players, args.lookups)
+                print(f"{label:<8} {players:>9,} {load_seconds:>8.2f} {top_us:>9.1f} {rank_us:>9.1f}")
+                sample = [f"player{i}" for i in range(0, players, max(1, players // 100))]
+                results[label] = (leaderboard.top(10), [leaderboard.rank(name) for name in sample])
+                leaderboard.clear()
+            if results['memory'] != results['redis']:
+                mismatches += 1
+                print(f"   ❌ backends disagree at {players:,} players")
+    finally:
+        if server:
+            server.stop()
+
+    print()
+    print("✅ Backends agree on top 10 and ranks" if not mismatches else "❌ Backends disagree")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Serving benchmark: Flask's development server (python app.py) vs gunicorn
+with gunicorn.conf.py.
+
+Each server is started on its own port against a throwaway database, then
+hammered by concurrent client threads on a few read endpoints. Reports
+requests/s and p50/p99 latency per endpoint.
+
+Usage:
+    python bench_serving.py [--clients 32] [--requests 2000] [--workers 4]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ['/health', '/api/rankings']
+
+
+def wait_until_up(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def start_server(kind: str, port: int, workers: int, tmp: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'{kind}.db')}",
+        IDEMPOTENCY_DB=os.path.join(tmp, f'{kind}-idempotency.db'),
+        RATE_LIMIT_ENABLED='false',
+        WEB_CONCURRENCY=str(workers),
+        LOG_REQUESTS='false',
+        PYTHONUNBUFFERED='1',
+    )
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.main:application']
+    else:
+        command = [sys.executable, 'app.py']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def timed_get(url: str):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, ConnectionError):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(kind: str, port: int, args, tmp: str):
+    server = start_server(kind, port, args.workers, tmp)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url)
+        for endpoint in ENDPOINTS:
+            url = base_url + endpoint
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                list(pool.map(timed_get, [url] * min(100, args.requests)))  # warm-up
+                start = time.perf_counter()
+                outcomes = list(pool.map(timed_get, [url] * args.requests))
+                elapsed = time.perf_counter() - start
+
+            latencies = [latency * 1000 for ok, latency in outcomes if ok]
+            errors = len(outcomes) - len(latencies)
+            if not latencies:
+                print(f"{kind:<10} {endpoint:<16} all {errors} requests failed")
+                continue
+            print(f"{kind:<10} {endpoint:<16} {len(latencies) / elapsed:>8,.0f} "
+                  f"{statistics.median(latencies):>8.1f} {percentile(latencies, 99):>8.1f} {errors:>7}")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=35)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dev server vs gunicorn benchmark')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per endpoint')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--port', type=int, default=5101)
+    args = parser.parse_args()
+
+    print(f"🚀 SERVING BENCHMARK: {args.clients} clients x {args.requests} requests per endpoint")
+    print("=" * 60)
+    print(f"{'server':<10} {'endpoint':<16} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run('dev', args.port, args, tmp)
+        run('gunicorn', args.port + 1, args, tmp)
+
+
+if __name__ == '__main__':
+    main()
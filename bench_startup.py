@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: import time of src.main (python -X importtime) and the
+time create_app() takes on a fresh and on an already migrated database.
+
+Each measurement runs in a new interpreter. Exits non-zero when the median
+import + warm create_app time exceeds the budget, so it can gate CI.
+
+Usage:
+    python bench_startup.py [--runs 5] [--budget-ms 800] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CREATE_APP_SNIPPET = '''
+import time
+import src.main
+start = time.perf_counter()
+src.main.create_app()
+print(time.perf_counter() - start)
+'''
+
+
+def child_env(database_path: str) -> dict:
+    return dict(os.environ, DATABASE_URL=f"sqlite:///{database_path}")
+
+
+def import_profile(env: dict):
+    """Run `import src.main` under -X importtime; returns {module: (self_us, cumulative_us)}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.main'],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def create_app_seconds(env: dict) -> float:
+    result = subprocess.run(
+        [sys.executable, '-c', CREATE_APP_SNIPPET],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 800)))
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = child_env(os.path.join(tmp, 'startup.db'))
+
+        # The first run also writes bytecode caches; it is not measured
+        import_profile(env)
+        cold_create = create_app_seconds(env) * 1000  # creates and migrates the schema
+
+        profiles = [import_profile(env) for _ in range(args.runs)]
+        warm_creates = [create_app_seconds(env) * 1000 for _ in range(args.runs)]
+
+    import_ms = statistics.median(p['src.main'][1] for p in profiles) / 1000
+    create_ms = statistics.median(warm_creates)
+    total_ms = import_ms + create_ms
+
+    print(f"⏱️  STARTUP PROFILE ({args.runs} runs, medians)")
+    print("=" * 50)
+    print(f"import src.main:              {import_ms:8.1f} ms")
+    print(f"create_app() fresh database:  {cold_create:8.1f} ms")
+    print(f"create_app() current schema:  {create_ms:8.1f} ms")
+    print(f"import + create_app:          {total_ms:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+
+    print(f"\n📦 Slowest imports (cumulative)")
+    print("-" * 50)
+    last = profiles[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[:args.top]:
+        print(f"{cumulative_us / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {name}")
+
+    if total_ms > args.budget_ms:
+        print(f"\n❌ Startup over budget by {total_ms - args.budget_ms:.1f} ms")
+        sys.exit(1)
+    print(f"\n✅ Startup within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Username cache benchmark: database reads per request for the player flow,
+with the username -> user id cache off and on.
+
+Runs the app in process against a throwaway SQLite database seeded with
+--players users. Every iteration a random player rolls and a random player
+checks their roll; a share of the checks are for names that do not exist.
+Both modes replay the same requests on the same data and must return the
+same statuses. Reports SELECTs per roll and per check, username lookups
+that reached the database, the cache hit rate and requests per second.
+
+Usage:
+    python bench_user_cache.py [--players 2000] [--iterations 3000] [--unknown 0.2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TMP = tempfile.mkdtemp(prefix='bench-user-cache-')
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+os.environ.setdefault('OUTBOX_DISPATCHER_ENABLED', 'false')
+os.environ.setdefault('SHEETS_FALLBACK_FILE', os.path.join(TMP, 'sheets_data.json'))
+os.environ.setdefault('IDEMPOTENCY_DB', os.path.join(TMP, 'idempotency.db'))
+os.environ.setdefault('USER_CACHE_GENERATION_FILE', os.path.join(TMP, 'user_cache.gen'))
+os.environ.setdefault('ROLL_FILTER_DIR', os.path.join(TMP, 'roll_filter'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from sqlalchemy import event, insert
+
+from src.main import create_app
+from src.models.database import get_read_engine
+from src.models.user import DiceRoll, Ranking, SheetsOutbox, User, db
+from src.services.metrics import metrics
+from src.services.roll_filter import roll_filter
+from src.services.user_cache import user_cache
+
+
+def cache_counts():
+    values = metrics.snapshot()
+    return (values.get('cache_hits_total', {}).get('["user"]', 0),
+            values.get('cache_misses_total', {}).get('["user"]', 0))
+
+
+def run(app, requests, cache_size: int):
+    """Replay requests; returns per-kind SELECT counts, statuses and timings"""
+    with app.app_context():
+        for model in (SheetsOutbox, Ranking, DiceRoll):
+            model.query.delete()
+        db.session.commit()
+    # Both modes start from no rolls, as the deleted rows above
+    roll_filter.reset()
+    user_cache.max_entries = cache_size
+    user_cache.clear()
+
+    current = {'kind': None}
+    selects = {'roll': 0, 'check': 0}
+    lookups = {'count': 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if current['kind'] and statement.lstrip().upper().startswith('SELECT'):
+            selects[current['kind']] += 1
+            if 'user.username =' in statement:
+                lookups['count'] += 1
+
+    with app.app_context():
+        engines = [db.engine, get_read_engine(app) or db.engine]
+    for engine in set(engines):
+        event.listen(engine, 'before_cursor_execute', count)
+
+    client = app.test_client()
+    hits_before, misses_before = cache_counts()
+    statuses = []
+    start = time.perf_counter()
+    try:
+        for kind, username in requests:
+            current['kind'] = kind
+            if kind == 'roll':
+                response = client.post('/api/dice/roll', json={'username': username})
+            else:
+                response = client.get(f'/api/dice/check/{username}')
+            statuses.append(response.status_code)
+    finally:
+        current['kind'] = None
+        for engine in set(engines):
+            event.remove(engine, 'before_cursor_execute', count)
+    elapsed = time.perf_counter() - start
+    hits_after, misses_after = cache_counts()
+    return selects, lookups['count'], hits_after - hits_before, misses_after - misses_before, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Username cache benchmark')
+    parser.add_argument('--players', type=int, default=2000, help='registered players')
+    parser.add_argument('--iterations', type=int, default=3000, help='roll + check pairs')
+    parser.add_argument('--unknown', type=float, default=0.2, help='share of checks for unknown names')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(TMP, 'bench.db')}"})
+    with app.app_context():
+        db.session.execute(insert(User), [{'username': f"player{i}"} for i in range(args.players)])
+        db.session.commit()
+
+    rng = random.Random(42)
+    # A small pool of unknown names: the page checks a newcomer more than once
+    unknown = [f"newcomer{i}" for i in range(max(1, args.players // 20))]
+    requests = []
+    for _ in range(args.iterations):
+        requests.append(('roll', f"player{rng.randrange(args.players)}"))
+        if rng.random() < args.unknown:
+            requests.append(('check', rng.choice(unknown)))
+        else:
+            requests.append(('check', f"player{rng.randrange(args.players)}"))
+    rolls = sum(1 for kind, _ in requests if kind == 'roll')
+    checks = len(requests) - rolls
+
+    print("👤 USERNAME CACHE BENCHMARK")
+    print("=" * 60)
+    print(f"{args.players:,} players, {rolls:,} rolls, {checks:,} checks ({args.unknown:.0%} for unknown names)")
+    print(f"{'cache':<6} {'selects/roll':>12} {'selects/check':>13} {'user lookups':>12} {'hit rate':>8} {'req/s':>8}")
+
+    results = {}
+    for label, size in (('off', 0), ('on', user_cache.max_entries or 10000)):
+        selects, lookups, hits, misses, statuses, elapsed = run(app, requests, size)
+        results[label] = (selects, lookups, statuses)
+        hit_rate = hits / (hits + misses) if hits + misses else 0.0
+        print(f"{label:<6} {selects['roll'] / rolls:>12.2f} {selects['check'] / checks:>13.2f} "
+              f"{lookups:>12,} {hit_rate:>8.1%} {len(requests) / elapsed:>8.0f}")
+
+    off, on = results['off'], results['on']
+    total_off = off[0]['roll'] + off[0]['check']
+    total_on = on[0]['roll'] + on[0]['check']
+    print()
+    print(f"SELECTs per roll: {off[0]['roll'] / rolls:.2f} -> {on[0]['roll'] / rolls:.2f}; "
+          f"all SELECTs: {total_off:,} -> {total_on:,} ({1 - total_on / total_off:.0%} fewer)")
+    if off[2] != on[2]:
+        print("❌ Responses differ with the cache on")
+        sys.exit(1)
+    print("✅ Same responses with and without the cache")
+
+
+if __name__ == '__main__':
+    main()
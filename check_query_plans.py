@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for the API routes.
+
+Builds a throwaway SQLite database at the latest schema, calls each route
+through the Flask test client, captures every SELECT it issues and runs
+EXPLAIN QUERY PLAN on it. Exits non-zero if a query does a full table scan
+or sorts through a temporary B-tree, unless the route is allow-listed below.
+
+Usage:
+    python check_query_plans.py [--verbose]
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+# Every route is called several times in a row
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+# Runtime files the routes write go to a scratch directory, not src/database
+# (read when the services are imported, so set before the app is)
+SCRATCH_DIR = tempfile.mkdtemp(prefix='query-plans-')
+os.environ.setdefault('ROLL_FILTER_DIR', os.path.join(SCRATCH_DIR, 'roll_filter'))
+os.environ.setdefault('USER_CACHE_GENERATION_FILE', os.path.join(SCRATCH_DIR, 'user_cache.gen'))
+os.environ.setdefault('IDEMPOTENCY_DB', os.path.join(SCRATCH_DIR, 'idempotency.db'))
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.main import create_app
+from src.models.user import db
+from src.models.database import get_read_engine
+from src.services.google_sheets import sheets_service
+
+# (method, path, json body) in an order that leaves data for the next call
+ROUTES = [
+    ('POST', '/api/users', {'username': 'plan_alice'}),
+    ('GET', '/api/users/by-username/plan_alice', None),
+    ('POST', '/api/dice/roll', {'username': 'plan_alice'}),
+    ('POST', '/api/dice/roll', {'username': 'plan_bob'}),
+    ('GET', '/api/dice/check/plan_alice', None),
+    ('GET', '/api/dice/check/nobody', None),
+    ('GET', '/api/dashboard?username=plan_alice', None),
+    ('GET', '/api/rankings', None),
+    ('GET', '/api/rankings?round=current', None),
+    ('GET', '/api/rankings/plan_alice', None),
+    ('GET', '/api/rankings/plan_bob', None),
+    ('GET', '/api/dice/history', None),
+    ('GET', '/api/dice/history?round=current', None),
+    ('GET', '/api/rounds', None),
+    ('GET', '/api/users', None),
+]
+
+# Routes whose full scans are inherent to what they return
+ALLOWED_SCANS = {
+    # Returns every user by design
+    '/api/users': {'user'},
+    # Aggregates every round; the scan covers the small round index only
+    '/api/rounds': {'dice_roll'},
+}
+
+BAD_PLAN = [
+    (re.compile(r'^SCAN (\w+)$'), 'full table scan'),
+    (re.compile(r'^SCAN (\w+) USING COVERING INDEX'), 'full index scan'),
+    (re.compile(r'^USE TEMP B-TREE FOR ORDER BY'), 'sort without index'),
+]
+
+
+def build_app(database_path: str) -> Flask:
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{database_path}",
+        'TESTING': True,
+    })
+
+
+def main():
+    verbose = '--verbose' in sys.argv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the Sheets fallback file out of the working tree
+        sheets_service.data_file = os.path.join(tmp, 'sheets_data.json')
+        app = build_app(os.path.join(tmp, 'plans.db'))
+        client = app.test_client()
+        failures = []
+
+        with app.app_context():
+            captured = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith('SELECT'):
+                    captured.append((statement, parameters))
+
+            # Read-only routes query through the separate read engine
+            for engine in filter(None, (db.engine, get_read_engine(app))):
+                event.listen(engine, 'before_cursor_execute', capture)
+
+            for method, path, body in ROUTES:
+                captured.clear()
+                response = client.open(path, method=method, json=body)
+                route = path.split('?')[0]
+                statements = list(captured)
+                print(f"{method} {path} -> {response.status_code}, {len(statements)} queries")
+
+                for statement, parameters in statements:
+                    with db.engine.connect() as conn:
+                        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                    details = [row[-1] for row in plan]
+                    if verbose:
+                        print(f"  {' '.join(statement.split())}")
+                        for detail in details:
+                            print(f"    {detail}")
+
+                    for detail in details:
+                        for pattern, problem in BAD_PLAN:
+                            match = pattern.match(detail)
+                            if not match:
+                                continue
+                            table = match.group(1) if match.groups() else None
+                            if table and table in ALLOWED_SCANS.get(route, set()):
+                                continue
+                            failures.append((f"{method} {path}", problem, detail, ' '.join(statement.split())))
+
+    print("=" * 60)
+    if failures:
+        for route, problem, detail, statement in failures:
+            print(f"❌ {route}: {problem}: {detail}\n   {statement}")
+        sys.exit(1)
+    print("✅ All route queries use indexes")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
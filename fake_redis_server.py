@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Local Redis-protocol server for the shared state backend.
+
+Serves src/services/shared_state.py's MemoryBackend over RESP, so several
+app processes (or containers on one host) can share a leaderboard, rate
+limits and caches without installing Redis. Supports the commands the app
+uses plus MULTI/EXEC; anything else answers with an error.
+
+Point the app at it with:
+
+    SHARED_STATE_URL=redis://127.0.0.1:6399/0
+
+Usage:
+    python fake_redis_server.py [--port 6399]
+"""
+
+import argparse
+import os
+import socketserver
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.shared_state import MemoryBackend, SharedStateError
+
+
+def encode_reply(reply) -> bytes:
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, SharedStateError):
+        return b'-' + str(reply).encode('utf-8') + b'\r\n'
+    if isinstance(reply, bool):
+        return b':%d\r\n' % int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode_reply(item) for item in reply)
+    if reply in ('OK', 'PONG', 'QUEUED'):
+        return b'+' + reply.encode('utf-8') + b'\r\n'
+    data = str(reply).encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    backend: MemoryBackend = None
+    # Pipelined replies are written one by one; don't let Nagle hold them back
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command, as typed into telnet
+            return line.decode('utf-8').split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+        return args
+
+    def run(self, args):
+        try:
+            return self.backend.execute(*args)
+        except SharedStateError as e:
+            return e
+
+    def handle(self):
+        queued = None
+        while True:
+            try:
+                args = self.read_command()
+            except (ValueError, ConnectionError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            name = args[0].lower()
+
+            if name == 'multi':
+                queued = []
+                reply = 'OK'
+            elif name == 'exec':
+                if queued is None:
+                    reply = SharedStateError('ERR EXEC without MULTI')
+                else:
+                    with self.backend.lock:
+                        reply = [self.run(command) for command in queued]
+                    queued = None
+            elif name == 'discard':
+                queued = None
+                reply = 'OK'
+            elif name == 'quit':
+                self.wfile.write(encode_reply('OK'))
+                return
+            elif name in ('auth', 'client', 'hello'):
+                reply = 'OK'
+            elif queued is not None:
+                queued.append(args)
+                reply = 'QUEUED'
+            else:
+                reply = self.run(args)
+
+            try:
+                self.wfile.write(encode_reply(reply))
+            except ConnectionError:
+                return
+
+
+class FakeRedisServer:
+    """Runs the server on a background thread (port 0 picks a free port)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, backend: MemoryBackend = None):
+        self.backend = backend or MemoryBackend()
+        handler = type('Handler', (RESPHandler,), {'backend': self.backend})
+        self.server = socketserver.ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> 'FakeRedisServer':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-redis', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Redis-protocol server for shared state')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6399)
+    args = parser.parse_args()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = FakeRedisServer(args.host, args.port)
+
+    print("🧮 FAKE REDIS SERVER")
+    print("=" * 50)
+    print(f"Listening on {server.url}")
+    print(f"Point the app at it with SHARED_STATE_URL={server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()
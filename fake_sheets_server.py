@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the Google Sheets API the game uses.
+
+Serves an in-memory sheet through:
+
+    GET  /v4/spreadsheets/<id>/values/<range>           values().get
+    POST /v4/spreadsheets/<id>/values/<range>:append    values().append
+    GET  /spreadsheets/d/<id>/export?format=csv         public CSV export
+    GET  /$discovery/rest?version=v4                    discovery document (needs
+                                                        google-api-python-client installed)
+
+with configurable latency, random 500s, a per-minute request quota answered
+with 429 RESOURCE_EXHAUSTED, and a row limit. Control endpoints:
+
+    GET  /_fake/stats     request counts by operation and outcome
+    POST /_fake/config    change any option at runtime (JSON body)
+    POST /_fake/reset     empty the sheet and the counters
+
+Point the app at it with:
+
+    SHEETS_API_ENDPOINT=http://127.0.0.1:8099
+
+Usage:
+    python fake_sheets_server.py [--port 8099] [--latency-ms 50] [--jitter-ms 20]
+        [--error-rate 0.01] [--quota-per-minute 60] [--max-rows 10000] [--seed-rows 100]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+HEADER_ROW = ['timestamp', 'username', 'dice1', 'dice2', 'dice3', 'total_score', 'date', 'time']
+
+VALUES_PATH = re.compile(r'^/v4/spreadsheets/([^/]+)/values/([^/]+?)(:append)?$')
+EXPORT_PATH = re.compile(r'^/spreadsheets/d/([^/]+)/export$')
+A1_ROWS = re.compile(r'^(?:[^!]+!)?[A-Z]+(\d*)(?::[A-Z]+(\d*))?$')
+
+
+class FakeSheet:
+    """In-memory sheet plus the fault-injection knobs"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0,
+                 quota_per_minute: int = 0, max_rows: int = 0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.max_rows = max_rows
+        self.fail_next = 0
+        self.random = random.Random(seed)
+        self.rows = [list(HEADER_ROW)]
+        self.stats = {}
+        self._requests = deque()
+        self._lock = threading.Lock()
+
+    def configure(self, **options):
+        with self._lock:
+            for key, value in options.items():
+                if key == 'seed':
+                    self.random = random.Random(value)
+                elif hasattr(self, key) and not key.startswith('_') and key not in ('rows', 'stats'):
+                    setattr(self, key, value)
+                else:
+                    raise ValueError(f"Unknown option: {key}")
+
+    def reset(self):
+        with self._lock:
+            self.rows = [list(HEADER_ROW)]
+            self.stats = {}
+            self._requests.clear()
+
+    def seed_rows(self, count: int):
+        with self._lock:
+            for i in range(count):
+                dice = [self.random.randint(1, 6) for _ in range(3)]
+                self.rows.append([f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}", f"seed_{i}",
+                                  *map(str, dice), str(sum(dice)), '2026-01-01', '00:00:00'])
+
+    def _count(self, operation: str, outcome: str):
+        key = f"{operation}:{outcome}"
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def admit(self, operation: str):
+        """Apply latency and faults; returns (status, error_body) or None to proceed"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            now = time.monotonic()
+            if self.quota_per_minute:
+                while self._requests and self._requests[0] <= now - 60:
+                    self._requests.popleft()
+                if len(self._requests) >= self.quota_per_minute:
+                    self._count(operation, 'quota')
+                    kind = 'Write' if operation == 'append' else 'Read'
+                    return 429, google_error(
+                        429, 'RESOURCE_EXHAUSTED',
+                        f"Quota exceeded for quota metric '{kind} requests' and limit '{kind} requests per minute per user'")
+                self._requests.append(now)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                failed = True
+            else:
+                failed = self.error_rate > 0 and self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            with self._lock:
+                self._count(operation, 'error')
+            return 500, google_error(500, 'INTERNAL', 'Internal error encountered.')
+        return None
+
+    def get_values(self, range_name: str):
+        first, last = row_bounds(range_name)
+        with self._lock:
+            self._count('get', 'success')
+            values = self.rows[first - 1:last] if last else self.rows[first - 1:]
+            return [list(row) for row in values]
+
+    def append(self, values):
+        with self._lock:
+            if self.max_rows and len(self.rows) + len(values) > self.max_rows:
+                self._count('append', 'row_limit')
+                return None
+            start = len(self.rows) + 1
+            self.rows.extend([str(cell) for cell in row] for row in values)
+            self._count('append', 'success')
+            return start
+
+    def export_csv(self) -> str:
+        with self._lock:
+            self._count('csv_export', 'success')
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='\n').writerows(self.rows)
+            return buffer.getvalue()
+
+
+def google_error(code: int, status: str, message: str) -> dict:
+    return {'error': {'code': code, 'message': message, 'status': status}}
+
+
+def row_bounds(range_name: str):
+    """1-based (first_row, last_row or None) of an A1 range such as 'Sheet1!A1:H1000' or 'A:H'"""
+    match = A1_ROWS.match(range_name)
+    if not match:
+        return 1, None
+    first = int(match.group(1)) if match.group(1) else 1
+    last = int(match.group(2)) if match.group(2) else None
+    return first, last
+
+
+def discovery_document(base_url: str):
+    """The Sheets v4 discovery document bundled with google-api-python-client, rooted at base_url"""
+    try:
+        import googleapiclient
+    except ImportError:
+        return None
+    path = os.path.join(os.path.dirname(googleapiclient.__file__), 'discovery_cache', 'documents', 'sheets.v4.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        document = json.load(f)
+    document['rootUrl'] = base_url + '/'
+    document['baseUrl'] = base_url + '/'
+    return document
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    sheet: FakeSheet = None
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status: int, body, content_type: str = 'application/json'):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+
+        if path == '/_fake/stats':
+            return self._send(200, {'rows': len(self.sheet.rows), 'requests': self.sheet.stats})
+        if path == '/$discovery/rest':
+            document = discovery_document(f"http://{self.headers.get('Host')}")
+            if document is None:
+                return self._send(404, google_error(404, 'NOT_FOUND', 'google-api-python-client is not installed'))
+            return self._send(200, document)
+
+        match = EXPORT_PATH.match(path)
+        if match:
+            rejected = self.sheet.admit('csv_export')
+            if rejected:
+                return self._send(rejected[0], rejected[1])
+            return self._send(200, self.sheet.export_csv(), 'text/csv')
+
+        match = VALUES_PATH.match(path)
+        if match and not match.group(3):
+            rejected = self.sheet.admit('get')
+            if rejected:
+                return self._send(rejected[0], rejected[1])
+            range_name = match.group(2)
+            return self._send(200, {'range': range_name, 'majorDimension': 'ROWS',
+                                    'values': self.sheet.get_values(range_name)})
+
+        self._send(404, google_error(404, 'NOT_FOUND', f"Unknown path {path}"))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        # Read the body even when the request is rejected, or it would be taken
+        # for the next request on this keep-alive connection
+        try:
+            body = self._body()
+        except ValueError:
+            return self._send(400, google_error(400, 'INVALID_ARGUMENT', 'Invalid JSON payload'))
+
+        if path == '/_fake/reset':
+            self.sheet.reset()
+            return self._send(200, {'reset': True})
+        if path == '/_fake/config':
+            try:
+                self.sheet.configure(**body)
+            except (ValueError, TypeError) as e:
+                return self._send(400, {'error': str(e)})
+            return self._send(200, {'configured': True})
+
+        match = VALUES_PATH.match(path)
+        if match and match.group(3):
+            rejected = self.sheet.admit('append')
+            if rejected:
+                return self._send(rejected[0], rejected[1])
+            query = parse_qs(url.query)
+            if query.get('valueInputOption', [''])[0] not in ('RAW', 'USER_ENTERED'):
+                return self._send(400, google_error(400, 'INVALID_ARGUMENT', "'valueInputOption' is required"))
+            values = body.get('values', [])
+            start = self.sheet.append(values)
+            if start is None:
+                return self._send(400, google_error(
+                    400, 'INVALID_ARGUMENT',
+                    f"This action would increase the number of rows above the limit of {self.sheet.max_rows}"))
+            spreadsheet_id, range_name = match.group(1), match.group(2)
+            sheet_name = range_name.split('!')[0] if '!' in range_name else 'Sheet1'
+            end = start + len(values) - 1
+            return self._send(200, {
+                'spreadsheetId': spreadsheet_id,
+                'tableRange': f"{sheet_name}!A1:H{start - 1}",
+                'updates': {
+                    'spreadsheetId': spreadsheet_id,
+                    'updatedRange': f"{sheet_name}!A{start}:H{end}",
+                    'updatedRows': len(values),
+                    'updatedColumns': max((len(row) for row in values), default=0),
+                    'updatedCells': sum(len(row) for row in values),
+                },
+            })
+
+        self._send(404, google_error(404, 'NOT_FOUND', f"Unknown path {path}"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSheetsServer:
+    """Runs the fake API on a background thread (port 0 picks a free port)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, sheet: FakeSheet = None):
+        self.sheet = sheet or FakeSheet()
+        handler = type('Handler', (FakeSheetsHandler,), {'sheet': self.sheet})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeSheetsServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-sheets', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Google Sheets API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--quota-per-minute', type=int, default=0, help='requests per minute before 429 (0 = unlimited)')
+    parser.add_argument('--max-rows', type=int, default=0, help='row limit for appends (0 = unlimited)')
+    parser.add_argument('--seed-rows', type=int, default=0, help='rows to pre-fill the sheet with')
+    parser.add_argument('--seed', type=int, help='random seed for latency jitter and faults')
+    args = parser.parse_args()
+
+    sheet = FakeSheet(args.latency_ms, args.jitter_ms, args.error_rate, args.quota_per_minute,
+                      args.max_rows, args.seed)
+    sheet.seed_rows(args.seed_rows)
+    server = FakeSheetsServer(args.host, args.port, sheet)
+
+    print("📊 FAKE GOOGLE SHEETS API")
+    print("=" * 50)
+    print(f"Listening on {server.url}")
+    print(f"Point the app at it with SHEETS_API_ENDPOINT={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c gunicorn.conf.py src.main:application
+
+Every setting can be overridden through the environment variables below.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# Requests mostly wait on SQLite and the Sheets API, so use threaded workers:
+# a couple of processes per core, each with a small thread pool
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * cpu_count + 1, 9)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app once in the master; workers are forked from it
+preload_app = True
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Workers write metric snapshots here and /metrics merges them; the
+# directory is emptied when the master starts
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'dice-game-metrics'))
+
+# The app logs every request as JSON (LOG_REQUESTS); gunicorn's own access log is off by default
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # Re-create DB pools, the Sheets client and other fork-unsafe state
+    from src.services import lifecycle
+    lifecycle.run_fork_hooks()
+
+
+def worker_exit(server, worker):
+    # Drain background queues before the worker process exits
+    from src.services import lifecycle
+    lifecycle.run_shutdown_hooks()
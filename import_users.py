@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Pre-register players from a CSV or JSON lines file (or stdin).
+
+CSV files use their 'username' column, or the first column when there is
+no header naming one. JSON lines hold a string or an object with a
+'username' key per line. Usernames that already exist or repeat are
+skipped.
+
+Usage:
+    python import_users.py players.csv
+    python import_users.py players.jsonl [--batch-size 1000]
+    cat players.csv | python import_users.py - --format csv
+    python import_users.py --generate 100000 --prefix event_   (load test data)
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from src.main import app
+from src.services.user_import import FORMATS, detect_format, import_usernames, iter_usernames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import users from CSV or JSON lines')
+    parser.add_argument('path', nargs='?', help="input file, or '-' for stdin")
+    parser.add_argument('--format', choices=FORMATS, help='input format (default: from the file extension)')
+    parser.add_argument('--batch-size', type=int, help='usernames per INSERT batch and commit')
+    parser.add_argument('--generate', type=int, metavar='N', help='import N generated usernames instead of a file')
+    parser.add_argument('--prefix', default='player_', help='prefix of generated usernames')
+    args = parser.parse_args()
+
+    if args.generate:
+        usernames = (f"{args.prefix}{i}" for i in range(args.generate))
+        source = f"{args.generate:,} generated usernames"
+    elif args.path:
+        fmt = args.format or detect_format(args.path)
+        if not fmt:
+            parser.error('cannot tell the format from the file name; pass --format')
+        if args.path == '-':
+            lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        else:
+            lines = open(args.path, encoding='utf-8', newline='')
+        usernames = iter_usernames(lines, fmt)
+        source = f"{args.path} ({fmt})"
+    else:
+        parser.error('give an input file, or --generate N')
+
+    print("👥 BULK USER IMPORT")
+    print("=" * 60)
+    print(f"Source: {source}")
+
+    start = time.perf_counter()
+    with app.app_context():
+        counts = import_usernames(usernames, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    total = counts['created'] + counts['skipped'] + counts['invalid']
+    print(f"✅ {counts['created']:,} created, {counts['skipped']:,} skipped, {counts['invalid']:,} invalid")
+    print(f"⏱️  {total:,} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the player flow described by a scenario file.
+
+N simulated players (asyncio tasks, one keep-alive connection each) run the
+scenario's steps in a loop for the configured duration. By default the app
+is started locally under gunicorn against a throwaway database, with the
+Sheets API pointed at fake_sheets_server.py so nothing leaves the machine.
+Reports requests/s, latency percentiles and error rates per step and saves
+them as JSON; --compare prints the change against an earlier run.
+
+Usage:
+    python loadtest.py [--scenario loadtest_scenario.json] [--players 50] [--duration 30]
+    python loadtest.py --url http://localhost:5001        # against a running server
+    python loadtest.py --output run2.json --compare run1.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from fake_sheets_server import FakeSheet, FakeSheetsServer
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 90, 95, 99)
+
+
+class HTTPConnection:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b'', headers: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await self.reader.read()
+            await self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+def fill(template, username: str):
+    """Substitute {username} in strings nested anywhere in a step definition"""
+    if isinstance(template, str):
+        return template.replace('{username}', username)
+    if isinstance(template, dict):
+        return {key: fill(value, username) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, username) for value in template]
+    return template
+
+
+async def player(player_id: int, scenario: dict, host: str, port: int, deadline: float,
+                 start_delay: float, samples: dict, run_id: str):
+    await asyncio.sleep(start_delay)
+    connection = HTTPConnection(host, port)
+    think_low, think_high = scenario.get('think_time_ms', [0, 0])
+    iteration = 0
+    try:
+        while time.monotonic() < deadline:
+            suffix = f"_{iteration}" if scenario.get('new_player_each_iteration') else ''
+            username = f"lt{run_id}_{player_id}{suffix}"
+            for step in scenario['steps']:
+                if time.monotonic() >= deadline:
+                    break
+                step_def = fill(step, username)
+                body = json.dumps(step_def['json']).encode('utf-8') if 'json' in step_def else b''
+                headers = {'Content-Type': 'application/json'} if body else {}
+                if step_def.get('idempotency_key'):
+                    headers['Idempotency-Key'] = uuid.uuid4().hex
+
+                start = time.perf_counter()
+                try:
+                    status, _ = await connection.request(step_def['method'], step_def['path'], body, headers)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+                    status = 0
+                    await connection.close()
+                elapsed = time.perf_counter() - start
+                ok = status in step_def.get('expect', [200])
+                samples[step['name']].append((elapsed, ok, status))
+
+                if think_high:
+                    await asyncio.sleep(random.uniform(think_low, think_high) / 1000)
+            iteration += 1
+    finally:
+        await connection.close()
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name, entries in samples.items():
+        latencies = sorted(e[0] * 1000 for e in entries)
+        errors = sum(1 for e in entries if not e[1])
+        statuses = {}
+        for _, _, status in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[name] = {
+            'requests': len(entries),
+            'rps': round(len(entries) / elapsed, 2),
+            'errors': errors,
+            'error_rate': round(errors / len(entries), 4) if entries else 0.0,
+            'statuses': statuses,
+            'latency_ms': dict(
+                {f"p{p}": round(percentile(latencies, p), 2) for p in PERCENTILES},
+                mean=round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                max=round(latencies[-1], 2) if latencies else 0.0,
+            ),
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    total_errors = sum(e['errors'] for e in endpoints.values())
+    return {
+        'total': {
+            'requests': total,
+            'rps': round(total / elapsed, 2),
+            'errors': total_errors,
+            'error_rate': round(total_errors / total, 4) if total else 0.0,
+        },
+        'endpoints': endpoints,
+    }
+
+
+async def run_scenario(scenario: dict, base_url: str) -> dict:
+    parts = urlsplit(base_url)
+    samples = {step['name']: [] for step in scenario['steps']}
+    players = scenario['players']
+    ramp_up = scenario.get('ramp_up_seconds', 0)
+    run_id = uuid.uuid4().hex[:6]
+
+    start = time.monotonic()
+    deadline = start + ramp_up + scenario['duration_seconds']
+    await asyncio.gather(*(
+        player(i, scenario, parts.hostname, parts.port or 80, deadline, ramp_up * i / players, samples, run_id)
+        for i in range(players)
+    ))
+    return summarize(samples, time.monotonic() - start)
+
+
+def start_app(port: int, workers: int, tmp: str, sheets_endpoint: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'loadtest.db')}",
+        IDEMPOTENCY_DB=os.path.join(tmp, 'idempotency.db'),
+        SHEETS_FALLBACK_FILE=os.path.join(tmp, 'sheets_data.json'),
+        SHEETS_API_ENDPOINT=sheets_endpoint,
+        METRICS_DIR=os.path.join(tmp, 'metrics'),
+        RATE_LIMIT_ENABLED='false',
+        LOG_REQUESTS='false',
+        LOG_LEVEL='WARNING',
+    )
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.main:application']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return process
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('App did not start')
+
+
+def print_report(results: dict, previous: dict = None):
+    print(f"{'endpoint':<12} {'requests':>9} {'rps':>8} {'errors':>7} "
+          + ' '.join(f"{'p' + str(p):>8}" for p in PERCENTILES))
+    for name, stats in results['endpoints'].items():
+        latency = stats['latency_ms']
+        print(f"{name:<12} {stats['requests']:>9,} {stats['rps']:>8.1f} {stats['error_rate']:>7.1%} "
+              + ' '.join(f"{latency['p' + str(p)]:>8.1f}" for p in PERCENTILES))
+        if previous and name in previous.get('endpoints', {}):
+            old = previous['endpoints'][name]
+            print(f"{'  vs prev':<12} {'':>9} {stats['rps'] - old['rps']:>+8.1f} "
+                  f"{stats['error_rate'] - old['error_rate']:>+7.1%} "
+                  + ' '.join(f"{latency['p' + str(p)] - old['latency_ms']['p' + str(p)]:>+8.1f}" for p in PERCENTILES))
+    total = results['total']
+    print("-" * 60)
+    print(f"{'total':<12} {total['requests']:>9,} {total['rps']:>8.1f} {total['error_rate']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test')
+    parser.add_argument('--scenario', default=os.path.join(ROOT, 'loadtest_scenario.json'))
+    parser.add_argument('--players', type=int, help='override the scenario player count')
+    parser.add_argument('--duration', type=float, help='override the scenario duration (seconds)')
+    parser.add_argument('--url', help='target a running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers for the local app')
+    parser.add_argument('--port', type=int, default=5201)
+    parser.add_argument('--sheet-rows', type=int, default=500, help='rows pre-filled in the fake Sheets API')
+    parser.add_argument('--sheets-latency-ms', type=float, default=0, help='latency of the fake Sheets API')
+    parser.add_argument('--sheets-error-rate', type=float, default=0.0, help='fraction of fake Sheets calls that fail')
+    parser.add_argument('--sheets-quota', type=int, default=0, help='fake Sheets requests per minute before 429')
+    parser.add_argument('--output', help='results file (default loadtest-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+    if args.players:
+        scenario['players'] = args.players
+    if args.duration:
+        scenario['duration_seconds'] = args.duration
+
+    print(f"🎲 LOAD TEST: {scenario['name']} - {scenario['players']} players for {scenario['duration_seconds']}s")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        stand_in = None
+        base_url = args.url
+        if not base_url:
+            sheet = FakeSheet(latency_ms=args.sheets_latency_ms, error_rate=args.sheets_error_rate,
+                              quota_per_minute=args.sheets_quota, seed=0)
+            sheet.seed_rows(args.sheet_rows)
+            stand_in = FakeSheetsServer(sheet=sheet).start()
+            server = start_app(args.port, args.workers, tmp, stand_in.url)
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            results = asyncio.run(run_scenario(scenario, base_url))
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=35)
+            if stand_in:
+                print(f"Fake Sheets API requests: {stand_in.sheet.stats}")
+                stand_in.stop()
+
+    results = {
+        'scenario': scenario,
+        'target': args.url or 'local gunicorn',
+        'workers': None if args.url else args.workers,
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        **results,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    output = args.output or f"loadtest-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
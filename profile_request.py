@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Profile a single request against a running server and fetch the result.
+
+Signs the request with PROFILE_SECRET (the server must have the same
+secret), sends it with the X-Profile header, then lists or downloads the
+stored collapsed-stack profiles through the admin endpoints.
+
+Usage:
+    PROFILE_SECRET=... python profile_request.py GET /api/sheets/history
+    PROFILE_SECRET=... python profile_request.py --list
+    PROFILE_SECRET=... python profile_request.py --download <name> [-o out.folded]
+    PROFILE_SECRET=... python profile_request.py --header GET /api/reset/confirm
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.request
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from src.services.profiling import profile_header
+
+
+def call(base_url: str, method: str, path: str, headers: dict) -> bytes:
+    request = urllib.request.Request(base_url + path, method=method, headers=headers)
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request and fetch per-request profiles')
+    parser.add_argument('method', nargs='?', help='HTTP method of the request to profile')
+    parser.add_argument('path', nargs='?', help='path of the request to profile, e.g. /api/rankings')
+    parser.add_argument('--url', default=os.environ.get('APP_URL', 'http://localhost:5001'))
+    parser.add_argument('--header', action='store_true', help='only print the X-Profile header value')
+    parser.add_argument('--list', action='store_true', help='list stored profiles')
+    parser.add_argument('--download', metavar='NAME', help='download a stored profile')
+    parser.add_argument('-o', '--output', help='file for --download (default: stdout)')
+    args = parser.parse_args()
+
+    secret = os.environ.get('PROFILE_SECRET')
+    if not secret:
+        print("❌ PROFILE_SECRET is not set")
+        sys.exit(1)
+    admin_headers = {'X-Profile-Token': secret}
+
+    if args.list:
+        profiles = json.loads(call(args.url, 'GET', '/api/admin/profiles', admin_headers))['profiles']
+        print(f"📊 STORED PROFILES ({len(profiles)})")
+        print("=" * 50)
+        for profile in profiles:
+            print(f"{profile['created_at']}  {profile['method']:<6} {profile['route']:<30} "
+                  f"{profile['duration_ms']:>7} ms  {profile['name']}")
+        return
+
+    if args.download:
+        data = call(args.url, 'GET', f"/api/admin/profiles/{args.download}", admin_headers)
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(data)
+            print(f"✅ Saved {args.output} (render with flamegraph.pl or speedscope)")
+        else:
+            sys.stdout.write(data.decode('utf-8'))
+        return
+
+    if not (args.method and args.path):
+        parser.error('method and path are required unless --list or --download is given')
+
+    header = profile_header(secret, args.method, args.path.split('?')[0])
+    if args.header:
+        print(header)
+        return
+
+    call(args.url, args.method.upper(), args.path, {'X-Profile': header})
+    latest = json.loads(call(args.url, 'GET', '/api/admin/profiles', admin_headers))['profiles']
+    if latest:
+        print(f"✅ Profiled {args.method.upper()} {args.path}: {latest[0]['name']} ({latest[0]['duration_ms']} ms)")
+    else:
+        print("⚠️  Request sent, but no profile was stored (is PROFILE_SECRET set on the server?)")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,51 +3,106 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, Response, send_from_directory
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.user import db
+from src.models.migrations import LATEST_VERSION, current_version, run_migrations
+from src.models.database import configure_database
 from src.routes.user import user_bp
+from src.services.metrics import metrics
+from src.services.profiling import install_profiler
+from src.services.sheets_outbox import outbox_dispatcher
+from src.services.structured_logging import configure_logging, init_request_logging
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
-app.register_blueprint(user_bp, url_prefix='/api')
+def create_app(config=None):
+    """
+    Build the Flask app.
 
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+    Nothing connects to external services here: the Google Sheets client is
+    created on first use, and the schema is only created or migrated when the
+    database is behind the latest migration.
 
-@app.route('/health')
-def health_check():
-    """Health check endpoint for deployment platforms"""
-    return {'status': 'healthy', 'message': 'Dice Rolling Game is running!', 'version': '1.2'}, 200
+    Args:
+        config: Optional mapping applied over the defaults, e.g.
+            {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True}
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', 'true').lower() != 'false'
+    if config:
+        app.config.update(config)
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    # Render, Railway and Heroku put one proxy in front of the app; trust only
+    # the X-Forwarded-For entries those proxies add (0 when serving directly)
+    proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+    if proxy_hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+
+    if not app.testing:
+        configure_logging()
+    init_request_logging(app)
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+
+    # Database: DATABASE_URL or the local SQLite file (see src/models/database.py)
+    configure_database(app, db)
+    if app.config['AUTO_MIGRATE']:
+        with app.app_context():
+            # One cheap query on warm starts instead of inspecting every table
+            if current_version(db.engine) < LATEST_VERSION:
+                db.create_all()
+                run_migrations(db.engine)
+
+    register_routes(app)
+    install_profiler(app)
+    outbox_dispatcher.init_app(app)
+    return app
+
+
+def register_routes(app):
+    @app.route('/health')
+    def health_check():
+        """Health check endpoint for deployment platforms"""
+        return {'status': 'healthy', 'message': 'Dice Rolling Game is running!', 'version': '1.2'}, 200
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Prometheus scrape endpoint, aggregated over all workers"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
 
 
-# For deployment compatibility
-import os
-port = int(os.environ.get('PORT', 5001))
-debug = os.environ.get('FLASK_ENV') != 'production'
+_app = None
+
+
+def __getattr__(name):
+    # `app` / `application` are built on first access, not at import time,
+    # so importing this module (or create_app) stays cheap
+    global _app
+    if name in ('app', 'application'):
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=port, debug=debug)
-else:
-    # For WSGI servers (like Gunicorn)
-    application = app
+    port = int(os.environ.get('PORT', 5001))
+    debug = os.environ.get('FLASK_ENV') != 'production'
+    create_app().run(host='0.0.0.0', port=port, debug=debug)
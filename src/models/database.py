@@ -0,0 +1,182 @@
+"""
+Database configuration: connection URL, engine pool sizing and SQLite tuning.
+
+DATABASE_URL selects the database (any SQLAlchemy URL, e.g. a local
+PostgreSQL); without it the app uses the SQLite file in src/database. SQLite
+connections are switched to WAL with synchronous=NORMAL and a busy timeout,
+so readers never block the writer and concurrent writers wait instead of
+failing with "database is locked".
+
+Routes decorated with @read_only run their queries on a separate read-only
+engine: a mode=ro URI connection to the same SQLite file, or the replica
+named by DATABASE_REPLICA_URL on other backends. Writes always go to the
+primary engine.
+"""
+
+import os
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from src.services import lifecycle
+from src.services.metrics import instrument_engine
+
+READ_ENGINE_KEY = 'sqlalchemy_read_engine'
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'app.db')
+
+# PRAGMAs applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536)),  # negative = KiB
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
+# Read-only connections cannot change the journal mode or durability settings
+READ_ONLY_PRAGMAS = dict(
+    {k: v for k, v in SQLITE_PRAGMAS.items() if k not in ('journal_mode', 'synchronous')},
+    query_only='ON',
+)
+
+
+def database_uri() -> str:
+    url = os.environ.get('DATABASE_URL')
+    if url:
+        # Heroku-style URLs use the scheme SQLAlchemy 1.4+ no longer accepts
+        if url.startswith('postgres://'):
+            url = 'postgresql://' + url[len('postgres://'):]
+        return url
+
+    path = os.path.abspath(DEFAULT_SQLITE_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return f"sqlite:///{path}"
+
+
+def is_memory_sqlite(uri: str) -> bool:
+    """
+    In-memory SQLite ('sqlite://' or 'sqlite:///:memory:'), which
+    Flask-SQLAlchemy serves from one shared connection through a StaticPool
+    """
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri: str) -> dict:
+    """Engine/pool options sized for one worker process"""
+    options = {}
+    if not is_memory_sqlite(uri):
+        # One connection per request thread plus headroom for background threads;
+        # a StaticPool has a single connection and rejects these
+        pool_size = int(os.environ.get('DB_POOL_SIZE', int(os.environ.get('GUNICORN_THREADS', 4)) + 1))
+        options.update({
+            'pool_size': pool_size,
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        })
+    if uri.startswith('sqlite'):
+        # The Python-level wait for the file lock; busy_timeout covers the C level
+        options['connect_args'] = {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    return options
+
+
+def read_only_uri(uri: str):
+    """URL for read-only connections, or None when reads should use the primary"""
+    replica = os.environ.get('DATABASE_REPLICA_URL')
+    if replica:
+        return replica
+    if uri.startswith('sqlite:///') and not is_memory_sqlite(uri):
+        path = uri[len('sqlite:///'):].split('?')[0]
+        return f"sqlite:///file:{path}?mode=ro&uri=true"
+    return None
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """Apply SQLITE_PRAGMAS (or the given ones) to every connection the engine opens"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = pragmas or SQLITE_PRAGMAS
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+
+
+class RoutingSession(Session):
+    """Session that sends queries from @read_only routes to the read engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_read_only'):
+            engine = current_app.extensions.get(READ_ENGINE_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Run a view's queries on the read-only engine"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def begin_snapshot(session):
+    """
+    Make the rest of the request's queries read one consistent snapshot.
+    pysqlite only opens a transaction before writes and PostgreSQL defaults
+    to READ COMMITTED, so otherwise every SELECT sees the latest commit.
+    Call before the request's first query.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite':
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN')
+    elif connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+
+def get_read_engine(app=None):
+    app = app or current_app
+    return app.extensions.get(READ_ENGINE_KEY)
+
+
+def configure_database(app, db):
+    """Point the app at its database and initialise Flask-SQLAlchemy"""
+    uri = app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_uri())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        # Registered before the pool opens its first connection
+        install_sqlite_pragmas(db.engine)
+
+        engines = [db.engine]
+
+    read_uri = read_only_uri(uri)
+    if read_uri and app.config.get('DATABASE_READ_ROUTING', True):
+        read_engine = create_engine(read_uri, **engine_options(read_uri))
+        install_sqlite_pragmas(read_engine, READ_ONLY_PRAGMAS)
+        app.extensions[READ_ENGINE_KEY] = read_engine
+        engines.append(read_engine)
+
+    for engine in engines:
+        instrument_engine(engine)
+
+    @lifecycle.on_fork
+    def reset_pools():
+        # Connections inherited from the parent must not be used (or closed) by the child
+        for engine in engines:
+            engine.dispose(close=False)
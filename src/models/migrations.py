@@ -0,0 +1,121 @@
+"""
+Versioned schema migrations.
+
+db.create_all() only creates missing tables, so changes to existing tables
+are applied here. Each migration is idempotent (it checks before it alters)
+and its version is recorded in the schema_version table once applied, so the
+runner is safe to call on every startup and from several workers at once.
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(c['name'] == column for c in inspect(conn).get_columns(table))
+
+
+def _daily_rounds(conn):
+    """Add DiceRoll.round_day, backfilled from rolled_at"""
+    if not _has_column(conn, 'dice_roll', 'round_day'):
+        conn.execute(text('ALTER TABLE dice_roll ADD COLUMN round_day DATE'))
+        conn.execute(text('UPDATE dice_roll SET round_day = date(rolled_at)'))
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_dice_roll_user_round ON dice_roll (user_id, round_day)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_dice_roll_round_score ON dice_roll (round_day, total_score)'))
+
+
+def _hot_path_indexes(conn):
+    """Indexes for the history and ranking queries; one Ranking row per user"""
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_dice_roll_rolled_at ON dice_roll (rolled_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_dice_roll_round_rolled_at ON dice_roll (round_day, rolled_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ranking_highest_score ON ranking (highest_score)'))
+
+    # Fold duplicate rankings into the oldest row before enforcing uniqueness
+    conn.execute(text(
+        'UPDATE ranking SET '
+        ' highest_score = (SELECT MAX(r2.highest_score) FROM ranking r2 WHERE r2.user_id = ranking.user_id),'
+        ' total_rolls = (SELECT SUM(r2.total_rolls) FROM ranking r2 WHERE r2.user_id = ranking.user_id) '
+        'WHERE id IN (SELECT MIN(id) FROM ranking GROUP BY user_id HAVING COUNT(*) > 1)'
+    ))
+    conn.execute(text('DELETE FROM ranking WHERE id NOT IN (SELECT MIN(id) FROM ranking GROUP BY user_id)'))
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_ranking_user_id ON ranking (user_id)'))
+
+
+def _rank_order_index(conn):
+    """Index matching the leaderboard order, used for top-N and per-user rank queries"""
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_ranking_score_user ON ranking (highest_score DESC, user_id)'))
+    conn.execute(text('DROP INDEX IF EXISTS ix_ranking_highest_score'))
+
+
+def _sheets_outbox(conn):
+    """Outbox of rolls waiting for Google Sheets delivery"""
+    from src.models.user import SheetsOutbox
+    SheetsOutbox.__table__.create(conn, checkfirst=True)
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_sheets_outbox_pending ON sheets_outbox (delivered_at, next_attempt_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_sheets_outbox_claim ON sheets_outbox (claim_token)'))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'daily_rounds', _daily_rounds),
+    Migration(2, 'hot_path_indexes', _hot_path_indexes),
+    Migration(3, 'rank_order_index', _rank_order_index),
+    Migration(4, 'sheets_outbox', _sheets_outbox),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_version ('
+            ' version INTEGER PRIMARY KEY,'
+            ' name VARCHAR(100) NOT NULL,'
+            ' applied_at TIMESTAMP NOT NULL)'
+        ))
+
+
+def current_version(engine) -> int:
+    """Highest applied migration version (0 for a database without any)"""
+    if not inspect(engine).has_table('schema_version'):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text('SELECT COALESCE(MAX(version), 0) FROM schema_version')).scalar()
+
+
+def run_migrations(engine) -> List[int]:
+    """
+    Apply pending migrations in order, each in its own transaction.
+
+    Returns:
+        List of versions applied by this call
+    """
+    _ensure_version_table(engine)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current_version(engine):
+            continue
+        try:
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(
+                    text('INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)'),
+                    {'v': migration.version, 'n': migration.name, 't': datetime.utcnow()}
+                )
+        except IntegrityError:
+            # Another worker recorded this version first; its changes are identical
+            logging.info("Migration %s already applied by another process", migration.version)
+            continue
+        logging.info("Applied migration %s (%s)", migration.version, migration.name)
+        applied.append(migration.version)
+    return applied
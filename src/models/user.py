@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.models.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def current_round_day():
+    """Rounds last one UTC day; each user gets one roll per round"""
+    return datetime.utcnow().date()
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,6 +32,17 @@ class DiceRoll(db.Model):
     dice3 = db.Column(db.Integer, nullable=False)
     total_score = db.Column(db.Integer, nullable=False)
     rolled_at = db.Column(db.DateTime, default=datetime.utcnow)
+    round_day = db.Column(db.Date, nullable=False, default=current_round_day)
+
+    # Keep in sync with src/models/migrations.py
+    __table_args__ = (
+        # One roll per user per round; its user_id prefix also serves lookups by user
+        db.UniqueConstraint('user_id', 'round_day', name='uq_dice_roll_user_round'),
+        # Per-round rankings and history read only their own round's slice
+        db.Index('ix_dice_roll_round_score', 'round_day', 'total_score'),
+        db.Index('ix_dice_roll_round_rolled_at', 'round_day', 'rolled_at'),
+        db.Index('ix_dice_roll_rolled_at', 'rolled_at'),
+    )
     
     def __repr__(self):
         return f'<DiceRoll {self.user_id}: {self.dice1},{self.dice2},{self.dice3}>'
@@ -40,7 +56,8 @@ class DiceRoll(db.Model):
             'dice2': self.dice2,
             'dice3': self.dice3,
             'total_score': self.total_score,
-            'rolled_at': self.rolled_at.isoformat() if self.rolled_at else None
+            'rolled_at': self.rolled_at.isoformat() if self.rolled_at else None,
+            'round_day': self.round_day.isoformat() if self.round_day else None
         }
 
 class Ranking(db.Model):
@@ -50,6 +67,13 @@ class Ranking(db.Model):
     highest_score = db.Column(db.Integer, nullable=False)
     total_rolls = db.Column(db.Integer, default=1)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Keep in sync with src/models/migrations.py
+    __table_args__ = (
+        db.Index('ix_ranking_user_id', 'user_id', unique=True),
+        # Leaderboard order: higher score first, ties go to the earlier user
+        db.Index('ix_ranking_score_user', db.desc('highest_score'), 'user_id'),
+    )
     
     # Relationship with user
     user = db.relationship('User', backref='ranking')
@@ -67,3 +91,38 @@ class Ranking(db.Model):
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
+
+class SheetsOutbox(db.Model):
+    """A roll waiting to be appended to Google Sheets, written in the roll's transaction"""
+    __tablename__ = 'sheets_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: archiving may delete the roll before its row is cleaned up
+    dice_roll_id = db.Column(db.Integer, nullable=False)
+    username = db.Column(db.String(80), nullable=False)
+    dice1 = db.Column(db.Integer, nullable=False)
+    dice2 = db.Column(db.Integer, nullable=False)
+    dice3 = db.Column(db.Integer, nullable=False)
+    total_score = db.Column(db.Integer, nullable=False)
+    rolled_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))
+    delivered_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(500))
+
+    # Keep in sync with src/models/migrations.py
+    __table_args__ = (
+        # The dispatcher's "pending and due" scan and the delivered-row cleanup
+        db.Index('ix_sheets_outbox_pending', 'delivered_at', 'next_attempt_at'),
+        db.Index('ix_sheets_outbox_claim', 'claim_token'),
+    )
+
+    def __repr__(self):
+        return f'<SheetsOutbox {self.id}: roll {self.dice_roll_id}>'
+
+    def to_row(self):
+        """The roll as a sheet row: timestamp, username, dice, total, date, time"""
+        return [self.rolled_at.isoformat(), self.username, self.dice1, self.dice2, self.dice3,
+                self.total_score, self.rolled_at.strftime('%Y-%m-%d'), self.rolled_at.strftime('%H:%M:%S')]
@@ -1,61 +1,126 @@
-from flask import Blueprint, jsonify, request
-import random
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
 import os
-from datetime import datetime
-from src.models.user import User, DiceRoll, Ranking, db
+from datetime import datetime, date
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from src.models.user import User, DiceRoll, Ranking, SheetsOutbox, db, current_round_day
+from src.models.database import begin_snapshot, read_only
 from src.services.google_sheets import sheets_service
+from src.services.rate_limit import odds_admission, rate_limiter, sheets_admission
+from src.services.idempotency import idempotent
+from src.services.dice_engine import dice_engine, parse_expression
+from src.services import odds
+from src.services.metrics import metrics, start_request, finish_request, CACHE_HITS, CACHE_MISSES
+from src.services.shared_state import shared_state, SharedStateError
+from src.services.sheets_outbox import outbox_dispatcher
+from src.services.history_index import history_index, load_history_json
+from src.services.user_cache import user_cache
+from src.services.roll_filter import roll_filter
+from src.services.user_import import check_import_token, detect_format, import_usernames, iter_usernames
+from src.services.profiling import profile_store, check_admin_token
+from src.services.archive import roll_archive, ROLLS, SHEETS_RECORDS, ROLL_FIELDS, SHEETS_FIELDS, parse_day
+import csv
+import hashlib
+import io
+import json
+import logging
 
 user_bp = Blueprint('user', __name__)
+logger = logging.getLogger(__name__)
+
+# Rate limit rules, e.g. '30/minute'
+ROLL_LIMIT_PER_IP = os.environ.get('RATE_LIMIT_ROLL_PER_IP', '30/minute')
+ROLL_LIMIT_PER_USER = os.environ.get('RATE_LIMIT_ROLL_PER_USER', '5/minute')
+CREATE_USER_LIMIT_PER_IP = os.environ.get('RATE_LIMIT_USERS_PER_IP', '20/minute')
+ODDS_LIMIT_PER_IP = os.environ.get('RATE_LIMIT_ODDS_PER_IP', '30/minute')
+
+# Largest page /api/sheets/history returns when a limit is given
+HISTORY_MAX_LIMIT = int(os.environ.get('SHEETS_HISTORY_MAX_LIMIT', 500))
+# Cursor for the next /api/sheets/history?after= poll
+HISTORY_CURSOR_HEADER = 'X-History-Cursor'
+
+# The game is three six-sided dice; DiceRoll stores one column per die
+GAME_DICE = parse_expression('3d6')
+
+@user_bp.before_request
+def before_request():
+    start_request()
 
 # Enable CORS for all routes
 @user_bp.after_request
 def after_request(response):
+    finish_request(response)
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,Idempotency-Key,If-None-Match')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', HISTORY_CURSOR_HEADER)
     return response
 
 @user_bp.route('/users', methods=['OPTIONS'])
 @user_bp.route('/users/<int:user_id>', methods=['OPTIONS'])
 @user_bp.route('/dice/roll', methods=['OPTIONS'])
 @user_bp.route('/rankings', methods=['OPTIONS'])
+@user_bp.route('/dashboard', methods=['OPTIONS'])
 def handle_options():
     return '', 200
 
 # User management routes
 @user_bp.route('/users', methods=['GET'])
+@read_only
 def get_users():
     users = User.query.all()
     return jsonify([user.to_dict() for user in users])
 
 @user_bp.route('/users', methods=['POST'])
+@idempotent
+@rate_limiter.limit('create_user', per_ip=CREATE_USER_LIMIT_PER_IP)
 def create_user():
     data = request.json
     
     # Check if username already exists
-    existing_user = User.query.filter_by(username=data['username']).first()
-    if existing_user:
+    if lookup_user_id(data['username']) is not None:
         return jsonify({'error': 'Username already exists'}), 400
     
     user = User(username=data['username'])
     db.session.add(user)
     db.session.commit()
+    user_cache.user_created()
     return jsonify(user.to_dict()), 201
 
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    """
+    Register many users at once from a CSV (text/csv) or JSON lines
+    (application/x-ndjson) body, or ?format=csv|jsonl. The body is read as a
+    stream; existing and repeated usernames are skipped.
+    """
+    if not check_import_token(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    fmt = request.args.get('format') or detect_format(request.content_type)
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'error': "Send text/csv or application/x-ndjson, or set format=csv|jsonl"}), 415
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', errors='replace', newline='')
+    return jsonify(import_usernames(iter_usernames(lines, fmt))), 200
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
+@read_only
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/by-username/<username>', methods=['GET'])
+@read_only
 def get_user_by_username(username):
-    user = User.query.filter_by(username=username).first()
+    user_id = lookup_user_id(username)
+    user = db.session.get(User, user_id) if user_id is not None else None
     if not user:
         return jsonify({'error': 'User not found'}), 404
     return jsonify(user.to_dict())
 
 # Dice rolling routes
 @user_bp.route('/dice/roll', methods=['POST'])
+@idempotent
+@rate_limiter.limit('roll_dice', per_ip=ROLL_LIMIT_PER_IP, per_username=ROLL_LIMIT_PER_USER)
 def roll_dice():
     data = request.json
     username = data.get('username')
@@ -64,51 +129,36 @@ def roll_dice():
         return jsonify({'error': 'Username is required'}), 400
     
     # Get or create user
-    user = User.query.filter_by(username=username).first()
+    user = cached_user(username)
     if not user:
         user = User(username=username)
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Created by a concurrent request since the lookup
+            db.session.rollback()
+            user = User.query.filter_by(username=username).first()
+        user_cache.user_created()
     
-    # Check if user has already rolled today (for simplicity, we'll allow only one roll per user)
-    existing_roll = DiceRoll.query.filter_by(user_id=user.id).first()
+    # Check if user has already rolled in the current round (one roll per user per day)
+    # (skipped when the roll filter is sure they have not; the unique index still guards)
+    round_day = current_round_day()
+    existing_roll = None
+    if roll_filter.might_have_rolled(username):
+        existing_roll = find_round_roll(user.id, round_day)
+        if not existing_roll:
+            roll_filter.false_positive()
     if existing_roll:
-        return jsonify({'error': 'You have already rolled the dice!', 'existing_roll': existing_roll.to_dict()}), 400
+        return jsonify({'error': 'You have already rolled the dice today!', 'existing_roll': existing_roll.to_dict()}), 400
     
     # Roll three dice
-    dice1 = random.randint(1, 6)
-    dice2 = random.randint(1, 6)
-    dice3 = random.randint(1, 6)
-    total_score = dice1 + dice2 + dice3
-    
-    # Save the roll
-    dice_roll = DiceRoll(
-        user_id=user.id,
-        dice1=dice1,
-        dice2=dice2,
-        dice3=dice3,
-        total_score=total_score
-    )
-    db.session.add(dice_roll)
-    
-    # Save to Google Sheets (with error handling)
-    sheets_success = False
-    sheets_error = None
-    try:
-        sheets_service.add_dice_roll_record(
-            username=username,
-            dice1=dice1,
-            dice2=dice2,
-            dice3=dice3,
-            total_score=total_score,
-            timestamp=datetime.utcnow().isoformat()
-        )
-        sheets_success = True
-    except Exception as e:
-        sheets_error = str(e)
-        print(f"Google Sheets error: {e}")  # Log for debugging
+    result = dice_engine.roll(GAME_DICE)
+    dice1, dice2, dice3 = result.dice
+    total_score = result.total
     
-    # Update or create ranking
+    # Update or create ranking (queried before the roll is added, so its autoflush
+    # cannot raise the duplicate-roll IntegrityError outside the try below)
     ranking = Ranking.query.filter_by(user_id=user.id).first()
     if ranking:
         if total_score > ranking.highest_score:
@@ -124,52 +174,416 @@ def roll_dice():
         )
         db.session.add(ranking)
     
-    db.session.commit()
+    # Save the roll
+    rolled_at = datetime.utcnow()
+    dice_roll = DiceRoll(
+        user_id=user.id,
+        dice1=dice1,
+        dice2=dice2,
+        dice3=dice3,
+        total_score=total_score,
+        rolled_at=rolled_at,
+        round_day=round_day
+    )
+    db.session.add(dice_roll)
+    
+    user_id = user.id
+    try:
+        db.session.flush()
+        
+        # Queue for Google Sheets in the same transaction; the outbox dispatcher
+        # delivers it after the commit (src/services/sheets_outbox.py)
+        db.session.add(SheetsOutbox(
+            dice_roll_id=dice_roll.id,
+            username=username,
+            dice1=dice1,
+            dice2=dice2,
+            dice3=dice3,
+            total_score=total_score,
+            rolled_at=rolled_at
+        ))
+        # Serialised before the commit expires them, which would cost a SELECT each
+        roll_data, ranking_data = dice_roll.to_dict(), ranking.to_dict()
+        # Journaled before the commit: if this worker dies in between, other
+        # workers' filters only err towards asking the database
+        journaled = roll_filter.record(username)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request for the same user won the (user_id, round_day) race
+        db.session.rollback()
+        existing_roll = find_round_roll(user_id, round_day)
+        return jsonify({
+            'error': 'You have already rolled the dice today!',
+            'existing_roll': existing_roll.to_dict() if existing_roll else None
+        }), 400
+
+    if not journaled:
+        roll_filter.reset()
+    outbox_dispatcher.notify()
+    publish_roll(username, total_score, rolled_at)
     
     return jsonify({
-        'roll': dice_roll.to_dict(),
-        'ranking': ranking.to_dict(),
-        'sheets_success': sheets_success,
-        'sheets_error': sheets_error
+        'roll': roll_data,
+        'ranking': ranking_data,
+        'sheets_queued': True
     }), 201
 
 @user_bp.route('/dice/check/<username>', methods=['GET'])
+@read_only
 def check_user_roll(username):
-    user = User.query.filter_by(username=username).first()
+    return jsonify(roll_status(username))
+
+def roll_status(username):
+    """Whether the user rolled in the current round, and that roll"""
+    # New players are the bulk of login traffic: answer them without the database
+    if not roll_filter.might_have_rolled(username):
+        return {'has_rolled': False, 'roll': None}
+    
+    user = cached_user(username)
     if not user:
-        return jsonify({'has_rolled': False})
+        roll_filter.false_positive()
+        return {'has_rolled': False, 'roll': None}
     
-    existing_roll = DiceRoll.query.filter_by(user_id=user.id).first()
-    return jsonify({
+    existing_roll = find_round_roll(user.id, current_round_day())
+    if not existing_roll:
+        roll_filter.false_positive()
+    return {
         'has_rolled': existing_roll is not None,
         'roll': existing_roll.to_dict() if existing_roll else None
-    })
+    }
+
+def lookup_user_id(username):
+    """A username's user id, or None if there is no such user, via the user id cache"""
+    return user_cache.lookup(username, lambda name: db.session.query(User.id).filter_by(username=name).scalar())
+
+def cached_user(username):
+    """
+    The User for a username, or None. The instance is put in the session from
+    the cached id without a query, so roll.to_dict() needs no SELECT of the
+    user either.
+    """
+    user_id = lookup_user_id(username)
+    if user_id is None:
+        return None
+    user = User(id=user_id, username=username)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+# Leaderboard order; ties on score go to the player who registered first
+RANK_ORDER = (Ranking.highest_score.desc(), Ranking.user_id)
+
+def find_round_roll(user_id, round_day):
+    """Look up a user's roll for a round via the (user_id, round_day) unique index"""
+    # Selecting only the id keeps the common "not rolled" case an index-only lookup
+    roll_id = db.session.query(DiceRoll.id).filter_by(user_id=user_id, round_day=round_day).scalar()
+    if roll_id is None:
+        return None
+    return db.session.get(DiceRoll, roll_id)
+
+def load_ranking_rows():
+    for ranking in Ranking.query.order_by(Ranking.id).yield_per(1000):
+        yield ranking.username, ranking.highest_score, ranking.total_rolls, ranking.last_updated
+
+def shared_leaderboard():
+    """The cross-node leaderboard, seeded from this node's rankings on first use"""
+    shared_state.leaderboard.seed(load_ranking_rows)
+    return shared_state.leaderboard
+
+def publish_roll(username, total_score, rolled_at):
+    """Share a committed roll with the other nodes"""
+    if not shared_state.enabled:
+        return
+    try:
+        shared_leaderboard().record(username, total_score, rolled_at or datetime.utcnow())
+    except SharedStateError as e:
+        logger.warning("Shared state update failed for %s: %s", username, e)
+
+def parse_round(value):
+    """Parse a ?round= argument: 'current' or an ISO date. Raises ValueError."""
+    if value in (None, '', 'current'):
+        return current_round_day()
+    return date.fromisoformat(value)
 
 # Ranking routes
 @user_bp.route('/rankings', methods=['GET'])
+@read_only
 def get_rankings():
-    rankings = Ranking.query.order_by(Ranking.highest_score.desc()).limit(10).all()
+    if request.args.get('round'):
+        try:
+            round_day = parse_round(request.args.get('round'))
+        except ValueError:
+            return jsonify({'error': 'round must be "current" or a YYYY-MM-DD date'}), 400
+        rankings = get_round_rankings(round_day)
+    else:
+        rankings = None
+    return jsonify(top_rankings(rankings))
+
+def top_rankings(rankings=None):
+    """The top 10 (or the given rankings) with rank positions and the monthly highlight"""
+    if rankings is None:
+        if shared_state.enabled:
+            try:
+                rankings = shared_leaderboard().top(10)
+            except SharedStateError as e:
+                logger.warning("Shared leaderboard unavailable, using local rankings: %s", e)
+        if rankings is None:
+            rankings = [ranking.to_dict() for ranking in
+                        Ranking.query.order_by(*RANK_ORDER).limit(10).all()]
     
     # Add rank position and highlight info
     current_month = datetime.now().month
     rankings_with_highlight = []
     
-    for i, ranking in enumerate(rankings):
-        rank_data = ranking.to_dict()
+    for i, rank_data in enumerate(rankings):
         rank_data['rank'] = i + 1
         # Highlight based on month (1st place in January, 2nd in February, etc.)
         rank_data['is_highlighted'] = (rank_data['rank'] == current_month) or (current_month > 12 and rank_data['rank'] == (current_month % 12))
         rankings_with_highlight.append(rank_data)
     
-    return jsonify(rankings_with_highlight)
+    return rankings_with_highlight
+
+# Rolls in the dashboard's history section
+DASHBOARD_HISTORY_SIZE = 10
+
+def section_etag(name, value):
+    """Content hash of one dashboard section"""
+    digest = hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"{name}-{digest[:16]}"
+
+@user_bp.route('/dashboard', methods=['GET'])
+@read_only
+def get_dashboard():
+    """
+    Everything the game page shows in one request: the player's roll status
+    (when username is given), the top 10 and the newest Sheets rolls, with
+    the database sections read from one snapshot. "etags" holds an ETag per
+    section; sections whose ETag the client sends back in If-None-Match are
+    left out, and when none changed the answer is an empty 304.
+
+    With history_after (the history_cursor of an earlier answer) the
+    history section only holds rolls delivered since, and is left out when
+    there are none, like an unchanged section.
+    """
+    begin_snapshot(db.session)
+    sections = {}
+    username = request.args.get('username')
+    if username:
+        sections['status'] = roll_status(username)
+    sections['rankings'] = top_rankings()
+    history_after = request.args.get('history_after', type=int)
+    sections['history'], history_cursor = history_index.changes(DASHBOARD_HISTORY_SIZE, 'desc', history_after)
+
+    etags = {name: section_etag(name, value) for name, value in sections.items()}
+    changed = {name: value for name, value in sections.items()
+               if not request.if_none_match.contains(etags[name])}
+    if history_after is not None:
+        # Polled by cursor rather than ETag; a smaller cursor means the sheet was reset
+        del etags['history']
+        changed.pop('history', None)
+        if sections['history'] or history_cursor < history_after:
+            changed['history'] = sections['history']
+    if changed:
+        response = jsonify(dict(changed, etags=etags, history_cursor=history_cursor))
+    else:
+        response = Response(status=304)
+    # Revalidated by the page itself through If-None-Match
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@user_bp.route('/odds', methods=['GET'])
+@rate_limiter.limit('odds', per_ip=ODDS_LIMIT_PER_IP)
+@odds_admission
+def get_odds():
+    """Probability distribution for a dice expression and the percentile of a total"""
+    expression = request.args.get('dice', str(GAME_DICE))
+    total = request.args.get('total', type=int)
+    include_distribution = request.args.get('distribution', 'true').lower() != 'false'
+    try:
+        variant = odds.Variant(
+            drop_lowest=request.args.get('drop_lowest', 0, type=int),
+            drop_highest=request.args.get('drop_highest', 0, type=int),
+            reroll_below=request.args.get('reroll_below', 0, type=int),
+        )
+        distribution = odds.get_distribution(
+            expression,
+            variant,
+            trials=request.args.get('trials', odds.DEFAULT_TRIALS, type=int),
+            seed=request.args.get('seed', type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(odds.describe(distribution, total, include_distribution))
+
+@metrics.collector
+def report_odds_cache():
+    info = odds.cache_info()
+    CACHE_HITS.set_total(info.hits, 'odds')
+    CACHE_MISSES.set_total(info.misses, 'odds')
+
+@user_bp.route('/rankings/<username>', methods=['GET'])
+@read_only
+def get_user_rank(username):
+    """A player's leaderboard position with the players just above and below"""
+    neighbors = max(0, min(request.args.get('neighbors', 2, type=int), 10))
+    if shared_state.enabled:
+        try:
+            leaderboard = shared_leaderboard()
+            entry = leaderboard.around(username, neighbors)
+            if not entry:
+                return jsonify({'error': 'No ranking for this user yet'}), 404
+            entry['percentile'] = leaderboard_percentile(*leaderboard.score_counts(entry['highest_score']))
+            return jsonify(entry)
+        except SharedStateError as e:
+            logger.warning("Shared leaderboard unavailable, using local rankings: %s", e)
+    user_id = lookup_user_id(username)
+    ranking = Ranking.query.filter_by(user_id=user_id).first() if user_id is not None else None
+    if not ranking:
+        return jsonify({'error': 'No ranking for this user yet'}), 404
+
+    score, user_id = ranking.highest_score, ranking.user_id
+    rank = rank_of(score, user_id)
+
+    # Players ahead: same score with a lower user_id, then higher scores
+    above = (Ranking.query.filter(Ranking.highest_score == score, Ranking.user_id < user_id)
+             .order_by(Ranking.user_id.desc()).limit(neighbors).all())
+    if len(above) < neighbors:
+        above += (Ranking.query.filter(Ranking.highest_score > score)
+                  .order_by(Ranking.highest_score, Ranking.user_id.desc())
+                  .limit(neighbors - len(above)).all())
+    # Players behind: same score with a higher user_id, then lower scores
+    below = (Ranking.query.filter(Ranking.highest_score == score, Ranking.user_id > user_id)
+             .order_by(Ranking.user_id).limit(neighbors).all())
+    if len(below) < neighbors:
+        below += (Ranking.query.filter(Ranking.highest_score < score)
+                  .order_by(*RANK_ORDER).limit(neighbors - len(below)).all())
+
+    def with_rank(rankings, first_rank, step):
+        return [dict(r.to_dict(), rank=first_rank + i * step) for i, r in enumerate(rankings)]
+
+    return jsonify({
+        **ranking.to_dict(),
+        'rank': rank,
+        'percentile': leaderboard_percentile(*score_counts(score)),
+        'above': list(reversed(with_rank(above, rank - 1, -1))),
+        'below': with_rank(below, rank + 1, 1)
+    })
+
+def rank_of(score, user_id):
+    """1-based leaderboard position, counted on the (highest_score DESC, user_id) index"""
+    higher = db.session.query(db.func.count(Ranking.id)).filter(Ranking.highest_score > score)
+    tied_ahead = db.session.query(db.func.count(Ranking.id)).filter(
+        Ranking.highest_score == score, Ranking.user_id < user_id)
+    return higher.scalar() + tied_ahead.scalar() + 1
+
+def score_counts(score):
+    """Players with a lower best score, with this best score, and in total"""
+    def count(*criteria):
+        return db.session.query(db.func.count(Ranking.id)).filter(*criteria).scalar()
+    return count(Ranking.highest_score < score), count(Ranking.highest_score == score), count()
+
+def leaderboard_percentile(lower, tied, total):
+    """Share of the other players with a lower best score, ties counted as half (as in /api/odds)"""
+    others = total - 1
+    if others <= 0:
+        return 100.0
+    return round((lower + (tied - 1) / 2) / others * 100, 2)
+
+def get_round_rankings(round_day, limit=10):
+    """Top rolls of a single round, read through the (round_day, total_score) index"""
+    rolls = (DiceRoll.query
+             .filter_by(round_day=round_day)
+             .order_by(DiceRoll.total_score.desc(), DiceRoll.id)
+             .limit(limit)
+             .all())
+    return [{
+        'user_id': roll.user_id,
+        'username': roll.user.username if roll.user else None,
+        'highest_score': roll.total_score,
+        'total_rolls': 1,
+        'round_day': roll.round_day.isoformat(),
+        'last_updated': roll.rolled_at.isoformat() if roll.rolled_at else None
+    } for roll in rolls]
+
+@user_bp.route('/rounds', methods=['GET'])
+@read_only
+def get_rounds():
+    """Most recent rounds with their roll count and best score"""
+    limit = min(request.args.get('limit', 30, type=int), 365)
+    rows = (db.session.query(DiceRoll.round_day, db.func.count(DiceRoll.id), db.func.max(DiceRoll.total_score))
+            .group_by(DiceRoll.round_day)
+            .order_by(DiceRoll.round_day.desc())
+            .limit(limit)
+            .all())
+    return jsonify([{
+        'round_day': round_day.isoformat(),
+        'rolls': rolls,
+        'best_score': best_score,
+        'is_current': round_day == current_round_day()
+    } for round_day, rolls, best_score in rows])
 
 @user_bp.route('/dice/history', methods=['GET'])
+@read_only
 def get_dice_history():
-    rolls = DiceRoll.query.order_by(DiceRoll.rolled_at.desc()).all()
-    return jsonify([roll.to_dict() for roll in rolls])
+    """
+    Roll history, newest first. Optional filters: round, since/until (YYYY-MM-DD);
+    include_archive=true adds rolls moved to cold storage (older, appended last).
+    """
+    query = DiceRoll.query
+    try:
+        since, until = parse_day(request.args.get('since')), parse_day(request.args.get('until'))
+        if request.args.get('round'):
+            query = query.filter_by(round_day=parse_round(request.args.get('round')))
+    except ValueError:
+        return jsonify({'error': 'round/since/until must be YYYY-MM-DD dates'}), 400
+    if since:
+        query = query.filter(DiceRoll.round_day >= since)
+    if until:
+        query = query.filter(DiceRoll.round_day <= until)
+    rolls = [roll.to_dict() for roll in query.order_by(DiceRoll.rolled_at.desc()).all()]
+
+    if request.args.get('include_archive', 'false').lower() == 'true':
+        if request.args.get('round'):
+            since = until = parse_round(request.args.get('round'))
+        archived = list(roll_archive.read(ROLLS, since, until))
+        archived.reverse()
+        rolls.extend(archived)
+    return jsonify(rolls)
+
+@user_bp.route('/dice/export', methods=['GET'])
+@read_only
+def export_dice_rolls():
+    """Stream archived and current rolls as CSV, oldest first, optionally limited to since/until"""
+    try:
+        since, until = parse_day(request.args.get('since')), parse_day(request.args.get('until'))
+    except ValueError:
+        return jsonify({'error': 'since/until must be YYYY-MM-DD dates'}), 400
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=ROLL_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in roll_archive.read(ROLLS, since, until):
+            writer.writerow(row)
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        query = DiceRoll.query
+        if since:
+            query = query.filter(DiceRoll.round_day >= since)
+        if until:
+            query = query.filter(DiceRoll.round_day <= until)
+        for roll in query.order_by(DiceRoll.rolled_at).yield_per(1000):
+            writer.writerow(roll.to_dict())
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=dice_rolls.csv'})
 
 # Reset functionality for testing
 @user_bp.route('/reset', methods=['POST'])
+@sheets_admission
 def reset_data():
     try:
         # Clear database tables
@@ -180,7 +594,17 @@ def reset_data():
         DiceRoll.query.delete()
         Ranking.query.delete()
         User.query.delete()
+        SheetsOutbox.query.delete()
         db.session.commit()
+        user_cache.invalidate()
+        roll_filter.reset()
+
+        if shared_state.enabled:
+            try:
+                shared_state.leaderboard.clear()
+            except SharedStateError as e:
+                logger.warning("Could not clear shared state: %s", e)
+        history_index.invalidate()
 
         # Also clear Google Sheets data
         sheets_cleared = False
@@ -208,6 +632,8 @@ def reset_data():
         }), 500
 
 @user_bp.route('/reset/confirm', methods=['GET'])
+@sheets_admission
+@read_only
 def reset_confirm():
     """Get current data counts before reset"""
     try:
@@ -221,32 +647,88 @@ def reset_confirm():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Profiles written by the opt-in profiling middleware (src/services/profiling.py)
+@user_bp.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not check_admin_token(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'profiles': profile_store.list(), 'max_files': profile_store.max_files})
+
+@user_bp.route('/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    if not check_admin_token(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    path = profile_store.path_for(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+
 # Google Sheets data access routes
 @user_bp.route('/sheets/history', methods=['GET'])
+@sheets_admission
 def get_sheets_history():
-    """Get all dice roll history from Google Sheets"""
-    records = sheets_service.get_all_records()
-    return jsonify(records)
+    """
+    Dice roll history from Google Sheets. Without arguments every record, in
+    sheet order. With limit, order (desc, the default, or asc) or after (the
+    X-History-Cursor of an earlier answer; only rows delivered since are
+    returned) the rows come sorted from the history index, each with its
+    seq, so a polling client fetches just what is new.
+    """
+    if not any(name in request.args for name in ('limit', 'order', 'after')):
+        return Response(load_history_json(), mimetype='application/json')
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "order must be 'asc' or 'desc'"}), 400
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(0, min(limit, HISTORY_MAX_LIMIT))
+    rows, cursor = history_index.changes(limit, order, request.args.get('after', type=int))
+    response = jsonify(rows)
+    response.headers[HISTORY_CURSOR_HEADER] = str(cursor)
+    return response
 
 @user_bp.route('/sheets/leaderboard', methods=['GET'])
+@sheets_admission
 def get_sheets_leaderboard():
     """Get leaderboard from Google Sheets data"""
+    if shared_state.enabled:
+        # Same rolls as the Sheets log, but identical on every node
+        try:
+            return jsonify([{
+                'username': entry['username'],
+                'highest_score': entry['highest_score'],
+                'timestamp': entry['achieved_at']
+            } for entry in shared_leaderboard().top(10)])
+        except SharedStateError as e:
+            logger.warning("Shared leaderboard unavailable, using local Sheets data: %s", e)
     leaderboard = sheets_service.get_leaderboard(limit=10)
     return jsonify(leaderboard)
 
 @user_bp.route('/sheets/user/<username>', methods=['GET'])
+@sheets_admission
 def get_user_sheets_history(username):
     """Get dice roll history for a specific user from Google Sheets"""
     records = sheets_service.get_records_by_username(username)
     return jsonify(records)
 
 @user_bp.route('/sheets/export', methods=['GET'])
+@sheets_admission
 def export_sheets_data():
     """Export current data in CSV format for Google Sheets"""
     csv_data = sheets_service.export_for_google_sheets()
+    if request.args.get('include_archive', 'false').lower() == 'true':
+        # Archived records are older, so they go first (after the header)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=SHEETS_FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writerows(roll_archive.read(SHEETS_RECORDS))
+        header, _, rows = csv_data.partition('\n')
+        if csv_data == "No data to export":
+            header, rows = "Timestamp,Username,Dice1,Dice2,Dice3,Total Score,Date,Time", ''
+        csv_data = header + '\n' + buffer.getvalue() + rows
     return csv_data, 200, {'Content-Type': 'text/plain'}
 
 @user_bp.route('/sheets/status', methods=['GET'])
+@sheets_admission
 def get_sheets_status():
     """Get Google Sheets service status and diagnostics"""
     try:
@@ -256,7 +738,8 @@ def get_sheets_status():
             'fallback_mode': sheets_service.use_fallback,
             'spreadsheet_id': sheets_service.SPREADSHEET_ID,
             'has_env_credentials': bool(os.environ.get('GOOGLE_APPLICATION_CREDENTIALS_JSON')),
-            'credentials_file_exists': os.path.exists(os.path.join(os.path.dirname(__file__), '..', 'credentials', 'service-account.json'))
+            'credentials_file_exists': os.path.exists(os.path.join(os.path.dirname(__file__), '..', 'credentials', 'service-account.json')),
+            'outbox': outbox_dispatcher.status()
         }
 
         # Try to test the service
@@ -278,6 +761,7 @@ def get_sheets_status():
         return jsonify({'error': str(e), 'service_available': False}), 500
 
 @user_bp.route('/sheets/latest', methods=['GET'])
+@sheets_admission
 def get_latest_for_sheets():
     """Get latest rolls formatted for copying to Google Sheets"""
     limit = request.args.get('limit', 100, type=int)  # Increased default limit
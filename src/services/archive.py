@@ -0,0 +1,221 @@
+"""
+Cold storage for old dice rolls.
+
+Rolls from rounds before a cutoff are moved out of the DiceRoll table into
+append-only, gzip-compressed CSV partitions, one per month:
+
+    src/data/archive/dice_rolls-2026-01.csv.gz
+    src/data/archive/index.json
+
+index.json records the row count and round_day range of every partition, so
+readers open only the partitions that overlap the requested range. Local
+Sheets fallback records are compacted the same way into sheets_records-*.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+from src.models.user import db, DiceRoll
+
+ROLL_FIELDS = ['id', 'user_id', 'username', 'dice1', 'dice2', 'dice3', 'total_score', 'rolled_at', 'round_day']
+SHEETS_FIELDS = ['timestamp', 'username', 'dice1', 'dice2', 'dice3', 'total_score', 'date', 'time']
+INT_FIELDS = {'id', 'user_id', 'dice1', 'dice2', 'dice3', 'total_score'}
+
+ROLLS = 'dice_rolls'
+SHEETS_RECORDS = 'sheets_records'
+
+
+class RollArchive:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.environ.get(
+            'ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'archive')
+        )
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self._lock = threading.Lock()
+
+    def load_index(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self, index: Dict[str, Dict]):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    def append(self, kind: str, rows: List[Dict], day_field: str):
+        """
+        Append rows to their monthly partitions and update the index.
+
+        Each call adds one gzip member per touched partition; gzip readers
+        treat concatenated members as a single stream.
+        """
+        if not rows:
+            return
+        fields = ROLL_FIELDS if kind == ROLLS else SHEETS_FIELDS
+        by_month: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_month.setdefault(row[day_field][:7], []).append(row)
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            index = self.load_index()
+            for month, month_rows in sorted(by_month.items()):
+                name = f"{kind}-{month}.csv.gz"
+                path = os.path.join(self.directory, name)
+                new_file = not os.path.exists(path)
+
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(month_rows)
+                with open(path, 'ab') as f:
+                    f.write(gzip.compress(buffer.getvalue().encode('utf-8')))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                days = [row[day_field] for row in month_rows]
+                entry = index.get(name, {'kind': kind, 'month': month, 'rows': 0,
+                                         'min_day': min(days), 'max_day': max(days)})
+                entry['rows'] += len(month_rows)
+                entry['min_day'] = min(entry['min_day'], min(days))
+                entry['max_day'] = max(entry['max_day'], max(days))
+                index[name] = entry
+            self._save_index(index)
+
+    def partitions(self, kind: str, since: Optional[date] = None, until: Optional[date] = None) -> List[str]:
+        """Partition files of a kind that may hold days in [since, until], oldest first"""
+        selected = []
+        for name, entry in sorted(self.load_index().items()):
+            if entry['kind'] != kind:
+                continue
+            if since and entry['max_day'] < since.isoformat():
+                continue
+            if until and entry['min_day'] > until.isoformat():
+                continue
+            selected.append(name)
+        return selected
+
+    def read(self, kind: str, since: Optional[date] = None, until: Optional[date] = None,
+             username: Optional[str] = None) -> Iterator[Dict]:
+        """Stream archived rows, opening only partitions that overlap the range"""
+        day_field = 'round_day' if kind == ROLLS else 'date'
+        low = since.isoformat() if since else None
+        high = until.isoformat() if until else None
+
+        for name in self.partitions(kind, since, until):
+            # A re-run batch lands in the partition of its original rows, so
+            # duplicates only need looking for within one partition. Ids alone
+            # are not enough: SQLite reuses them after /api/reset.
+            seen = set()
+            with gzip.open(os.path.join(self.directory, name), 'rt', newline='') as f:
+                for row in csv.DictReader(f):
+                    day = row[day_field]
+                    if (low and day < low) or (high and day > high):
+                        continue
+                    if username and row['username'] != username:
+                        continue
+                    if kind == ROLLS:
+                        # An interrupted archive run may have written a batch twice
+                        key = (row['id'], row['rolled_at'])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    yield {k: int(v) if k in INT_FIELDS and v != '' else v for k, v in row.items()}
+
+    def stats(self) -> Dict:
+        index = self.load_index()
+        return {
+            'partitions': len(index),
+            'archived_rolls': sum(e['rows'] for e in index.values() if e['kind'] == ROLLS),
+            'archived_sheets_records': sum(e['rows'] for e in index.values() if e['kind'] == SHEETS_RECORDS),
+            'bytes': sum(os.path.getsize(os.path.join(self.directory, n))
+                         for n in index if os.path.exists(os.path.join(self.directory, n))),
+        }
+
+
+def roll_to_row(roll) -> Dict:
+    data = roll.to_dict()
+    return {field: data.get(field) for field in ROLL_FIELDS}
+
+
+def archive_rolls(cutoff: date, archive: Optional['RollArchive'] = None,
+                  batch_size: int = 5000, dry_run: bool = False) -> int:
+    """
+    Move rolls with round_day < cutoff into the archive, batch by batch.
+
+    Each batch is written and fsynced to the archive before it is deleted
+    from the database, so a crash can duplicate rows (deduped on read) but
+    never lose them.
+
+    Returns:
+        Number of rolls archived (or that would be, with dry_run)
+    """
+    archive = archive or roll_archive
+    query = DiceRoll.query.filter(DiceRoll.round_day < cutoff)
+    if dry_run:
+        return query.count()
+
+    archived = 0
+    while True:
+        batch = query.order_by(DiceRoll.id).limit(batch_size).all()
+        if not batch:
+            break
+        archive.append(ROLLS, [roll_to_row(roll) for roll in batch], 'round_day')
+        DiceRoll.query.filter(DiceRoll.id.in_([roll.id for roll in batch])).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+        archived += len(batch)
+        logging.info("Archived %s rolls (%s total)", len(batch), archived)
+    return archived
+
+
+def compact_sheets_fallback(sheets_service, cutoff: date, archive: Optional['RollArchive'] = None,
+                            dry_run: bool = False) -> int:
+    """Move local Sheets fallback records dated before cutoff into the archive"""
+    archive = archive or roll_archive
+
+    def is_old(record):
+        return record.get('date') and record['date'] < cutoff.isoformat()
+
+    if dry_run:
+        return sum(1 for r in sheets_service.load_data() if is_old(r))
+
+    moved = []
+
+    def split(records):
+        # Runs under the store's exclusive lock, so rolls saved by other
+        # workers meanwhile are neither lost nor archived twice
+        old = [r for r in records if is_old(r)]
+        if old:
+            archive.append(SHEETS_RECORDS, old, 'date')
+        moved.extend(old)
+        return [r for r in records if not is_old(r)]
+
+    sheets_service.fallback_store.update(split)
+    return len(moved)
+
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    """Parse an optional YYYY-MM-DD (or full ISO timestamp) argument"""
+    if not value:
+        return None
+    if len(value) > 10:
+        return datetime.fromisoformat(value).date()
+    return date.fromisoformat(value)
+
+
+# Global instance
+roll_archive = RollArchive()
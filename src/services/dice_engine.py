@@ -0,0 +1,236 @@
+"""
+Dice engine: NdM(+k) expressions on top of pluggable random number backends.
+
+Backends:
+    random  - stdlib Mersenne Twister instance (seedable, fast)
+    secrets - OS entropy with unbiased rejection sampling (fair, not seedable)
+    numpy   - vectorized numpy Generator, used for bulk draws when installed
+
+Any backend can be wrapped in a PooledBackend, which pre-generates values in
+large blocks so that many small draws cost a slice instead of an RNG call each.
+"""
+
+import os
+import random
+import re
+import threading
+from typing import List, NamedTuple, Optional
+
+from src.services import lifecycle
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+EXPRESSION_PATTERN = re.compile(r'^\s*(\d*)\s*[dD]\s*(\d+)\s*(?:([+-])\s*(\d+))?\s*$')
+
+MAX_DICE = 1000
+MAX_SIDES = 1000
+
+
+class DiceExpression(NamedTuple):
+    count: int
+    sides: int
+    modifier: int = 0
+
+    def __str__(self):
+        if self.modifier:
+            return f"{self.count}d{self.sides}{self.modifier:+d}"
+        return f"{self.count}d{self.sides}"
+
+    @property
+    def min_total(self) -> int:
+        return self.count + self.modifier
+
+    @property
+    def max_total(self) -> int:
+        return self.count * self.sides + self.modifier
+
+
+class RollResult(NamedTuple):
+    expression: DiceExpression
+    dice: List[int]
+    total: int
+
+
+def parse_expression(expression: str) -> DiceExpression:
+    """Parse dice notation such as '3d6', 'd20' or '2d8+3'"""
+    match = EXPRESSION_PATTERN.match(expression or '')
+    if not match:
+        raise ValueError(f"Invalid dice expression: {expression!r}")
+
+    count = int(match.group(1) or 1)
+    sides = int(match.group(2))
+    modifier = int(match.group(4) or 0)
+    if match.group(3) == '-':
+        modifier = -modifier
+
+    if not 1 <= count <= MAX_DICE:
+        raise ValueError(f"Number of dice must be between 1 and {MAX_DICE}")
+    if not 2 <= sides <= MAX_SIDES:
+        raise ValueError(f"Number of sides must be between 2 and {MAX_SIDES}")
+    return DiceExpression(count, sides, modifier)
+
+
+class RandomBackend:
+    """Stdlib random.Random instance; pass a seed for reproducible sequences"""
+    name = 'random'
+
+    def __init__(self, seed: Optional[int] = None):
+        self._rng = random.Random(seed)
+
+    def draw(self, sides: int, n: int) -> List[int]:
+        rand = self._rng.random
+        return [int(rand() * sides) + 1 for _ in range(n)]
+
+
+class SecretsBackend:
+    """OS entropy (os.urandom) with rejection sampling so every face is equally likely"""
+    name = 'secrets'
+
+    def draw(self, sides: int, n: int) -> List[int]:
+        if sides > 256:
+            rng = random.SystemRandom()
+            return [rng.randrange(sides) + 1 for _ in range(n)]
+
+        # Largest multiple of sides that fits in a byte; bytes above it are rejected
+        limit = 256 - 256 % sides
+        values = []
+        while len(values) < n:
+            # Over-request to cover rejections (at most ~50% for the worst sides)
+            chunk = os.urandom(int((n - len(values)) * 256 / limit) + 16)
+            values.extend(b % sides + 1 for b in chunk if b < limit)
+        del values[n:]
+        return values
+
+
+class NumpyBackend:
+    """Vectorized numpy Generator (PCG64); bulk draws return ndarrays"""
+    name = 'numpy'
+
+    def __init__(self, seed: Optional[int] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is not installed")
+        self._rng = np.random.default_rng(seed)
+
+    def draw(self, sides: int, n: int) -> List[int]:
+        return self.draw_array(sides, n).tolist()
+
+    def draw_array(self, sides: int, n: int):
+        return self._rng.integers(1, sides + 1, size=n, dtype=np.int16 if sides < 32768 else np.int32)
+
+
+class PooledBackend:
+    """Serves draws from pre-generated blocks of values, one pool per die size"""
+
+    def __init__(self, backend, pool_size: int = 65536):
+        self.backend = backend
+        self.name = f"pooled-{backend.name}"
+        self.pool_size = pool_size
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def draw(self, sides: int, n: int) -> List[int]:
+        if n >= self.pool_size:
+            return list(self.backend.draw(sides, n))
+
+        with self._lock:
+            pool, position = self._pools.get(sides, (None, 0))
+            if pool is None or position + n > len(pool):
+                pool, position = self.backend.draw(sides, self.pool_size), 0
+            values = pool[position:position + n]
+            self._pools[sides] = (pool, position + n)
+        return list(values)
+
+
+class DiceEngine:
+    def __init__(self, backend=None):
+        self.backend = backend or RandomBackend()
+        self._lock = threading.Lock()
+
+    def roll(self, expression) -> RollResult:
+        """Roll a single expression (string or DiceExpression)"""
+        if not isinstance(expression, DiceExpression):
+            expression = parse_expression(expression)
+        # random.Random and numpy Generators are not safe for concurrent use
+        with self._lock:
+            dice = self.backend.draw(expression.sides, expression.count)
+        return RollResult(expression, dice, sum(dice) + expression.modifier)
+
+    def roll_many(self, expression, n: int):
+        """
+        Roll an expression n times and return the n totals.
+
+        Uses one bulk draw of n * count values; with the numpy backend the
+        result is an ndarray and the summation is vectorized as well.
+        """
+        if not isinstance(expression, DiceExpression):
+            expression = parse_expression(expression)
+        count, sides = expression.count, expression.sides
+
+        with self._lock:
+            if hasattr(self.backend, 'draw_array'):
+                values = self.backend.draw_array(sides, n * count)
+            else:
+                values = self.backend.draw(sides, n * count)
+
+        if NUMPY_AVAILABLE and isinstance(values, np.ndarray):
+            return values.reshape(n, count).sum(axis=1, dtype=np.int64) + expression.modifier
+        if count == 1:
+            return [v + expression.modifier for v in values]
+        return [sum(values[i:i + count]) + expression.modifier for i in range(0, n * count, count)]
+
+
+def create_backend(name: Optional[str] = None, seed: Optional[int] = None, pool_size: Optional[int] = None):
+    """
+    Build a backend from its name ('random', 'secrets' or 'numpy').
+
+    A seed switches to deterministic mode and is rejected for 'secrets'.
+    """
+    name = (name or 'random').lower()
+    if name == 'random':
+        backend = RandomBackend(seed)
+    elif name == 'secrets':
+        if seed is not None:
+            raise ValueError("The secrets backend cannot be seeded")
+        backend = SecretsBackend()
+    elif name == 'numpy':
+        backend = NumpyBackend(seed)
+    else:
+        raise ValueError(f"Unknown dice backend: {name}")
+
+    if pool_size:
+        backend = PooledBackend(backend, pool_size)
+    return backend
+
+
+def create_engine_from_env() -> DiceEngine:
+    """Engine configured by DICE_RNG_BACKEND, DICE_SEED and DICE_POOL_SIZE"""
+    seed = os.environ.get('DICE_SEED')
+    backend = create_backend(
+        os.environ.get('DICE_RNG_BACKEND', 'random'),
+        seed=int(seed) if seed not in (None, '') else None,
+        pool_size=int(os.environ.get('DICE_POOL_SIZE', 0)),
+    )
+    return DiceEngine(backend)
+
+
+# Global instance
+dice_engine = create_engine_from_env()
+
+
+@lifecycle.on_fork
+def reseed_after_fork():
+    """
+    Workers forked from the pre-loaded master would otherwise all continue
+    the master's random stream and roll the same dice. The new backend is
+    seeded from os.urandom and starts with empty pools; a configured
+    DICE_SEED keeps its reproducible sequence.
+    """
+    if os.environ.get('DICE_SEED') not in (None, ''):
+        return
+    backend = create_engine_from_env().backend
+    with dice_engine._lock:
+        dice_engine.backend = backend
@@ -0,0 +1,163 @@
+"""
+Multi-process safe storage for local Sheets fallback records.
+
+Records live in two files next to each other:
+
+    sheets_data.json            snapshot: a JSON array (the original format)
+    sheets_data.json.journal    one JSON record per line, appended since
+
+Adding a record appends a single line to the journal while holding an
+exclusive flock on sheets_data.json.lock, so gunicorn workers never lose or
+interleave each other's rolls. Readers take a shared lock and see the
+snapshot plus the journal. When the journal grows past a size limit it is
+folded into a new snapshot, written to a temp file and renamed into place,
+so a crash leaves either the old or the new snapshot, never a torn one.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: fall back to in-process locking only
+    FCNTL_AVAILABLE = False
+
+Record = Dict[str, Any]
+
+
+class FallbackStore:
+    def __init__(self, path: str, compact_bytes: Optional[int] = None, fsync: Optional[bool] = None):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.lock_path = f"{path}.lock"
+        self.compact_bytes = compact_bytes if compact_bytes is not None else int(
+            os.environ.get('FALLBACK_COMPACT_BYTES', 1024 * 1024))
+        self.fsync = fsync if fsync is not None else os.environ.get('FALLBACK_FSYNC', 'false').lower() == 'true'
+        self._thread_lock = threading.RLock()
+        # Parsed snapshot and journal, reused while the files are unchanged
+        self._snapshot_key = None
+        self._snapshot: List[Record] = []
+        self._journal_offset = 0
+        self._journal: List[Record] = []
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._thread_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    if FCNTL_AVAILABLE:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_snapshot(self) -> List[Record]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._snapshot_key = None
+            self._snapshot = []
+            self._journal_offset, self._journal = 0, []
+            return self._snapshot
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._snapshot_key:
+            try:
+                with open(self.path) as f:
+                    self._snapshot = json.load(f)
+            except json.JSONDecodeError:
+                self._snapshot = []
+            self._snapshot_key = key
+            # A new snapshot means the journal was folded into it
+            self._journal_offset, self._journal = 0, []
+        return self._snapshot
+
+    def _read_journal(self) -> List[Record]:
+        try:
+            with open(self.journal_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self._journal_offset:
+                    self._journal_offset, self._journal = 0, []
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._journal_offset, self._journal = 0, []
+            return self._journal
+
+        # Only whole lines count; a line without its newline is still being written
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    self._journal.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        self._journal_offset += end
+        return self._journal
+
+    def _load_locked(self) -> List[Record]:
+        snapshot = self._read_snapshot()
+        return snapshot + self._read_journal()
+
+    def _write_snapshot_locked(self, records: List[Record]):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(records, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        # Journal entries are now in the snapshot
+        with open(self.journal_path, 'w'):
+            pass
+        self._snapshot_key = None
+        self._journal_offset, self._journal = 0, []
+
+    def load(self) -> List[Record]:
+        """All records, oldest first"""
+        with self._locked(exclusive=False):
+            return self._load_locked()
+
+    def append(self, record: Record):
+        """Add one record without rewriting the file"""
+        self.extend([record])
+
+    def extend(self, records: List[Record]):
+        """Add records with a single write"""
+        if not records:
+            return
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+        with self._locked(exclusive=True):
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if self.compact_bytes and size >= self.compact_bytes:
+                self._write_snapshot_locked(self._load_locked())
+
+    def replace(self, records: List[Record]):
+        """Atomically replace every record"""
+        with self._locked(exclusive=True):
+            self._write_snapshot_locked(records)
+
+    def update(self, func: Callable[[List[Record]], List[Record]]):
+        """
+        Read-modify-write under the exclusive lock: func gets every record and
+        returns the ones to keep. No append can slip in between the read and
+        the write.
+        """
+        with self._locked(exclusive=True):
+            self._write_snapshot_locked(func(self._load_locked()))
+
+    def compact(self):
+        """Fold the journal into the snapshot"""
+        self.update(lambda records: records)
@@ -3,51 +3,140 @@ Google Sheets integration service for dice rolling history.
 Real implementation using Google Sheets API.
 """
 
+import importlib.util
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import List, Dict, Any
 import logging
-import requests
-
-# Google Sheets API imports
-try:
-    from googleapiclient.discovery import build
-    from google.oauth2.service_account import Credentials
-    from google.auth.exceptions import DefaultCredentialsError
-    GOOGLE_SHEETS_AVAILABLE = True
-except ImportError:
-    GOOGLE_SHEETS_AVAILABLE = False
-    logging.warning("Google Sheets API libraries not available. Using fallback mode.")
+from src.services import lifecycle
+from src.services.fallback_store import FallbackStore
+from src.services.structured_logging import ThrottledLogger
+from src.services.metrics import SHEETS_API_CALLS, SHEETS_API_LATENCY, SHEETS_FALLBACKS
+
+
+def is_range_error(error: Exception) -> bool:
+    """The API rejected the range itself (400 "Unable to parse range"), so nothing was written"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return status == 400 and 'range' in str(error).lower()
+
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+# Google Sheets API libraries are slow to import, so only check they are
+# installed here; they are imported when the client is first needed
+GOOGLE_SHEETS_AVAILABLE = _module_available('googleapiclient') and _module_available('google.oauth2')
+logger = logging.getLogger(__name__)
+# Bad rows repeat on every read of the sheet; keep them from flooding the log
+invalid_row_log = ThrottledLogger(logger)
+
+if not GOOGLE_SHEETS_AVAILABLE:
+    logger.warning("Google Sheets API libraries not available. Using fallback mode.")
+
+# Record keys of the local fallback file, in sheet column order
+FALLBACK_FIELDS = ['timestamp', 'username', 'dice1', 'dice2', 'dice3', 'total_score', 'date', 'time']
 
 class GoogleSheetsService:
     def __init__(self):
         # Your Google Sheet ID from the URL
-        self.SPREADSHEET_ID = '1kiCoNvDBawPpOa2A46EMAHruhcC8LGLf5SCZhX6M4q0'
+        self.SPREADSHEET_ID = os.environ.get('SHEETS_SPREADSHEET_ID', '1kiCoNvDBawPpOa2A46EMAHruhcC8LGLf5SCZhX6M4q0')
         self.RANGE_NAME = 'Sheet1!A1:H1000'  # Fixed range format
 
-        # CSV export URL for public reading
-        self.CSV_EXPORT_URL = f'https://docs.google.com/spreadsheets/d/{self.SPREADSHEET_ID}/export?format=csv&gid=0'
-
-        # Fallback to mock data storage if Google Sheets API is not available
-        self.data_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'sheets_data.json')
-        self.ensure_data_directory()
+        # Alternative API host, e.g. fake_sheets_server.py for tests and benchmarks
+        self.API_ENDPOINT = os.environ.get('SHEETS_API_ENDPOINT')
 
-        # Initialize Google Sheets service
-        self.service = None
-        self.use_fallback = True
+        # CSV export URL for public reading (overridable to read from a local stand-in)
+        export_host = self.API_ENDPOINT or 'https://docs.google.com'
+        self.CSV_EXPORT_URL = os.environ.get(
+            'SHEETS_CSV_EXPORT_URL',
+            f'{export_host}/spreadsheets/d/{self.SPREADSHEET_ID}/export?format=csv&gid=0'
+        )
 
+        # Fallback to mock data storage if Google Sheets API is not available
+        self.data_file = os.environ.get(
+            'SHEETS_FALLBACK_FILE', os.path.join(os.path.dirname(__file__), '..', 'data', 'sheets_data.json')
+        )
+
+        # The Google Sheets client is built on first use (see _ensure_initialized)
+        self._service = None
+        self._use_fallback = True
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def service(self):
+        self._ensure_initialized()
+        return self._service
+
+    @service.setter
+    def service(self, value):
+        self._service = value
+
+    @property
+    def use_fallback(self) -> bool:
+        self._ensure_initialized()
+        return self._use_fallback
+
+    @use_fallback.setter
+    def use_fallback(self, value: bool):
+        self._use_fallback = value
+
+    def _ensure_initialized(self):
+        """Build the API client once, the first time it is needed"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            try:
+                self._initialize_sheets_service()
+            except Exception as e:
+                logger.warning("Could not initialize Google Sheets service: %s. Using fallback mode.", e)
+                self._use_fallback = True
+                self._service = None
+            self._initialized = True
+
+    def reinitialize(self):
+        """Drop the API client, e.g. in a freshly forked worker; it is rebuilt on next use"""
+        with self._init_lock:
+            self._service = None
+            self._use_fallback = True
+            self._initialized = False
+
+    def _timed_call(self, operation: str, call):
+        """Run one Sheets request, recording its latency and outcome"""
+        start = time.perf_counter()
         try:
-            self._initialize_sheets_service()
-        except Exception as e:
-            logging.warning(f"Could not initialize Google Sheets service: {e}. Using fallback mode.")
-            self.use_fallback = True
-            self.service = None
+            result = call()
+        except Exception:
+            SHEETS_API_CALLS.inc(operation, 'error')
+            raise
+        finally:
+            SHEETS_API_LATENCY.observe(time.perf_counter() - start, operation)
+        SHEETS_API_CALLS.inc(operation, 'success')
+        return result
 
     def _initialize_sheets_service(self):
         """Initialize Google Sheets service with authentication"""
         if not GOOGLE_SHEETS_AVAILABLE:
             raise Exception("Google Sheets API libraries not installed")
+        from googleapiclient.discovery import build
+
+        if self.API_ENDPOINT:
+            # A local stand-in takes no credentials
+            from google.auth.credentials import AnonymousCredentials
+            self.service = build('sheets', 'v4', credentials=AnonymousCredentials(),
+                                 client_options={'api_endpoint': self.API_ENDPOINT})
+            self.use_fallback = False
+            logger.info("Google Sheets service initialized against %s", self.API_ENDPOINT)
+            return
 
         # Try different authentication methods
         try:
@@ -63,10 +152,10 @@ class GoogleSheetsService:
                 )
                 self.service = build('sheets', 'v4', credentials=creds)
                 self.use_fallback = False
-                logging.info("Google Sheets service initialized with service account credentials from environment")
+                logger.info("Google Sheets service initialized with service account credentials from environment")
                 return
         except Exception as e:
-            logging.info(f"Service account credentials from environment not available: {e}")
+            logger.info("Service account credentials from environment not available: %s", e)
 
         try:
             # Method 2: Try to use service account credentials file
@@ -79,10 +168,10 @@ class GoogleSheetsService:
                 )
                 self.service = build('sheets', 'v4', credentials=creds)
                 self.use_fallback = False
-                logging.info("Google Sheets service initialized with service account credentials from file")
+                logger.info("Google Sheets service initialized with service account credentials from file")
                 return
         except Exception as e:
-            logging.info(f"Service account credentials file not available: {e}")
+            logger.info("Service account credentials file not available: %s", e)
 
         try:
             # Method 2: Try to use default credentials
@@ -90,22 +179,32 @@ class GoogleSheetsService:
             creds, _ = default()
             self.service = build('sheets', 'v4', credentials=creds)
             self.use_fallback = False
-            logging.info("Google Sheets service initialized with default credentials")
+            logger.info("Google Sheets service initialized with default credentials")
             return
         except Exception as e:
-            logging.info(f"Default credentials not available: {e}")
+            logger.info("Default credentials not available: %s", e)
 
         try:
             # Method 3: Try without credentials for public sheets (read-only)
             # This will only work for reading publicly shared sheets
             self.service = build('sheets', 'v4', developerKey=None)
             self.use_fallback = False
-            logging.info("Using public Google Sheets access (read-only)")
+            logger.info("Using public Google Sheets access (read-only)")
             return
         except Exception as e:
-            logging.error(f"Failed to initialize Google Sheets service: {e}")
+            logger.error("Failed to initialize Google Sheets service: %s", e)
             raise e
 
+    @property
+    def data_file(self) -> str:
+        return self.fallback_store.path
+
+    @data_file.setter
+    def data_file(self, path: str):
+        # Shared by every gunicorn worker, so all access goes through the locked store
+        self.fallback_store = FallbackStore(path)
+        self.ensure_data_directory()
+
     def ensure_data_directory(self):
         """Ensure the data directory exists"""
         data_dir = os.path.dirname(self.data_file)
@@ -115,8 +214,14 @@ class GoogleSheetsService:
     def _read_from_public_sheet(self) -> List[Dict[str, Any]]:
         """Read data from publicly accessible Google Sheet via CSV export"""
         try:
-            response = requests.get(self.CSV_EXPORT_URL, timeout=10)
-            response.raise_for_status()
+            import requests
+
+            def fetch():
+                response = requests.get(self.CSV_EXPORT_URL, timeout=10)
+                response.raise_for_status()
+                return response
+
+            response = self._timed_call('csv_export', fetch)
 
             # Parse CSV content
             import csv
@@ -127,6 +232,7 @@ class GoogleSheetsService:
 
             records = []
             headers = None
+            skipped = 0
 
             for i, row in enumerate(reader):
                 if i == 0:
@@ -149,30 +255,26 @@ class GoogleSheetsService:
                         }
                         records.append(record)
                     except (ValueError, IndexError) as e:
-                        logging.warning(f"Skipping invalid row: {row}, error: {e}")
+                        invalid_row_log.warning("Skipping invalid row: %s, error: %s", row, e)
+                        skipped += 1
                         continue
 
-            logging.info(f"Successfully read {len(records)} records from public Google Sheet")
+            if skipped:
+                logger.warning("Skipped %s invalid rows in public Google Sheet", skipped)
+            logger.info("Successfully read %s records from public Google Sheet", len(records))
             return records
 
         except Exception as e:
-            logging.error(f"Failed to read from public Google Sheet: {e}")
+            logger.error("Failed to read from public Google Sheet: %s", e)
             return []
             
     def load_data(self) -> List[Dict[str, Any]]:
         """Load existing data from mock storage"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+        return self.fallback_store.load()
     
     def save_data(self, data: List[Dict[str, Any]]):
         """Save data to mock storage"""
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        self.fallback_store.replace(data)
     
     def add_dice_roll_record(self, username: str, dice1: int, dice2: int, dice3: int,
                            total_score: int, timestamp: str = None) -> bool:
@@ -213,45 +315,81 @@ class GoogleSheetsService:
 
                     for range_name in ranges_to_try:
                         try:
-                            result = self.service.spreadsheets().values().append(
+                            result = self._timed_call('append', self.service.spreadsheets().values().append(
                                 spreadsheetId=self.SPREADSHEET_ID,
                                 range=range_name,
                                 valueInputOption='RAW',
                                 insertDataOption='INSERT_ROWS',
                                 body=body
-                            ).execute()
+                            ).execute)
                             break  # Success, exit the loop
                         except Exception as range_error:
-                            if range_name == ranges_to_try[-1]:  # Last attempt
+                            # Last attempt, or an error after which the row may be written
+                            if range_name == ranges_to_try[-1] or not is_range_error(range_error):
                                 raise range_error  # Re-raise the error
                             continue  # Try next range format
 
-                    logging.info(f"Successfully added row to Google Sheets: {result.get('updates', {}).get('updatedRows', 0)} rows updated")
+                    logger.info("Successfully added row to Google Sheets: %s rows updated",
+                                result.get('updates', {}).get('updatedRows', 0))
 
                     # Also save to fallback for consistency
                     self._save_to_fallback(username, dice1, dice2, dice3, total_score, timestamp)
                     return True
 
                 except Exception as e:
-                    logging.error(f"Failed to write to Google Sheets: {e}")
+                    logger.error("Failed to write to Google Sheets: %s", e)
                     # Fall back to local storage
+                    SHEETS_FALLBACKS.inc('append')
                     return self._save_to_fallback(username, dice1, dice2, dice3, total_score, timestamp)
             else:
                 # Use fallback method
-                logging.info("Using fallback storage (Google Sheets service not available)")
+                logger.info("Using fallback storage (Google Sheets service not available)")
+                SHEETS_FALLBACKS.inc('append')
                 return self._save_to_fallback(username, dice1, dice2, dice3, total_score, timestamp)
 
         except Exception as e:
-            logging.error(f"Error in add_dice_roll_record: {e}")
+            logger.error("Error in add_dice_roll_record: %s", e)
             return False
 
+    def append_rows(self, rows: List[List[Any]]) -> int:
+        """
+        Append rows to the sheet with one API call.
+
+        Returns:
+            int: Number of rows the API reports as written
+
+        Raises:
+            RuntimeError: The Sheets API is not configured
+            Exception: Whatever the API client raised. Only a rejected range
+                is retried with the next range format: after any other error
+                (a timeout, say) the rows may already be in the sheet.
+        """
+        if self.use_fallback or not self.service:
+            raise RuntimeError('Google Sheets service not available')
+
+        ranges_to_try = ['A:H', 'Sheet1!A:H', 'A1:H']
+        for range_name in ranges_to_try:
+            try:
+                result = self._timed_call('append', self.service.spreadsheets().values().append(
+                    spreadsheetId=self.SPREADSHEET_ID,
+                    range=range_name,
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': rows}
+                ).execute)
+                return result.get('updates', {}).get('updatedRows', len(rows))
+            except Exception as e:
+                if range_name == ranges_to_try[-1] or not is_range_error(e):
+                    raise
+
+    def save_rows_to_fallback(self, rows: List[List[Any]]):
+        """Add sheet-format rows to the local fallback file"""
+        self.fallback_store.extend([dict(zip(FALLBACK_FIELDS, row)) for row in rows])
+
     def _save_to_fallback(self, username: str, dice1: int, dice2: int, dice3: int,
                          total_score: int, timestamp: str) -> bool:
         """Save to local JSON file as fallback"""
         try:
-            # Load existing data
-            data = self.load_data()
-
             # Create new record
             dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
             new_record = {
@@ -265,16 +403,13 @@ class GoogleSheetsService:
                 'time': dt.strftime('%H:%M:%S')
             }
 
-            # Add to data
-            data.append(new_record)
-
-            # Save updated data
-            self.save_data(data)
+            # Append only; rewriting the whole file would race other workers
+            self.fallback_store.append(new_record)
 
             return True
 
         except Exception as e:
-            logging.error(f"Error in fallback save: {e}")
+            logger.error("Error in fallback save: %s", e)
             return False
     
     def get_all_records(self) -> List[Dict[str, Any]]:
@@ -293,10 +428,10 @@ class GoogleSheetsService:
 
                 for range_name in ranges_to_try:
                     try:
-                        result = self.service.spreadsheets().values().get(
+                        result = self._timed_call('get', self.service.spreadsheets().values().get(
                             spreadsheetId=self.SPREADSHEET_ID,
                             range=range_name
-                        ).execute()
+                        ).execute)
                         break  # Success, exit the loop
                     except Exception as range_error:
                         if range_name == ranges_to_try[-1]:  # Last attempt
@@ -309,6 +444,7 @@ class GoogleSheetsService:
 
                 # Convert to our expected format
                 records = []
+                skipped = 0
                 for row in values[1:]:  # Skip header row if present
                     if len(row) >= 6:  # Ensure we have enough columns
                         try:
@@ -324,17 +460,22 @@ class GoogleSheetsService:
                             }
                             records.append(record)
                         except (ValueError, IndexError) as e:
-                            logging.warning(f"Skipping invalid row: {row}, error: {e}")
+                            invalid_row_log.warning("Skipping invalid row: %s, error: %s", row, e)
+                            skipped += 1
                             continue
 
+                if skipped:
+                    logger.warning("Skipped %s invalid rows from Google Sheets API", skipped)
                 return records
 
             except Exception as e:
-                logging.error(f"Failed to read from Google Sheets API: {e}")
+                logger.error("Failed to read from Google Sheets API: %s", e)
                 # Fall back to local data
+                SHEETS_FALLBACKS.inc('get')
                 return self.load_data()
         else:
             # Use local fallback data
+            SHEETS_FALLBACKS.inc('get')
             return self.load_data()
     
     def get_records_by_username(self, username: str) -> List[Dict[str, Any]]:
@@ -418,3 +559,6 @@ class GoogleSheetsService:
 # Global instance
 sheets_service = GoogleSheetsService()
 
+# The HTTP client's connections are not fork-safe
+lifecycle.on_fork(sheets_service.reinitialize)
+
@@ -0,0 +1,143 @@
+"""
+Sorted in-memory index of the Google Sheets roll history.
+
+Records are kept in timestamp order, so the newest N rolls are a slice.
+Each one also carries seq, its 1-based position in sheet order: rows are
+only ever appended, so seq is the order they were delivered in. Polling
+clients send back the cursor from their last query and get just the rows
+delivered since. A cursor on the roll timestamp would miss rolls the
+outbox delivers late (after a failed append, or from a node that was
+offline), as those sort before rows the client has already seen.
+/api/sheets/history serves limit/order/after queries from here.
+
+The index is rebuilt from the sheet (through the shared cache when one is
+configured) at most every SHEETS_HISTORY_TTL seconds, or on the next query
+after invalidate(). One thread rebuilds while the others wait for it,
+rather than every request reading the whole sheet at once.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.services.google_sheets import sheets_service
+from src.services.metrics import CACHE_HITS, CACHE_MISSES
+from src.services.shared_state import SharedStateError, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Shared cache entry holding every Sheets record as JSON
+SHARED_KEY = 'sheets:history'
+
+
+def timestamp_key(value: Any) -> str:
+    """
+    Sort key for a record timestamp: ISO 8601 normalised to naive UTC with
+    microseconds, so string order is time order. Unparseable values are
+    kept as they are.
+    """
+    text = str(value or '')
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return text
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec='microseconds')
+
+
+def sort_key(record: Dict[str, Any]) -> Tuple[str, int]:
+    """Timestamp order, then sheet order for equal timestamps"""
+    return timestamp_key(record.get('timestamp')), record['seq']
+
+
+def load_history_json() -> str:
+    """Every Sheets record as a JSON array, from the shared cache when there is one"""
+    if shared_state.enabled:
+        try:
+            cached = shared_state.cache_get(SHARED_KEY)
+        except SharedStateError:
+            cached = None
+        if cached is not None:
+            CACHE_HITS.inc('sheets_history')
+            return cached
+        CACHE_MISSES.inc('sheets_history')
+    data = json.dumps(sheets_service.get_all_records())
+    if shared_state.enabled:
+        try:
+            shared_state.cache_set(SHARED_KEY, data)
+        except SharedStateError as e:
+            logger.warning("Could not cache Sheets history: %s", e)
+    return data
+
+
+def load_history_records() -> List[Dict[str, Any]]:
+    return json.loads(load_history_json())
+
+
+class HistoryIndex:
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], ttl: Optional[float] = None):
+        self.loader = loader
+        self.ttl = ttl if ttl is not None else float(os.environ.get('SHEETS_HISTORY_TTL', 5))
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._delivered: List[Dict[str, Any]] = []
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self):
+        """Rebuild on the next query, here and (through the shared cache) on every node"""
+        self._loaded_at = None
+        if shared_state.enabled:
+            try:
+                shared_state.cache_delete(SHARED_KEY)
+            except SharedStateError as e:
+                logger.warning("Could not invalidate the shared Sheets history: %s", e)
+
+    def _snapshot(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                delivered = [dict(record, seq=seq) for seq, record in enumerate(self.loader(), 1)]
+                self._records = sorted(delivered, key=sort_key)
+                self._delivered = delivered
+                self._loaded_at = time.monotonic()
+            # Rebuilds swap in new lists, so these stay consistent after the lock is released
+            return self._records, self._delivered
+
+    def query(self, limit: Optional[int] = None, order: str = 'desc',
+              after: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.changes(limit, order, after)[0]
+
+    def changes(self, limit: Optional[int] = None, order: str = 'desc',
+                after: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Records delivered after the cursor (all when None), newest first for
+        'desc' or oldest first for 'asc', and the cursor for the next query.
+        With 'desc' the limit keeps the newest rows; with 'asc' it takes the
+        next rows in delivery order, so a client can page forward through
+        every row by passing the returned cursor back. A cursor past the end
+        is from before /api/reset cleared the sheet and counts as none.
+        """
+        records, delivered = self._snapshot()
+        cursor = len(delivered)
+        if after is None or after < 0 or after > cursor:
+            after = 0
+        if order == 'asc' and limit is not None:
+            cursor = min(cursor, after + limit)
+        if after == 0 and cursor == len(delivered):
+            # Everything: already in timestamp order
+            rows = records
+        else:
+            rows = sorted(delivered[after:cursor], key=sort_key)
+        if order == 'asc':
+            return rows, cursor
+        if limit is not None:
+            rows = rows[max(0, len(rows) - limit):]
+        return rows[::-1], cursor
+
+
+# Global instance
+history_index = HistoryIndex(load_history_records)
@@ -0,0 +1,205 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+The first request carrying a given key runs normally and its response is
+stored in a small SQLite table. Retries with the same key get the stored
+response back from a single primary-key lookup, without re-running the view.
+Entries expire after a TTL and the table is capped at a maximum size.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, jsonify, make_response, request
+
+from src.services import lifecycle
+from src.services.metrics import CACHE_HITS, CACHE_MISSES
+
+# Responses that depend on transient server state and must not be replayed
+NON_REPLAYABLE_STATUS = {429, 503}
+
+
+class IdempotencyStore:
+    def __init__(self, path: Optional[str] = None, ttl: Optional[int] = None,
+                 max_entries: Optional[int] = None, pending_timeout: int = 60):
+        if path is None:
+            path = os.environ.get(
+                'IDEMPOTENCY_DB',
+                os.path.join(os.path.dirname(__file__), '..', 'database', 'idempotency.db')
+            )
+        self.path = path
+        self.ttl = ttl if ttl is not None else int(os.environ.get('IDEMPOTENCY_TTL', 86400))
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 100000))
+        self.pending_timeout = pending_timeout
+        self._local = threading.local()
+        self._last_eviction = 0.0
+        # SQLite connections must not cross a fork
+        lifecycle.on_fork(self._reset_connections)
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS idempotency_keys ('
+                        ' key TEXT PRIMARY KEY,'
+                        ' fingerprint TEXT NOT NULL,'
+                        ' status_code INTEGER,'
+                        ' body TEXT,'
+                        ' created_at REAL NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_idempotency_keys_created_at ON idempotency_keys (created_at)')
+                    self._initialized = True
+        return conn
+
+    def reserve(self, key: str, fingerprint: str):
+        """
+        Claim a key before running the request.
+
+        Returns:
+            None if the caller now owns the key, otherwise the existing row as
+            (fingerprint, status_code, body) where status_code is None while
+            the original request is still in flight.
+        """
+        conn = self._connection()
+        now = time.time()
+        self._maybe_evict(conn, now)
+        try:
+            conn.execute(
+                'INSERT INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)',
+                (key, fingerprint, now)
+            )
+            return None
+        except sqlite3.IntegrityError:
+            pass
+
+        row = conn.execute(
+            'SELECT fingerprint, status_code, body, created_at FROM idempotency_keys WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return self.reserve(key, fingerprint)
+
+        stored_fingerprint, status_code, body, created_at = row
+        expired = now - created_at > self.ttl
+        abandoned = status_code is None and now - created_at > self.pending_timeout
+        if expired or abandoned:
+            # Take over the stale entry; the conditional update makes this race-free
+            cursor = conn.execute(
+                'UPDATE idempotency_keys SET fingerprint = ?, status_code = NULL, body = NULL, created_at = ? '
+                'WHERE key = ? AND created_at = ?',
+                (fingerprint, now, key, created_at)
+            )
+            if cursor.rowcount == 1:
+                return None
+            return self.reserve(key, fingerprint)
+        return stored_fingerprint, status_code, body
+
+    def complete(self, key: str, status_code: int, body: str):
+        self._connection().execute(
+            'UPDATE idempotency_keys SET status_code = ?, body = ? WHERE key = ?',
+            (status_code, body, key)
+        )
+
+    def release(self, key: str):
+        """Forget a reservation so the request can be retried from scratch"""
+        self._connection().execute('DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM idempotency_keys')
+
+    def _maybe_evict(self, conn: sqlite3.Connection, now: float):
+        if now - self._last_eviction < 60:
+            return
+        self._last_eviction = now
+        conn.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (now - self.ttl,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM idempotency_keys').fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM idempotency_keys WHERE key IN ('
+                ' SELECT key FROM idempotency_keys ORDER BY created_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+
+def idempotent(view: Callable):
+    """
+    Decorator adding Idempotency-Key handling to a JSON POST route.
+
+    Requests without the header run unchanged. A retry with the same key and
+    payload gets the original response; the same key with a different payload
+    is rejected with 422, and a retry racing the original gets 409.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        header = request.headers.get('Idempotency-Key')
+        if not header:
+            return view(*args, **kwargs)
+        if len(header) > 255:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+        store = get_idempotency_store()
+        key = f"{request.method}:{request.path}:{header}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        existing = store.reserve(key, fingerprint)
+        if existing is not None:
+            stored_fingerprint, status_code, body = existing
+            if stored_fingerprint != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+            if status_code is None:
+                response = jsonify({'error': 'Original request is still in progress', 'retry_after': 1})
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+            CACHE_HITS.inc('idempotency')
+            response = Response(body, status=status_code, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        CACHE_MISSES.inc('idempotency')
+
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            store.release(key)
+            raise
+
+        # Normalise (body, status) tuples so the result can be stored
+        response = make_response(response)
+        if response.status_code >= 500 or response.status_code in NON_REPLAYABLE_STATUS:
+            store.release(key)
+        else:
+            store.complete(key, response.status_code, response.get_data(as_text=True))
+        return response
+    return wrapped
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore()
+    return _store
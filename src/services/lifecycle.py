@@ -0,0 +1,58 @@
+"""
+Process lifecycle hooks.
+
+Modules that hold connections or background threads register callbacks here:
+fork hooks run in each worker right after a pre-loaded app is forked
+(gunicorn post_fork), shutdown hooks run when a worker exits so background
+queues are drained before the process goes away.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Callable, List
+
+_fork_hooks: List[Callable] = []
+_shutdown_hooks: List[Callable] = []
+_shutdown_done = False
+_lock = threading.Lock()
+
+
+def on_fork(hook: Callable) -> Callable:
+    """Register a callback to re-create fork-unsafe state in a new worker"""
+    _fork_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Callable) -> Callable:
+    """Register a callback that drains or closes resources at worker exit"""
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+def run_fork_hooks():
+    global _shutdown_done
+    # The child starts with its own, not yet shut down, resources
+    _shutdown_done = False
+    for hook in _fork_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logging.error("Fork hook %s failed: %s", getattr(hook, '__name__', hook), e)
+
+
+def run_shutdown_hooks():
+    """Run shutdown hooks once, most recently registered first"""
+    global _shutdown_done
+    with _lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+    for hook in reversed(_shutdown_hooks):
+        try:
+            hook()
+        except Exception as e:
+            logging.error("Shutdown hook %s failed: %s", getattr(hook, '__name__', hook), e)
+
+
+atexit.register(run_shutdown_hooks)
@@ -0,0 +1,451 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain dicts updated under one lock, so
+an observation costs a dict lookup and an add. Each gunicorn worker writes
+a JSON snapshot of its values to METRICS_DIR (at most every
+METRICS_FLUSH_INTERVAL seconds, and at exit); /metrics merges the snapshots
+of all workers. Counters and histograms of workers that have exited are
+folded into an archive file so totals never go backwards; their gauges are
+dropped. Without METRICS_DIR (or without fcntl, which the merge locks
+with), /metrics reports the serving process only.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from src.services import lifecycle
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: no cross-process lock, so no multiprocess aggregation
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+OUTBOX_BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+ARCHIVE_FILE = 'archived.json'
+LOCK_FILE = '.lock'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.registry._add(self.name, labels, amount)
+
+    def set_total(self, value: float, *labels):
+        """Report a cumulative total kept elsewhere (e.g. lru_cache statistics)"""
+        self.registry._set(self.name, labels, value)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames, aggregate: str = 'sum'):
+        super().__init__(registry, name, documentation, labelnames)
+        # How the values of several workers combine: 'sum', or 'max' for
+        # values every worker measures from the same shared source
+        self.aggregate = aggregate
+
+    def set(self, value: float, *labels):
+        self.registry._set(self.name, labels, value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        self.registry._observe(self.name, labels, value, bisect_left(self.buckets, value), len(self.buckets) + 1)
+
+    def time(self, *labels) -> '_Timer':
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self, directory: Optional[str] = None, flush_interval: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.environ.get('METRICS_ENABLED', 'true').lower() != 'false'
+        self.enabled = enabled
+        self.directory = directory or os.environ.get('METRICS_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        if self.directory and not FCNTL_AVAILABLE:
+            logger.warning("fcntl is not available; /metrics reports this process only, ignoring %s",
+                           self.directory)
+            self.directory = None
+        if flush_interval is None:
+            flush_interval = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+        self.flush_interval = flush_interval
+
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[Tuple, object]] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        lifecycle.on_fork(self._reset_after_fork)
+        lifecycle.on_shutdown(self._flush_if_dirty)
+
+    # Definition
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        self._values[metric.name] = {}
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              aggregate: str = 'sum') -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, aggregate))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        """Register a callback that sets gauges/totals right before a snapshot is taken"""
+        self._collectors.append(func)
+        return func
+
+    # Recording
+
+    def _add(self, name: str, labels: Tuple, amount: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            values = self._values[name]
+            values[labels] = values.get(labels, 0) + amount
+            self._dirty = True
+        self._maybe_flush()
+
+    def _set(self, name: str, labels: Tuple, value: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[name][labels] = value
+            self._dirty = True
+
+    def _observe(self, name: str, labels: Tuple, value: float, bucket: int, size: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            values = self._values[name]
+            state = values.get(labels)
+            if state is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                state = values[labels] = [[0] * size, 0.0, 0]
+            state[0][bucket] += 1
+            state[1] += value
+            state[2] += 1
+            self._dirty = True
+        self._maybe_flush()
+
+    # Snapshots
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current values of this process: {name: {labels_json: value}}"""
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception:
+                pass
+        with self._lock:
+            return {
+                name: {json.dumps(labels): (
+                    [list(v[0]), v[1], v[2]] if isinstance(v, list) else v
+                ) for labels, v in values.items()}
+                for name, values in self._values.items()
+            }
+
+    def _maybe_flush(self):
+        if self.directory and self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _flush_if_dirty(self):
+        if self._dirty:
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory"""
+        if not self.directory or not self.enabled:
+            return
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(os.path.join(self.directory, f"metrics-{os.getpid()}.json"), self.snapshot())
+
+    def _reset_after_fork(self):
+        # Values inherited from the pre-loading master belong to the master
+        with self._lock:
+            for values in self._values.values():
+                values.clear()
+            self._dirty = False
+        self._last_flush = time.monotonic()
+
+    def collect(self) -> Dict[str, Dict]:
+        """Merged values of all workers (or of this process without a shared directory)"""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        with _DirectoryLock(self.directory):
+            archived = _read_json(os.path.join(self.directory, ARCHIVE_FILE)) or {}
+            live, exited = [], []
+            for name in os.listdir(self.directory):
+                if not (name.startswith('metrics-') and name.endswith('.json')):
+                    continue
+                path = os.path.join(self.directory, name)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                pid = int(name[len('metrics-'):-len('.json')])
+                if _pid_alive(pid):
+                    live.append(snapshot)
+                else:
+                    exited.append((path, snapshot))
+
+            if exited:
+                # Keep the totals of exited workers, drop their gauges
+                for path, snapshot in exited:
+                    self._merge(archived, snapshot, include_gauges=False)
+                _write_json(os.path.join(self.directory, ARCHIVE_FILE), archived)
+                for path, _ in exited:
+                    os.remove(path)
+
+        merged = {}
+        self._merge(merged, archived, include_gauges=False)
+        for snapshot in live:
+            self._merge(merged, snapshot, include_gauges=True)
+        return merged
+
+    def _merge(self, into: Dict, snapshot: Dict, include_gauges: bool):
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not include_gauges):
+                continue
+            target = into.setdefault(name, {})
+            for labels, value in values.items():
+                if metric.kind == 'histogram':
+                    current = target.get(labels)
+                    if current is None:
+                        target[labels] = [list(value[0]), value[1], value[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                elif metric.kind == 'gauge' and metric.aggregate == 'max':
+                    target[labels] = max(target.get(labels, value), value)
+                else:
+                    target[labels] = target.get(labels, 0) + value
+
+    # Exposition
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        values = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels_json, value in sorted(values.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, json.loads(labels_json)))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(list(metric.buckets) + ['+Inf'], value[0]):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value[2]}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class _DirectoryLock:
+    """Exclusive flock on the metrics directory, serialising scrapes across workers"""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: str, data):
+    # Unique per thread: two threads of one worker may flush at the same time
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _format_labels(labels: List[Tuple[str, object]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+HTTP_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method'))
+DB_QUERIES = metrics.counter(
+    'db_queries_total', 'Database queries by endpoint', ('endpoint',))
+DB_QUERY_SECONDS = metrics.counter(
+    'db_query_seconds_total', 'Time spent in database queries by endpoint', ('endpoint',))
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    'db_queries_per_request', 'Database queries issued by one request', ('endpoint',), QUERY_COUNT_BUCKETS)
+SHEETS_API_LATENCY = metrics.histogram(
+    'sheets_api_duration_seconds', 'Google Sheets API call latency', ('operation',))
+SHEETS_API_CALLS = metrics.counter(
+    'sheets_api_calls_total', 'Google Sheets API calls by outcome', ('operation', 'outcome'))
+SHEETS_FALLBACKS = metrics.counter(
+    'sheets_fallbacks_total', 'Operations served from the local fallback file instead of Google Sheets', ('operation',))
+CACHE_HITS = metrics.counter('cache_hits_total', 'Cache hits', ('cache',))
+CACHE_MISSES = metrics.counter('cache_misses_total', 'Cache misses', ('cache',))
+SHEETS_OUTBOX_BACKLOG = metrics.gauge(
+    'sheets_outbox_backlog', 'Rolls not yet delivered to Google Sheets', aggregate='max')
+SHEETS_OUTBOX_OLDEST_AGE = metrics.gauge(
+    'sheets_outbox_oldest_age_seconds', 'Age of the oldest roll not yet delivered to Google Sheets', aggregate='max')
+SHEETS_OUTBOX_ROWS = metrics.counter(
+    'sheets_outbox_rows_total', 'Outbox rows by dispatch outcome', ('outcome',))
+SHEETS_OUTBOX_BATCH_SIZE = metrics.histogram(
+    'sheets_outbox_batch_size', 'Rows sent to Google Sheets per append call', (), OUTBOX_BATCH_BUCKETS)
+SHARED_STATE_LATENCY = metrics.histogram(
+    'shared_state_duration_seconds', 'Round trips to the shared state server', ('operation',))
+SHARED_STATE_ERRORS = metrics.counter(
+    'shared_state_errors_total', 'Failed round trips to the shared state server', ('operation',))
+ROLL_FILTER_CHECKS = metrics.counter(
+    'roll_filter_checks_total', 'Has-rolled checks by roll filter answer (false_positive: the database said no)',
+    ('result',))
+ROLL_FILTER_BYTES = metrics.gauge('roll_filter_bytes', 'Memory held by the roll filter bit arrays')
+ROLL_FILTER_ENTRIES = metrics.gauge(
+    'roll_filter_entries', 'Players in the current round\'s roll filter', aggregate='max')
+ROLL_FILTER_FALSE_POSITIVE_RATE = metrics.gauge(
+    'roll_filter_false_positive_rate', 'Expected roll filter false-positive rate at its current fill', aggregate='max')
+
+
+def start_request():
+    g.metrics_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_query_seconds = 0.0
+
+
+def finish_request(response):
+    """Record latency and query statistics of the current request"""
+    start = g.get('metrics_start')
+    if start is None or not metrics.enabled:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_LATENCY.observe(time.perf_counter() - start, endpoint, request.method)
+    HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    queries = g.get('db_queries', 0)
+    DB_QUERIES_PER_REQUEST.observe(queries, endpoint)
+    if queries:
+        DB_QUERIES.inc(endpoint, amount=queries)
+        DB_QUERY_SECONDS.inc(endpoint, amount=g.db_query_seconds)
+    g.metrics_start = None
+    return response
+
+
+def instrument_engine(engine):
+    """Count queries and their time against the request that issued them"""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start'].pop()
+        if has_request_context() and 'db_queries' in g:
+            g.db_queries += 1
+            g.db_query_seconds += time.perf_counter() - started
+
+    def handle_error(context):
+        # after_cursor_execute does not run for failed statements
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
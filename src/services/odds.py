@@ -0,0 +1,286 @@
+"""
+Odds for dice expressions: exact sum distributions and Monte Carlo simulation.
+
+Plain NdM(+k) sums are computed exactly by iterated convolution, reusing the
+memoized distribution for fewer dice. Rule variants such as dropping the
+lowest dice or rerolling low faces are simulated, vectorized with numpy when
+available and spread over a process pool for large trial counts. Finished
+distributions are kept in an LRU cache keyed by the normalized expression.
+"""
+
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from src.services import lifecycle
+from src.services.dice_engine import DiceExpression, parse_expression
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Exact convolution is O(count * count * sides) big-int work; beyond this we simulate
+MAX_EXACT_DICE = 100
+MAX_EXACT_OUTCOMES = 5000
+DEFAULT_TRIALS = 100000
+# Simulations are CPU-bound and trials/seed are caller-chosen (so they bypass
+# the cache); keep the worst case well under a second of pool time
+MAX_TRIALS = 200000
+# Upper bound on dice thrown by one simulation (trials * count)
+MAX_SIMULATED_DICE = 2000000
+# Dice per worker task; smaller simulations run inline
+CHUNK_DICE = 1000000
+
+
+class Variant(NamedTuple):
+    drop_lowest: int = 0
+    drop_highest: int = 0
+    reroll_below: int = 0  # reroll (once) any die showing this value or less
+
+    @property
+    def is_plain(self) -> bool:
+        return not (self.drop_lowest or self.drop_highest or self.reroll_below)
+
+    def __str__(self):
+        parts = []
+        if self.drop_lowest:
+            parts.append(f"dl{self.drop_lowest}")
+        if self.drop_highest:
+            parts.append(f"dh{self.drop_highest}")
+        if self.reroll_below:
+            parts.append(f"r<={self.reroll_below}")
+        return ','.join(parts)
+
+
+class Distribution(NamedTuple):
+    expression: str
+    method: str  # 'exact' or 'monte_carlo'
+    minimum: int
+    weights: Tuple  # weights[i] is the weight of total minimum + i
+    trials: int  # 0 for exact distributions
+
+    @property
+    def maximum(self) -> int:
+        return self.minimum + len(self.weights) - 1
+
+    @property
+    def total_weight(self) -> int:
+        return sum(self.weights)
+
+    def probability(self, total: int) -> float:
+        index = total - self.minimum
+        if 0 <= index < len(self.weights):
+            return self.weights[index] / self.total_weight
+        return 0.0
+
+    def cumulative(self, total: int) -> Tuple[float, float]:
+        """Return (P(X < total), P(X <= total))"""
+        index = total - self.minimum
+        weight = self.total_weight
+        below = sum(self.weights[:max(0, min(index, len(self.weights)))])
+        at = self.weights[index] if 0 <= index < len(self.weights) else 0
+        return below / weight, (below + at) / weight
+
+    def mean(self) -> float:
+        weight = self.total_weight
+        return sum((self.minimum + i) * w for i, w in enumerate(self.weights)) / weight
+
+
+@lru_cache(maxsize=2048)
+def _exact_counts(count: int, sides: int) -> Tuple[int, ...]:
+    """
+    Number of ways to reach each sum (count..count*sides) with count dice.
+
+    Built from the count-1 distribution with a sliding-window convolution,
+    so every smaller count is memoized along the way.
+    """
+    if count == 1:
+        return (1,) * sides
+
+    previous = _exact_counts(count - 1, sides)
+    length = len(previous) + sides - 1
+    counts = [0] * length
+    window = 0
+    for k in range(length):
+        # Ways for sum k = sum of previous[k - sides + 1 .. k]
+        if k < len(previous):
+            window += previous[k]
+        if k - sides >= 0:
+            window -= previous[k - sides]
+        counts[k] = window
+    return tuple(counts)
+
+
+def is_exact(expression: DiceExpression, variant: Variant) -> bool:
+    """Whether the distribution is computed exactly rather than simulated"""
+    return (variant.is_plain and expression.count <= MAX_EXACT_DICE
+            and expression.count * expression.sides <= MAX_EXACT_OUTCOMES)
+
+
+def exact_distribution(expression: DiceExpression) -> Distribution:
+    if not is_exact(expression, Variant()):
+        raise ValueError("Expression is too large for an exact distribution")
+    # Build up iteratively so the memoized recursion never goes deep
+    for n in range(1, expression.count):
+        _exact_counts(n, expression.sides)
+    counts = _exact_counts(expression.count, expression.sides)
+    return Distribution(str(expression), 'exact', expression.min_total, counts, 0)
+
+
+def _simulate_chunk(count: int, sides: int, variant: Tuple[int, int, int],
+                    trials: int, seed: Optional[int]) -> Dict[int, int]:
+    """Simulate trials rolls and return a {sum_of_kept_dice: occurrences} histogram"""
+    drop_lowest, drop_highest, reroll_below = variant
+    keep_end = count - drop_highest
+
+    if NUMPY_AVAILABLE:
+        rng = np.random.default_rng(seed)
+        values = rng.integers(1, sides + 1, size=(trials, count), dtype=np.int16)
+        if reroll_below:
+            mask = values <= reroll_below
+            values[mask] = rng.integers(1, sides + 1, size=int(mask.sum()), dtype=np.int16)
+        if drop_lowest or drop_highest:
+            values.sort(axis=1)
+            values = values[:, drop_lowest:keep_end]
+        totals = values.sum(axis=1, dtype=np.int64)
+        occurrences = np.bincount(totals)
+        return {int(t): int(c) for t, c in enumerate(occurrences) if c}
+
+    rng = random.Random(seed)
+    rand = rng.random
+    histogram = {}
+    for _ in range(trials):
+        dice = [int(rand() * sides) + 1 for _ in range(count)]
+        if reroll_below:
+            dice = [d if d > reroll_below else int(rand() * sides) + 1 for d in dice]
+        if drop_lowest or drop_highest:
+            dice.sort()
+            dice = dice[drop_lowest:keep_end]
+        total = sum(dice)
+        histogram[total] = histogram.get(total, 0) + 1
+    return histogram
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                workers = int(os.environ.get('ODDS_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+                # spawn, not fork: the app process runs threads and holds DB connections
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+@lifecycle.on_shutdown
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def simulate_distribution(expression: DiceExpression, variant: Variant,
+                          trials: int = DEFAULT_TRIALS, seed: Optional[int] = None) -> Distribution:
+    kept = expression.count - variant.drop_lowest - variant.drop_highest
+    if min(variant) < 0:
+        raise ValueError("Variant options cannot be negative")
+    if kept < 1:
+        raise ValueError("Cannot drop all dice")
+    if variant.reroll_below >= expression.sides:
+        raise ValueError("reroll_below must be lower than the number of sides")
+    if not 1 <= trials <= MAX_TRIALS:
+        raise ValueError(f"trials must be between 1 and {MAX_TRIALS}")
+    if trials * expression.count > MAX_SIMULATED_DICE:
+        raise ValueError("Too many dice to simulate; lower trials or the number of dice")
+
+    args = (expression.count, expression.sides, tuple(variant))
+    chunk_trials = max(1, CHUNK_DICE // expression.count)
+    if trials <= chunk_trials:
+        histograms = [_simulate_chunk(*args, trials, seed)]
+    else:
+        chunks = [chunk_trials] * (trials // chunk_trials)
+        if trials % chunk_trials:
+            chunks.append(trials % chunk_trials)
+        pool = _get_pool()
+        # Distinct, reproducible seed per chunk when a seed is given
+        futures = [
+            pool.submit(_simulate_chunk, *args, n, None if seed is None else seed + i)
+            for i, n in enumerate(chunks)
+        ]
+        histograms = [future.result() for future in futures]
+
+    merged = {}
+    for histogram in histograms:
+        for total, occurrences in histogram.items():
+            merged[total] = merged.get(total, 0) + occurrences
+
+    low, high = kept, kept * expression.sides
+    weights = tuple(merged.get(t, 0) for t in range(low, high + 1))
+    return Distribution(
+        f"{expression}{' ' + str(variant) if not variant.is_plain else ''}",
+        'monte_carlo', low + expression.modifier, weights, trials
+    )
+
+
+@lru_cache(maxsize=int(os.environ.get('ODDS_CACHE_SIZE', 256)))
+def _cached_distribution(expression: DiceExpression, variant: Variant,
+                         trials: int, seed: Optional[int]) -> Distribution:
+    if is_exact(expression, variant):
+        return exact_distribution(expression)
+    return simulate_distribution(expression, variant, trials, seed)
+
+
+def get_distribution(expression: str, variant: Optional[Variant] = None,
+                     trials: int = DEFAULT_TRIALS, seed: Optional[int] = None) -> Distribution:
+    """Distribution for an expression, served from the LRU cache when possible"""
+    parsed = parse_expression(expression)
+    variant = variant or Variant()
+    if is_exact(parsed, variant):
+        # Exact results do not depend on trials/seed; keep one cache entry
+        trials, seed = 0, None
+    return _cached_distribution(parsed, variant, trials, seed)
+
+
+def cache_info():
+    return _cached_distribution.cache_info()
+
+
+def describe(distribution: Distribution, total: Optional[int] = None,
+             include_distribution: bool = True) -> Dict:
+    """JSON-ready summary of a distribution, with percentile info for total"""
+    weight = distribution.total_weight
+    result = {
+        'expression': distribution.expression,
+        'method': distribution.method,
+        'min': distribution.minimum,
+        'max': distribution.maximum,
+        'mean': round(distribution.mean(), 4),
+    }
+    if distribution.trials:
+        result['trials'] = distribution.trials
+    if include_distribution:
+        result['distribution'] = {
+            str(distribution.minimum + i): w / weight
+            for i, w in enumerate(distribution.weights) if w
+        }
+    if total is not None:
+        below, at_most = distribution.cumulative(total)
+        result['total'] = total
+        result['probability_exact'] = at_most - below
+        result['probability_at_most'] = at_most
+        result['probability_at_least'] = 1 - below
+        # Share of rolls this total beats, counting ties as half
+        result['percentile'] = round((below + (at_most - below) / 2) * 100, 2)
+    return result
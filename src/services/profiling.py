@@ -0,0 +1,232 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when one of the triggers below matches:
+
+    PROFILING_ENABLED=true      every request
+    PROFILE_SAMPLE_RATE=0.01    a random 1% of requests
+    X-Profile header            requests signed with PROFILE_SECRET
+
+While a request runs, a sampler thread records the request thread's stack
+every PROFILE_INTERVAL_MS. The samples are written in collapsed-stack
+format (one "outer;...;inner count" line per distinct stack, ready for
+flamegraph.pl or speedscope) to PROFILE_DIR, which keeps only the newest
+PROFILE_MAX_FILES profiles. Without any trigger configured the middleware is
+not installed at all.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from werkzeug.wsgi import ClosingIterator
+
+PROFILE_SUFFIX = '.folded'
+PROFILE_NAME = re.compile(r'^(\d+)-(\d+)-([A-Z]+)-([\w.-]*)-(\d+)ms\.folded$')
+# Never profile the endpoints that serve the profiles
+EXCLUDED_PREFIXES = ('/api/admin/profiles', '/metrics')
+
+
+def sign(secret: str, method: str, path: str, expires: int) -> str:
+    message = f"{method.upper()}:{path}:{expires}".encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def profile_header(secret: str, method: str, path: str, ttl: int = 300) -> str:
+    """Value for the X-Profile header that requests a profile of one route"""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{sign(secret, method, path, expires)}"
+
+
+def verify_header(secret: str, value: str, method: str, path: str) -> bool:
+    expires, _, signature = value.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, sign(secret, method, path, int(expires)))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(frame)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Bounded ring of collapsed-stack files, oldest removed first"""
+
+    def __init__(self, directory: Optional[str] = None, max_files: Optional[int] = None):
+        self.directory = directory or os.environ.get(
+            'PROFILE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'profiles')
+        )
+        if max_files is None:
+            max_files = int(os.environ.get('PROFILE_MAX_FILES', 50))
+        self.max_files = max_files
+
+    def save(self, method: str, path: str, duration: float, collapsed: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '_', path.strip('/'))[:60] or 'root'
+        name = f"{int(time.time() * 1000)}-{os.getpid()}-{method}-{slug}-{int(duration * 1000)}ms{PROFILE_SUFFIX}"
+        temp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(temp_path, 'w') as f:
+            f.write(collapsed)
+        os.replace(temp_path, os.path.join(self.directory, name))
+        self._prune()
+        return name
+
+    def _names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if PROFILE_NAME.match(name))
+
+    def _prune(self):
+        names = self._names()
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass  # Another worker pruned it first
+
+    def list(self) -> List[Dict]:
+        """Stored profiles, newest first"""
+        profiles = []
+        for name in reversed(self._names()):
+            created_ms, pid, method, slug, duration_ms = PROFILE_NAME.match(name).groups()
+            path = os.path.join(self.directory, name)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            profiles.append({
+                'name': name,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(int(created_ms) / 1000)),
+                'pid': int(pid),
+                'method': method,
+                'route': slug,
+                'duration_ms': int(duration_ms),
+                'bytes': size,
+            })
+        return profiles
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Full path of a stored profile, or None for unknown or unsafe names"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles the requests selected by the triggers"""
+
+    def __init__(self, app, store: ProfileStore, always: bool = False, sample_rate: float = 0.0,
+                 secret: Optional[str] = None, interval: float = 0.005):
+        self.app = app
+        self.store = store
+        self.always = always
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.interval = interval
+
+    def should_profile(self, environ) -> bool:
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(EXCLUDED_PREFIXES):
+            return False
+        if self.always:
+            return True
+        header = environ.get('HTTP_X_PROFILE')
+        if header and self.secret:
+            return verify_header(self.secret, header, environ.get('REQUEST_METHOD', 'GET'), path)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self.should_profile(environ):
+            return self.app(environ, start_response)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+
+        def finish():
+            # Runs when the server closes the response, after streaming bodies are sent
+            sampler.stop()
+            try:
+                self.store.save(environ.get('REQUEST_METHOD', 'GET'), environ.get('PATH_INFO', '/'),
+                                time.perf_counter() - start, sampler.collapsed())
+            except OSError as e:
+                logging.error("Could not save profile: %s", e)
+
+        try:
+            return ClosingIterator(self.app(environ, start_response), [finish])
+        except Exception:
+            finish()
+            raise
+
+
+def profiling_config() -> Dict:
+    return {
+        'always': os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true',
+        'sample_rate': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        'secret': os.environ.get('PROFILE_SECRET') or None,
+        'interval': float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+    }
+
+
+def install_profiler(app) -> bool:
+    """Wrap the app in ProfilingMiddleware when a trigger is configured"""
+    config = profiling_config()
+    if not (config['always'] or config['sample_rate'] > 0 or config['secret']):
+        return False
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, profile_store, **config)
+    return True
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    secret = os.environ.get('PROFILE_SECRET')
+    return bool(secret and token and hmac.compare_digest(token, secret))
+
+
+# Global instance
+profile_store = ProfileStore()
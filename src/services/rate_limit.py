@@ -0,0 +1,342 @@
+"""
+Rate limiting and admission control for the game API.
+
+Requests are counted in sliding windows (a log of hit timestamps per key),
+either in process memory, in a small SQLite file shared by all workers on
+the same host, or in the shared state server common to every node.
+Sheets-bound work is additionally capped by a per-process concurrency
+limit that sheds load with 503 instead of queueing, and optionally by a cap
+common to every worker kept on the shared state server.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import jsonify, request
+
+from src.services import lifecycle
+from src.services.shared_state import SharedStateError, shared_state
+from src.services.structured_logging import ThrottledLogger
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+
+def parse_rule(rule: str) -> Tuple[int, int]:
+    """Parse a rule such as '10/minute' into (limit, window_seconds)"""
+    count, _, period = rule.partition('/')
+    period = period.strip().lower().rstrip('s') or 'minute'
+    if period not in PERIODS:
+        raise ValueError(f"Unknown rate limit period in rule: {rule}")
+    return int(count), PERIODS[period]
+
+
+class MemoryWindowStore:
+    """Sliding window log kept in process memory (one deque per key)"""
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        """Record a hit for key. Returns (allowed, retry_after_seconds)"""
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = deque()
+                self._hits[key] = hits
+                # Bound memory by evicting the least recently used keys
+                while len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            else:
+                self._hits.move_to_end(key)
+
+            cutoff = now - window
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+
+            if len(hits) >= limit:
+                return False, hits[0] + window - now
+
+            hits.append(now)
+            return True, 0.0
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+
+
+class SQLiteWindowStore:
+    """Sliding window log shared between worker processes through SQLite"""
+
+    CLEANUP_INTERVAL = 60
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+        # SQLite connections must not cross a fork
+        lifecycle.on_fork(self._reset_connections)
+        conn = self._connection()
+        conn.execute('CREATE TABLE IF NOT EXISTS rate_limit_hits (key TEXT NOT NULL, ts REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_key_ts ON rate_limit_hits (key, ts)')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        conn = self._connection()
+        cutoff = now - window
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now - self._last_cleanup > self.CLEANUP_INTERVAL:
+                # Nothing outlives the longest supported window
+                conn.execute('DELETE FROM rate_limit_hits WHERE ts <= ?', (now - PERIODS['day'],))
+                self._last_cleanup = now
+            conn.execute('DELETE FROM rate_limit_hits WHERE key = ? AND ts <= ?', (key, cutoff))
+            count, oldest = conn.execute(
+                'SELECT COUNT(*), MIN(ts) FROM rate_limit_hits WHERE key = ?', (key,)
+            ).fetchone()
+            if count >= limit:
+                conn.execute('COMMIT')
+                return False, oldest + window - now
+            conn.execute('INSERT INTO rate_limit_hits (key, ts) VALUES (?, ?)', (key, now))
+            conn.execute('COMMIT')
+            return True, 0.0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limit_hits')
+
+
+class SharedWindowStore:
+    """Sliding window log in a sorted set on the shared state server, common to every node"""
+
+    def __init__(self, state):
+        self.state = state
+        self._unavailable_log = ThrottledLogger(logger)
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        zkey = self.state.key(f"ratelimit:{key}")
+        member = f"{now!r}:{uuid.uuid4().hex[:8]}"
+        try:
+            _, _, count, oldest, _ = self.state.backend.pipeline([
+                ('ZREMRANGEBYSCORE', zkey, '-inf', now - window),
+                ('ZADD', zkey, now, member),
+                ('ZCARD', zkey),
+                ('ZRANGE', zkey, 0, 0, 'WITHSCORES'),
+                ('PEXPIRE', zkey, int(window * 1000)),
+            ], transaction=True)
+            if count <= limit:
+                return True, 0.0
+            # Over the limit: take this hit back out, as the other stores never record it
+            self.state.backend.execute('ZREM', zkey, member)
+            return False, float(oldest[1]) + window - now
+        except SharedStateError as e:
+            # Fail open: losing the shared server must not take the game down with it
+            self._unavailable_log.warning("Rate limit store unavailable, allowing request: %s", e)
+            return True, 0.0
+
+
+def create_store():
+    """Build the window store selected by RATE_LIMIT_STORAGE ('memory', 'sqlite:///path' or 'shared')"""
+    storage = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    if storage.startswith('sqlite:///'):
+        return SQLiteWindowStore(storage[len('sqlite:///'):])
+    if storage == 'shared':
+        if not shared_state.enabled:
+            raise ValueError("RATE_LIMIT_STORAGE=shared needs SHARED_STATE_URL")
+        return SharedWindowStore(shared_state)
+    return MemoryWindowStore()
+
+
+class RateLimiter:
+    def __init__(self, store=None, enabled: Optional[bool] = None):
+        self.store = store or create_store()
+        if enabled is None:
+            enabled = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+        self.enabled = enabled
+
+    def check(self, scope: str, identity: str, rule: str) -> Tuple[bool, float]:
+        limit, window = parse_rule(rule)
+        return self.store.hit(f"{scope}:{identity}", limit, window, time.time())
+
+    def limit(self, scope: str, per_ip: Optional[str] = None, per_username: Optional[str] = None):
+        """
+        Decorator limiting a route per client IP and/or per username.
+
+        Args:
+            scope: Name for the limited operation, keeps counters of routes apart
+            per_ip: Rule such as '30/minute' applied to the client address
+            per_username: Rule applied to the 'username' in the JSON body or URL
+        """
+        def decorator(view: Callable):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                checks = []
+                if per_ip:
+                    checks.append(('ip', client_ip(), per_ip))
+                if per_username:
+                    username = request_username(kwargs)
+                    if username:
+                        checks.append(('user', username, per_username))
+
+                for kind, identity, rule in checks:
+                    allowed, retry_after = self.check(f"{scope}:{kind}", identity, rule)
+                    if not allowed:
+                        return too_many_requests(retry_after)
+
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests of one kind per process and sheds the excess.
+
+    The per-process cap (env_var) multiplies with the number of workers and
+    nodes. A cap for the whole deployment (env_var + '_GLOBAL') is kept on
+    the shared state server when SHARED_STATE_URL is set: each request holds
+    a lease in a sorted set scored by its expiry, so slots of a worker that
+    died free themselves after `lease` seconds.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, env_var: str = 'SHEETS_MAX_CONCURRENCY',
+                 default: int = 8, max_global: Optional[int] = None, name: str = 'sheets',
+                 lease: float = 60, state=None):
+        if max_concurrent is None:
+            max_concurrent = int(os.environ.get(env_var, default))
+        if max_global is None:
+            max_global = int(os.environ.get(f"{env_var}_GLOBAL", 0))
+        self.max_concurrent = max_concurrent
+        self.max_global = max_global
+        self.name = name
+        self.lease = lease
+        self.state = state or shared_state
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._unavailable_log = ThrottledLogger(logger)
+
+    def _acquire_global(self) -> Optional[str]:
+        """A lease on a global slot: its member, '' when there is no global cap to hold, None when full"""
+        if not self.max_global or not self.state.enabled:
+            return ''
+        key = self.state.key(f"inflight:{self.name}")
+        now = time.time()
+        member = f"{now!r}:{uuid.uuid4().hex[:8]}"
+        try:
+            _, _, count, _ = self.state.backend.pipeline([
+                ('ZREMRANGEBYSCORE', key, '-inf', now),
+                ('ZADD', key, now + self.lease, member),
+                ('ZCARD', key),
+                ('EXPIRE', key, math.ceil(self.lease)),
+            ], transaction=True)
+            if count <= self.max_global:
+                return member
+            self.state.backend.execute('ZREM', key, member)
+            return None
+        except SharedStateError as e:
+            # Fail open, as the shared rate limit store does
+            self._unavailable_log.warning("Global %s concurrency cap unavailable, allowing request: %s",
+                                          self.name, e)
+            return ''
+
+    def _release_global(self, member: str):
+        if not member:
+            return
+        try:
+            self.state.backend.execute('ZREM', self.state.key(f"inflight:{self.name}"), member)
+        except SharedStateError as e:
+            # The lease expires on its own
+            self._unavailable_log.warning("Could not release a global %s slot: %s", self.name, e)
+
+    def __call__(self, view: Callable):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            # Never wait for a slot: a queue here only adds latency to every caller
+            if not self._semaphore.acquire(blocking=False):
+                return server_busy()
+            try:
+                member = self._acquire_global()
+                if member is None:
+                    return server_busy()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    self._release_global(member)
+            finally:
+                self._semaphore.release()
+        return wrapped
+
+
+def client_ip() -> str:
+    """
+    The client address. ProxyFix (see create_app) sets remote_addr from the
+    X-Forwarded-For entries of the TRUSTED_PROXY_HOPS trusted proxies only;
+    entries a client adds itself are ignored, so it cannot pick its bucket.
+    """
+    return request.remote_addr or 'unknown'
+
+
+def request_username(view_args: dict) -> Optional[str]:
+    if view_args.get('username'):
+        return view_args['username']
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('username'), str):
+        return data['username']
+    return None
+
+
+def server_busy():
+    response = jsonify({'error': 'Server busy, please retry shortly', 'retry_after': 1})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def too_many_requests(retry_after: float):
+    seconds = max(1, math.ceil(retry_after))
+    response = jsonify({'error': 'Too many requests, please slow down', 'retry_after': seconds})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+# Global instances
+rate_limiter = RateLimiter()
+sheets_admission = ConcurrencyLimiter()
+# Monte Carlo odds simulations are CPU-bound; a few at a time per worker
+odds_admission = ConcurrencyLimiter(env_var='ODDS_MAX_CONCURRENCY', default=2, name='odds')
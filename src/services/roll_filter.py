@@ -0,0 +1,414 @@
+"""
+Bloom filter of the players who have rolled in the current round.
+
+/api/dice/check runs on every login, and during launch spikes most callers
+are new players who have not rolled. The filter answers "definitely not
+rolled" for them from memory; "maybe rolled" still goes to the database,
+which has the final word (a "no" from it is counted as a false positive).
+roll_dice uses it the same way to skip its already-rolled query.
+
+Each worker builds its filter on first use from the round's DiceRoll rows.
+Every roll is appended to a per-round journal before its transaction
+commits, and workers read the new journal entries before answering, so a
+roll in one worker reaches all of them; a worker dying in between leaves
+only a false positive. The journal is a file next to the database, or a
+string on the shared state server when SHARED_STATE_URL is set (every node
+then sees it). /api/reset starts a new journal, and workers seeing it
+rebuild from the database. A new round starts a new filter, and filters
+are also rebuilt every ROLL_FILTER_MAX_AGE seconds. One thread scans the
+database for a rebuild while the others keep using the old filter (or ask
+the database when there is none yet), and the new one is swapped in.
+
+Negatives are only trusted when every writer of the database sees the
+journal: a shared journal, a SQLite database (one node), or a file journal
+declared shared with ROLL_FILTER_JOURNAL_SHARED. Otherwise, e.g. several
+nodes on one DATABASE_URL without SHARED_STATE_URL, another node's rolls
+would never reach this node's filter, so every check goes to the database.
+
+The filter is sized for ROLL_FILTER_CAPACITY players at
+ROLL_FILTER_ERROR_RATE false positives, but never above
+ROLL_FILTER_MAX_BYTES. When more players than that have rolled, it is
+rebuilt twice as large (still within the cap).
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Iterable, Optional, Tuple
+
+from src.models.user import DiceRoll, User, current_round_day, db
+from src.services.metrics import (ROLL_FILTER_BYTES, ROLL_FILTER_CHECKS, ROLL_FILTER_ENTRIES,
+                                  ROLL_FILTER_FALSE_POSITIVE_RATE, metrics)
+from src.services.shared_state import SharedStateError, shared_state
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float, max_bytes: Optional[int] = None):
+        self.capacity = max(1, capacity)
+        size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_bytes:
+            size = min(size, max_bytes * 8)
+        self.size = max(64, size)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Two 64-bit hashes combined (Kirsch-Mitzenmacher) stand in for k independent ones
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        added = False
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+        # Items whose bits were all set already are (probably) repeats
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate with the items added so far"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+# Journals: usernames as JSON strings, one per line, appended after each roll
+
+class FileJournal:
+    """
+    One file per round. Its first line is a random token, so a journal
+    replaced by a reset is recognised even if the new file gets the old
+    inode number. Only the workers of this node see it, unless the
+    directory is shared.
+    """
+
+    def __init__(self, directory: str, shared: bool = False):
+        self.directory = directory
+        self.shared = shared
+
+    def path(self, day: date) -> str:
+        return os.path.join(self.directory, f"rolled-{day.isoformat()}.log")
+
+    def _create(self, path: str, replace: bool):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(f"#{uuid.uuid4().hex}\n")
+        try:
+            if replace:
+                os.replace(temp_path, path)
+            else:
+                # Create only if absent: a concurrent creator's file (and its rolls) wins
+                os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def append(self, day: date, data: bytes):
+        path = self.path(day)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            self._create(path, replace=False)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def version(self, day: date):
+        """Cheap change check: (inode, size)"""
+        try:
+            stat = os.stat(self.path(day))
+        except FileNotFoundError:
+            return (None, 0)
+        return (stat.st_ino, stat.st_size)
+
+    def read(self, day: date, offset: int) -> Tuple[Optional[str], bytes, int]:
+        """(token, entries from offset on, offset of the first entry)"""
+        try:
+            with open(self.path(day), 'rb') as f:
+                header = f.readline()
+                start = max(offset, len(header))
+                f.seek(start)
+                return header.decode('utf-8').strip(), f.read(), start
+        except FileNotFoundError:
+            return None, b'', 0
+
+    def reset(self, day: date):
+        self._create(self.path(day), replace=True)
+
+    def prune(self, day: date):
+        """Delete journals of rounds before the previous one"""
+        cutoff = f"rolled-{(day - timedelta(days=1)).isoformat()}.log"
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith('rolled-') and name.endswith('.log') and name < cutoff:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class SharedJournal:
+    """One string per round on the shared state server, plus an epoch bumped by resets"""
+
+    shared = True
+
+    def __init__(self, state):
+        self.state = state
+
+    def _keys(self, day: date):
+        key = self.state.key(f"rolled:{day.isoformat()}")
+        return key, f"{key}:epoch"
+
+    def append(self, day: date, data: bytes):
+        key, epoch_key = self._keys(day)
+        self.state.backend.pipeline([
+            ('APPEND', key, data.decode('utf-8')),
+            ('EXPIRE', key, 3 * 86400),
+        ])
+
+    def version(self, day: date):
+        key, epoch_key = self._keys(day)
+        epoch, size = self.state.backend.pipeline([('GET', epoch_key), ('STRLEN', key)])
+        return (epoch or '0', size)
+
+    def read(self, day: date, offset: int) -> Tuple[Optional[str], bytes, int]:
+        key, epoch_key = self._keys(day)
+        epoch, data = self.state.backend.pipeline([('GET', epoch_key), ('GETRANGE', key, offset, -1)])
+        return epoch or '0', (data or '').encode('utf-8'), offset
+
+    def reset(self, day: date):
+        key, epoch_key = self._keys(day)
+        self.state.backend.pipeline([('DEL', key), ('INCR', epoch_key), ('EXPIRE', epoch_key, 3 * 86400)],
+                                    transaction=True)
+
+    def prune(self, day: date):
+        # Old rounds expire on their own
+        pass
+
+
+def load_rolled_usernames(day: date) -> Iterable[str]:
+    """Players with a roll in the given round, from the database"""
+    query = (db.session.query(User.username)
+             .join(DiceRoll, DiceRoll.user_id == User.id)
+             .filter(DiceRoll.round_day == day))
+    return (username for (username,) in query.yield_per(5000))
+
+
+class RollFilter:
+    def __init__(self, capacity: Optional[int] = None, error_rate: Optional[float] = None,
+                 max_bytes: Optional[int] = None, enabled: Optional[bool] = None,
+                 max_age: Optional[float] = None):
+        self.capacity = capacity or int(os.environ.get('ROLL_FILTER_CAPACITY', 100000))
+        self.error_rate = error_rate or float(os.environ.get('ROLL_FILTER_ERROR_RATE', 0.01))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('ROLL_FILTER_MAX_BYTES', 16 * 1024 * 1024))
+        if enabled is None:
+            enabled = os.environ.get('ROLL_FILTER_ENABLED', 'true').lower() != 'false'
+        self.enabled = enabled
+        self.max_age = max_age if max_age is not None else float(os.environ.get('ROLL_FILTER_MAX_AGE', 300))
+        if shared_state.enabled:
+            self.journal = SharedJournal(shared_state)
+        else:
+            self.journal = FileJournal(
+                os.environ.get('ROLL_FILTER_DIR',
+                               os.path.join(os.path.dirname(__file__), '..', 'database', 'roll_filter')),
+                shared=os.environ.get('ROLL_FILTER_JOURNAL_SHARED', 'false').lower() == 'true')
+
+        self._lock = threading.Lock()
+        self._trusted: Optional[bool] = None
+        self._filter: Optional[BloomFilter] = None
+        self._built_at = 0.0
+        self._day = None
+        self._version = None
+        self._token = None
+        self._offset = 0
+        self._outgrew = False
+        self._building = False
+
+    def _build(self, day: date) -> Tuple[BloomFilter, object, Optional[str], int]:
+        """A filter of the round's rolls: (filter, journal version, token, offset). Runs without _lock"""
+        while True:
+            # Read the journal position first: rolls after it are picked up by the
+            # next sync, rolls before it are in the journal data read here
+            version = self.journal.version(day)
+            token, data, start = self.journal.read(day, 0)
+            bloom = BloomFilter(self.capacity, self.error_rate, self.max_bytes)
+            for username in load_rolled_usernames(day):
+                bloom.add(username)
+            offset = start + self._apply(bloom, data)
+            if not self._outgrown(bloom):
+                return bloom, version, token, offset
+            self.capacity = bloom.capacity * 2
+
+    def _apply(self, bloom: BloomFilter, data: bytes) -> int:
+        """Add journal entries; returns the bytes consumed"""
+        # Only whole lines; a line without its newline is still being written
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line.startswith(b'"'):
+                try:
+                    bloom.add(json.loads(line))
+                except ValueError:
+                    continue
+        return end
+
+    def _outgrown(self, bloom: BloomFilter) -> bool:
+        return bloom.count > bloom.capacity and bloom.memory_bytes < self.max_bytes
+
+    def _catch_up(self, day: date):
+        """Read new journal entries, or drop the filter if the journal was replaced"""
+        version = self.journal.version(day)
+        if version == self._version:
+            return
+        identity, size = version
+        if identity != self._version[0] or size < self._offset:
+            self._filter = None
+            return
+        token, data, start = self.journal.read(day, self._offset)
+        if token != self._token:
+            self._filter = None
+            return
+        self._version = version
+        self._offset += self._apply(self._filter, data)
+        if self._outgrown(self._filter):
+            # Still correct, just more false positives: keep it until the larger one is built
+            self.capacity = self._filter.capacity * 2
+            self._outgrew = True
+
+    def _sync(self) -> Optional[BloomFilter]:
+        """
+        The current round's filter, caught up with the journal. The first
+        caller to find it missing or too old builds a new one outside _lock,
+        so record() and other checks never wait on the database scan; until
+        it is swapped in the others get the old filter, or None when there
+        is none for this round.
+        """
+        day = current_round_day()
+        with self._lock:
+            if self._filter is not None and day == self._day:
+                self._catch_up(day)
+            current = self._filter if day == self._day else None
+            # Age rebuilds catch anything the journal missed, e.g. a failed append whose reset failed too
+            expired = self._outgrew or (self.max_age and time.monotonic() - self._built_at > self.max_age)
+            if (current is not None and not expired) or self._building:
+                return current
+            self._building = True
+        built = None
+        try:
+            if self._day != day:
+                self.journal.prune(day)
+            built = self._build(day)
+        finally:
+            with self._lock:
+                self._building = False
+                if built is not None:
+                    bloom, self._version, self._token, self._offset = built
+                    self._filter, self._day = bloom, day
+                    self._built_at = time.monotonic()
+                    self._outgrew = False
+        logger.info("Roll filter built for %s: %s players, %s bytes", day, bloom.count, bloom.memory_bytes)
+        return bloom
+
+    def _active(self) -> bool:
+        """Enabled, and its negatives can be trusted (see the module docstring)"""
+        if not self.enabled:
+            return False
+        if self._trusted is None:
+            self._trusted = self.journal.shared or db.engine.dialect.name == 'sqlite'
+            if not self._trusted:
+                logger.warning("Roll filter off: its file journal is per node but the %s database may be "
+                               "shared; set SHARED_STATE_URL or ROLL_FILTER_JOURNAL_SHARED",
+                               db.engine.dialect.name)
+        return self._trusted
+
+    def might_have_rolled(self, username: str) -> bool:
+        """False: definitely no roll this round. True: maybe, ask the database"""
+        if not self._active():
+            return True
+        try:
+            bloom = self._sync()
+        except (SharedStateError, OSError) as e:
+            logger.warning("Roll filter unavailable: %s", e)
+            return True
+        # None: another thread is building this round's filter
+        found = bloom is None or username in bloom
+        ROLL_FILTER_CHECKS.inc('maybe' if found else 'negative')
+        return found
+
+    def false_positive(self):
+        """The database said no after might_have_rolled said maybe"""
+        if self._active():
+            ROLL_FILTER_CHECKS.inc('false_positive')
+
+    def record(self, username: str) -> bool:
+        """
+        A roll is about to be committed. Call before the commit: a roll that
+        then fails to commit is only a false positive. Returns False if the
+        journal could not be written; the caller must then reset() after
+        committing, so no filter keeps a negative for this player.
+        """
+        if not self._active():
+            return True
+        day = current_round_day()
+        try:
+            self.journal.append(day, (json.dumps(username) + '\n').encode('utf-8'))
+        except (SharedStateError, OSError) as e:
+            logger.warning("Could not journal roll for %s, roll filters will be reset: %s", username, e)
+            return False
+        with self._lock:
+            if self._filter is not None and self._day == day:
+                self._filter.add(username)
+        return True
+
+    def reset(self):
+        """Rolls were deleted: every worker rebuilds from the database"""
+        with self._lock:
+            self._filter = None
+        try:
+            self.journal.reset(current_round_day())
+        except (SharedStateError, OSError) as e:
+            logger.warning("Could not reset the roll filter journal: %s", e)
+
+    def report(self):
+        bloom = self._filter
+        if bloom is None:
+            return
+        ROLL_FILTER_BYTES.set(bloom.memory_bytes)
+        ROLL_FILTER_ENTRIES.set(bloom.count)
+        ROLL_FILTER_FALSE_POSITIVE_RATE.set(round(bloom.false_positive_rate(), 6))
+
+
+# Global instance
+roll_filter = RollFilter()
+
+
+@metrics.collector
+def report_roll_filter():
+    roll_filter.report()
@@ -0,0 +1,818 @@
+"""
+State shared by every node of a deployment: the leaderboard, rate-limit
+counters and response caches.
+
+Each container has its own SQLite file and Sheets fallback file, so with
+several of them /api/rankings depends on which node answers. With
+SHARED_STATE_URL set, nodes keep that state in one place instead:
+
+    redis://host:6379/0   any Redis-protocol server (see fake_redis_server.py)
+    memory://             in this process only; for a single-process server
+
+Both backends speak the same Redis commands: MemoryBackend interprets them
+itself over skip lists, so top-N and rank lookups are O(log n) on either.
+Without SHARED_STATE_URL nothing here is used and every node serves its own
+database, as before.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+from src.services import lifecycle
+from src.services.metrics import SHARED_STATE_ERRORS, SHARED_STATE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class SharedStateError(Exception):
+    """The shared state backend failed or answered with an error"""
+
+
+# Sorted sets
+
+class _Node:
+    __slots__ = ('member', 'score', 'forward', 'span')
+
+    def __init__(self, member, score, level: int):
+        self.member = member
+        self.score = score
+        self.forward = [None] * level
+        # Number of level-0 steps each forward pointer skips, for rank queries
+        self.span = [0] * level
+
+
+class SortedSet:
+    """
+    Members ordered by (score, member) in a skip list with span counts, as
+    in Redis: insert, delete, rank and index lookups are O(log n).
+    """
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _Node(None, None, self.MAX_LEVEL)
+        self.level = 1
+        self.scores: Dict[str, float] = {}
+
+    def __len__(self):
+        return len(self.scores)
+
+    @staticmethod
+    def _before(node: _Node, score: float, member: str) -> bool:
+        return node.score < score or (node.score == score and node.member < member)
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def _insert(self, member: str, score: float):
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        x = self.head
+        for i in range(self.level - 1, -1, -1):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while x.forward[i] is not None and self._before(x.forward[i], score, member):
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.span[i] = len(self.scores)
+            self.level = level
+
+        node = _Node(member, score, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+
+    def _delete(self, member: str, score: float):
+        update = [None] * self.MAX_LEVEL
+        x = self.head
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and self._before(x.forward[i], score, member):
+                x = x.forward[i]
+            update[i] = x
+        node = x.forward[0]
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+
+    def add(self, member: str, score: float, gt: bool = False, lt: bool = False,
+            nx: bool = False, xx: bool = False) -> Tuple[bool, bool]:
+        """Returns (added, changed) with ZADD's GT/LT/NX/XX semantics"""
+        current = self.scores.get(member)
+        if current is None:
+            if xx:
+                return False, False
+            self._insert(member, score)
+            self.scores[member] = score
+            return True, True
+        if nx or score == current or (gt and score <= current) or (lt and score >= current):
+            return False, False
+        self.remove(member)
+        self._insert(member, score)
+        self.scores[member] = score
+        return False, True
+
+    def remove(self, member: str) -> bool:
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        self._delete(member, score)
+        return True
+
+    def rank(self, member: str) -> Optional[int]:
+        """0-based position in ascending order"""
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        traversed = 0
+        x = self.head
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and (
+                    self._before(x.forward[i], score, member)
+                    or (x.forward[i].score == score and x.forward[i].member == member)):
+                traversed += x.span[i]
+                x = x.forward[i]
+            if x is not self.head and x.member == member:
+                return traversed - 1
+        return None
+
+    def _node_at(self, index: int) -> Optional[_Node]:
+        traversed = 0
+        x = self.head
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and traversed + x.span[i] <= index + 1:
+                traversed += x.span[i]
+                x = x.forward[i]
+            if traversed == index + 1:
+                return x
+        return None
+
+    def range(self, start: int, stop: int) -> List[Tuple[str, float]]:
+        """Members at ascending positions start..stop inclusive (negative counts from the end)"""
+        length = len(self.scores)
+        if start < 0:
+            start = max(0, length + start)
+        if stop < 0:
+            stop = length + stop
+        stop = min(stop, length - 1)
+        if start > stop:
+            return []
+        node = self._node_at(start)
+        items = []
+        for _ in range(stop - start + 1):
+            items.append((node.member, node.score))
+            node = node.forward[0]
+        return items
+
+    def members_by_score(self, low: float, high: float) -> List[str]:
+        """Members with low <= score <= high, ascending"""
+        x = self.head
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and x.forward[i].score < low:
+                x = x.forward[i]
+        members = []
+        x = x.forward[0]
+        while x is not None and x.score <= high:
+            members.append(x.member)
+            x = x.forward[0]
+        return members
+
+
+# Backends
+
+def format_score(score: float) -> str:
+    if float(score).is_integer() and abs(score) < 1e17:
+        return str(int(score))
+    return repr(float(score))
+
+
+def parse_score_bound(value: str) -> Tuple[float, bool]:
+    """A ZRANGEBYSCORE-style bound: '-inf', '+inf', '5' or '(5' (exclusive)"""
+    exclusive = value.startswith('(')
+    if exclusive:
+        value = value[1:]
+    return float(value.replace('+inf', 'inf')), exclusive
+
+
+class MemoryBackend:
+    """
+    The subset of Redis the app uses, interpreted in process memory.
+
+    Commands and replies have the same shape as RedisBackend's, so either can
+    be swapped in, and fake_redis_server.py serves this over the network.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._data: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        self._calls = 0
+
+    # Keyspace
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._data.pop(key, None)
+            del self._expires[key]
+            return False
+        return key in self._data
+
+    def _get(self, key: str, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self._data[key] = kind()
+        value = self._data[key]
+        if not isinstance(value, kind):
+            raise SharedStateError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def _drop_if_empty(self, key: str):
+        value = self._data.get(key)
+        if value is not None and not isinstance(value, str) and len(value) == 0:
+            self._data.pop(key)
+            self._expires.pop(key, None)
+
+    def _sweep(self):
+        now = time.time()
+        for key in [k for k, deadline in self._expires.items() if deadline <= now]:
+            self._data.pop(key, None)
+            del self._expires[key]
+
+    # Commands
+
+    def execute(self, *args):
+        if not args:
+            raise SharedStateError('ERR empty command')
+        name = str(args[0]).lower()
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            raise SharedStateError(f"ERR unknown command '{args[0]}'")
+        with self.lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep()
+            try:
+                return handler(*[str(a) for a in args[1:]])
+            except (TypeError, ValueError, IndexError):
+                raise SharedStateError(f"ERR syntax error in '{args[0]}'")
+
+    def pipeline(self, commands: Sequence[Sequence], transaction: bool = False) -> List:
+        """Run commands in order; with transaction=True no other client interleaves"""
+        with self.lock:
+            return [self.execute(*command) for command in commands]
+
+    def cmd_ping(self, message: str = None):
+        return message if message is not None else 'PONG'
+
+    def cmd_get(self, key):
+        return self._get(key, str)
+
+    def cmd_set(self, key, value, *options):
+        options = [o.lower() for o in options]
+        ttl = None
+        if 'ex' in options:
+            ttl = float(options[options.index('ex') + 1])
+        elif 'px' in options:
+            ttl = float(options[options.index('px') + 1]) / 1000
+        if 'nx' in options and self._alive(key):
+            return None
+        if 'xx' in options and not self._alive(key):
+            return None
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.time() + ttl
+        return 'OK'
+
+    # Lengths and offsets are in UTF-8 bytes, as in Redis
+
+    def cmd_append(self, key, value):
+        current = self._get(key, str) or ''
+        self._data[key] = current + value
+        return len(self._data[key].encode('utf-8'))
+
+    def cmd_strlen(self, key):
+        return len((self._get(key, str) or '').encode('utf-8'))
+
+    def cmd_getrange(self, key, start, end):
+        data = (self._get(key, str) or '').encode('utf-8')
+        start, end = int(start), int(end)
+        start = max(0, len(data) + start) if start < 0 else start
+        end = len(data) + end if end < 0 else end
+        return data[start:end + 1].decode('utf-8', errors='replace')
+
+    def cmd_mget(self, *keys):
+        return [self._data[key] if self._alive(key) and isinstance(self._data[key], str) else None
+                for key in keys]
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                deleted += 1
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._get(key, str) or 0) + int(amount)
+        self._data[key] = str(value)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_pexpire(key, float(seconds) * 1000)
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self._expires[key] = time.time() + float(milliseconds) / 1000
+        return 1
+
+    def cmd_pttl(self, key):
+        if not self._alive(key):
+            return -2
+        deadline = self._expires.get(key)
+        return -1 if deadline is None else int((deadline - time.time()) * 1000)
+
+    def cmd_flushdb(self, *options):
+        self._data.clear()
+        self._expires.clear()
+        return 'OK'
+
+    cmd_flushall = cmd_flushdb
+
+    def cmd_dbsize(self):
+        self._sweep()
+        return len(self._data)
+
+    def cmd_select(self, index):
+        return 'OK'
+
+    # Hashes
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError('wrong number of arguments')
+        values = self._get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        return added
+
+    def cmd_hsetnx(self, key, field, value):
+        values = self._get(key, dict, create=True)
+        if field in values:
+            return 0
+        values[field] = value
+        return 1
+
+    def cmd_hget(self, key, field):
+        values = self._get(key, dict)
+        return values.get(field) if values else None
+
+    def cmd_hmget(self, key, *fields):
+        values = self._get(key, dict) or {}
+        return [values.get(field) for field in fields]
+
+    def cmd_hincrby(self, key, field, amount):
+        values = self._get(key, dict, create=True)
+        values[field] = str(int(values.get(field, 0)) + int(amount))
+        return int(values[field])
+
+    def cmd_hdel(self, key, *fields):
+        values = self._get(key, dict)
+        if not values:
+            return 0
+        deleted = sum(1 for field in fields if values.pop(field, None) is not None)
+        self._drop_if_empty(key)
+        return deleted
+
+    def cmd_hlen(self, key):
+        values = self._get(key, dict)
+        return len(values) if values else 0
+
+    # Sorted sets
+
+    def cmd_zadd(self, key, *args):
+        flags = set()
+        while args and args[0].lower() in ('nx', 'xx', 'gt', 'lt', 'ch'):
+            flags.add(args[0].lower())
+            args = args[1:]
+        if not args or len(args) % 2:
+            raise ValueError('wrong number of arguments')
+        zset = self._get(key, SortedSet, create=True)
+        added = changed = 0
+        for score, member in zip(args[::2], args[1::2]):
+            was_added, was_changed = zset.add(member, float(score), gt='gt' in flags, lt='lt' in flags,
+                                              nx='nx' in flags, xx='xx' in flags)
+            added += was_added
+            changed += was_changed
+        self._drop_if_empty(key)
+        return changed if 'ch' in flags else added
+
+    def cmd_zrem(self, key, *members):
+        zset = self._get(key, SortedSet)
+        if not zset:
+            return 0
+        removed = sum(1 for member in members if zset.remove(member))
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_zscore(self, key, member):
+        zset = self._get(key, SortedSet)
+        score = zset.scores.get(member) if zset else None
+        return None if score is None else format_score(score)
+
+    def cmd_zcard(self, key):
+        zset = self._get(key, SortedSet)
+        return len(zset) if zset else 0
+
+    def cmd_zrank(self, key, member):
+        zset = self._get(key, SortedSet)
+        return zset.rank(member) if zset else None
+
+    def cmd_zrevrank(self, key, member):
+        zset = self._get(key, SortedSet)
+        rank = zset.rank(member) if zset else None
+        return None if rank is None else len(zset) - 1 - rank
+
+    def _range_reply(self, items, withscores: bool):
+        if not withscores:
+            return [member for member, _ in items]
+        reply = []
+        for member, score in items:
+            reply.extend((member, format_score(score)))
+        return reply
+
+    def cmd_zrange(self, key, start, stop, *options):
+        zset = self._get(key, SortedSet)
+        items = zset.range(int(start), int(stop)) if zset else []
+        return self._range_reply(items, 'withscores' in (o.lower() for o in options))
+
+    def cmd_zrevrange(self, key, start, stop, *options):
+        zset = self._get(key, SortedSet)
+        items = []
+        if zset:
+            length = len(zset)
+            start, stop = int(start), int(stop)
+            start = length + start if start < 0 else start
+            stop = length + stop if stop < 0 else stop
+            # Descending positions start..stop are ascending positions length-1-stop..length-1-start
+            items = list(reversed(zset.range(max(0, length - 1 - stop), length - 1 - start))) if start <= stop else []
+        return self._range_reply(items, 'withscores' in (o.lower() for o in options))
+
+    @staticmethod
+    def _members_by_score(zset: SortedSet, low, high) -> List[str]:
+        (low, low_open), (high, high_open) = parse_score_bound(str(low)), parse_score_bound(str(high))
+        return [m for m in zset.members_by_score(low, high)
+                if not (low_open and zset.scores[m] == low) and not (high_open and zset.scores[m] == high)]
+
+    def cmd_zcount(self, key, low, high):
+        zset = self._get(key, SortedSet)
+        return len(self._members_by_score(zset, low, high)) if zset else 0
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        zset = self._get(key, SortedSet)
+        if not zset:
+            return 0
+        members = self._members_by_score(zset, low, high)
+        for member in members:
+            zset.remove(member)
+        self._drop_if_empty(key)
+        return len(members)
+
+
+class RedisConnection:
+    """One RESP2 connection"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    @staticmethod
+    def encode(args: Sequence) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+
+    def send(self, commands: Sequence[Sequence]):
+        self.sock.sendall(b''.join(self.encode(command) for command in commands))
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('connection closed by server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            # Returned, not raised, so the rest of a pipeline's replies are still read
+            return SharedStateError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise SharedStateError(f"Unexpected reply from server: {line!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Client for a Redis-protocol server; one connection per thread"""
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip('/') or 0)
+        self.timeout = timeout if timeout is not None else float(os.environ.get('SHARED_STATE_TIMEOUT', 0.5))
+        self._local = threading.local()
+        # Sockets must not be shared between forked workers
+        lifecycle.on_fork(self._reset_connections)
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connect(self) -> RedisConnection:
+        conn = RedisConnection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            conn.send(setup)
+            for reply in [conn.read_reply() for _ in setup]:
+                if isinstance(reply, SharedStateError):
+                    conn.close()
+                    raise reply
+        return conn
+
+    def _round_trip(self, commands: Sequence[Sequence]) -> List:
+        conn = getattr(self._local, 'conn', None)
+        reused = conn is not None
+        for attempt in range(2):
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            try:
+                conn.send(commands)
+                return [conn.read_reply() for _ in commands]
+            except (ConnectionError, BrokenPipeError) as e:
+                conn.close()
+                conn = self._local.conn = None
+                # An idle connection the server already closed; retry once on a fresh one
+                if not reused or attempt:
+                    raise SharedStateError(f"Shared state server unavailable: {e}")
+            except OSError as e:
+                conn.close()
+                self._local.conn = None
+                raise SharedStateError(f"Shared state server unavailable: {e}")
+
+    def _call(self, commands: Sequence[Sequence], operation: str) -> List:
+        start = time.perf_counter()
+        try:
+            return self._round_trip(commands)
+        except SharedStateError:
+            SHARED_STATE_ERRORS.inc(operation)
+            raise
+        finally:
+            SHARED_STATE_LATENCY.observe(time.perf_counter() - start, operation)
+
+    def execute(self, *args):
+        reply = self._call([args], str(args[0]).lower())[0]
+        if isinstance(reply, SharedStateError):
+            raise reply
+        return reply
+
+    def pipeline(self, commands: Sequence[Sequence], transaction: bool = False) -> List:
+        """Send all commands in one round trip; with transaction=True they run as MULTI/EXEC"""
+        if transaction:
+            replies = self._call([('MULTI',), *commands, ('EXEC',)], 'transaction')[-1]
+            if replies is None:
+                raise SharedStateError('Transaction aborted')
+            if isinstance(replies, SharedStateError):
+                raise replies
+        else:
+            replies = self._call(commands, 'pipeline')
+        for reply in replies:
+            if isinstance(reply, SharedStateError):
+                raise reply
+        return replies
+
+
+def create_backend(url: str):
+    """Backend for a SHARED_STATE_URL, or None when shared state is off"""
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme == 'memory':
+        return MemoryBackend()
+    if scheme in ('redis', 'tcp'):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {scheme}")
+
+
+# Shared structures
+
+# Leaderboard scores pack the best total with when it was first reached, so
+# ties go to whoever got there first on any node (user ids differ per node)
+SCORE_SCALE = 10 ** 10
+
+
+def pack_score(total_score: int, achieved_at: datetime) -> float:
+    return float(total_score * SCORE_SCALE + (SCORE_SCALE - 1 - int(achieved_at.timestamp())))
+
+
+def unpack_score(score: float) -> Tuple[int, datetime]:
+    score = int(float(score))
+    achieved = SCORE_SCALE - 1 - score % SCORE_SCALE
+    return score // SCORE_SCALE, datetime.utcfromtimestamp(achieved)
+
+
+class SharedLeaderboard:
+    """Best score per player in one sorted set, plus roll counts and last roll times"""
+
+    def __init__(self, backend, prefix: str):
+        self.backend = backend
+        self.scores_key = f"{prefix}leaderboard"
+        self.rolls_key = f"{prefix}leaderboard:rolls"
+        self.updated_key = f"{prefix}leaderboard:updated"
+        self.seeded_key = f"{prefix}leaderboard:seeded:{socket.gethostname()}"
+        self._seeded = False
+        self._seed_lock = threading.Lock()
+
+    def record(self, username: str, total_score: int, rolled_at: datetime):
+        """Count one roll; the best score only ever goes up"""
+        self.backend.pipeline([
+            ('ZADD', self.scores_key, 'GT', pack_score(total_score, rolled_at), username),
+            ('HINCRBY', self.rolls_key, username, 1),
+            ('HSET', self.updated_key, username, rolled_at.isoformat()),
+        ])
+
+    def seed(self, load_rows):
+        """
+        Add this node's existing rankings once per node. load_rows() yields
+        (username, highest_score, total_rolls, last_updated); re-seeding is
+        harmless since scores only go up and counts are set only if missing.
+        The node is marked seeded with the last batch, so a load that fails
+        part way is retried on the next call.
+        """
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            if not self.backend.execute('EXISTS', self.seeded_key):
+                commands = []
+                for username, highest_score, total_rolls, last_updated in load_rows():
+                    last_updated = last_updated or datetime.utcnow()
+                    commands += [
+                        ('ZADD', self.scores_key, 'GT', pack_score(highest_score, last_updated), username),
+                        ('HSETNX', self.rolls_key, username, total_rolls),
+                        ('HSETNX', self.updated_key, username, last_updated.isoformat()),
+                    ]
+                    if len(commands) >= 3000:
+                        self.backend.pipeline(commands)
+                        commands = []
+                self.backend.pipeline(commands + [('SET', self.seeded_key, '1')], transaction=True)
+            self._seeded = True
+
+    def _entries(self, flat: List, first_rank: int, step: int = 1) -> List[Dict]:
+        usernames = flat[::2]
+        if not usernames:
+            return []
+        rolls, updated = self.backend.pipeline([
+            ('HMGET', self.rolls_key, *usernames),
+            ('HMGET', self.updated_key, *usernames),
+        ])
+        entries = []
+        for i, (username, score) in enumerate(zip(usernames, flat[1::2])):
+            highest_score, achieved_at = unpack_score(score)
+            entries.append({
+                'username': username,
+                'highest_score': highest_score,
+                'total_rolls': int(rolls[i] or 0),
+                'last_updated': updated[i],
+                'achieved_at': achieved_at.isoformat(),
+                'rank': first_rank + i * step,
+            })
+        return entries
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        return self._entries(self.backend.execute('ZREVRANGE', self.scores_key, 0, limit - 1, 'WITHSCORES'), 1)
+
+    def rank(self, username: str) -> Optional[int]:
+        """1-based leaderboard position"""
+        position = self.backend.execute('ZREVRANK', self.scores_key, username)
+        return None if position is None else position + 1
+
+    def score_counts(self, highest_score: int) -> Tuple[int, int, int]:
+        """Players with a lower best score, with this best score, and in total"""
+        low = highest_score * SCORE_SCALE
+        lower, tied, total = self.backend.pipeline([
+            ('ZCOUNT', self.scores_key, '-inf', f"({low}"),
+            ('ZCOUNT', self.scores_key, low, low + SCORE_SCALE - 1),
+            ('ZCARD', self.scores_key),
+        ])
+        return int(lower), int(tied), int(total)
+
+    def around(self, username: str, neighbors: int) -> Optional[Dict]:
+        """A player's entry with up to `neighbors` players above and below"""
+        position = self.backend.execute('ZREVRANK', self.scores_key, username)
+        if position is None:
+            return None
+        first = max(0, position - neighbors)
+        flat = self.backend.execute('ZREVRANGE', self.scores_key, first, position + neighbors, 'WITHSCORES')
+        entries = self._entries(flat, first + 1)
+        index = position - first
+        return dict(entries[index], above=entries[:index], below=entries[index + 1:])
+
+    def clear(self):
+        self.backend.execute('DEL', self.scores_key, self.rolls_key, self.updated_key)
+
+
+class SharedState:
+    def __init__(self, url: Optional[str] = None, prefix: Optional[str] = None):
+        if url is None:
+            url = os.environ.get('SHARED_STATE_URL', '')
+        self.prefix = prefix if prefix is not None else os.environ.get('SHARED_STATE_PREFIX', 'dice:')
+        self.backend = create_backend(url)
+        self.cache_ttl = float(os.environ.get('SHARED_CACHE_TTL', 30))
+        self.leaderboard = SharedLeaderboard(self.backend, self.prefix) if self.backend else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def cache_get(self, name: str) -> Optional[str]:
+        return self.backend.execute('GET', self.key(f"cache:{name}"))
+
+    def cache_set(self, name: str, value: str, ttl: Optional[float] = None):
+        ttl = self.cache_ttl if ttl is None else ttl
+        self.backend.execute('SET', self.key(f"cache:{name}"), value, 'PX', int(ttl * 1000))
+
+    def cache_delete(self, *names: str):
+        if names:
+            self.backend.execute('DEL', *(self.key(f"cache:{name}") for name in names))
+
+
+# Global instance
+shared_state = SharedState()
@@ -0,0 +1,264 @@
+"""
+Transactional outbox for Google Sheets delivery.
+
+roll_dice adds a SheetsOutbox row in the same transaction as the DiceRoll,
+so a roll reaches Sheets if and only if it was committed, and the request
+never waits on the Sheets API. A dispatcher thread in each worker claims
+due rows in batches, copies them to the local fallback file, appends them
+to the sheet with one API call per batch and marks them delivered. Failed
+batches are retried with exponential backoff. While Sheets is not
+configured (fallback mode) rows only get their local copy and stay pending,
+to be sent once a worker starts with working credentials; rows still
+pending after OUTBOX_FALLBACK_RETENTION_HOURS are dropped from the outbox
+(their local copy is kept), so a node that never gets credentials does
+not grow the table forever.
+
+A claim is a lease: claim_token plus next_attempt_at pushed into the
+future. Workers and nodes sharing the database never send the same row
+twice, unless a worker dies between the Sheets call and marking the rows
+delivered (the lease then expires and the batch is sent again).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, update
+
+from src.models.user import SheetsOutbox, db
+from src.services import lifecycle
+from src.services.google_sheets import sheets_service
+from src.services.history_index import history_index
+from src.services.metrics import (SHEETS_OUTBOX_BACKLOG, SHEETS_OUTBOX_BATCH_SIZE,
+                                  SHEETS_OUTBOX_OLDEST_AGE, SHEETS_OUTBOX_ROWS)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDispatcher:
+    def __init__(self, batch_size: Optional[int] = None, interval: Optional[float] = None,
+                 linger: Optional[float] = None, lease: Optional[float] = None,
+                 max_backoff: Optional[float] = None, enabled: Optional[bool] = None):
+        self.batch_size = batch_size or int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+        self.interval = interval or float(os.environ.get('OUTBOX_INTERVAL', 5))
+        # After a new roll, wait this long so rolls arriving together share a batch
+        self.linger = linger if linger is not None else float(os.environ.get('OUTBOX_LINGER_MS', 200)) / 1000
+        self.lease = lease or float(os.environ.get('OUTBOX_LEASE', 60))
+        self.max_backoff = max_backoff or float(os.environ.get('OUTBOX_MAX_BACKOFF', 300))
+        self.retention = timedelta(hours=float(os.environ.get('OUTBOX_RETENTION_HOURS', 24)))
+        self.fallback_retention = timedelta(hours=float(os.environ.get('OUTBOX_FALLBACK_RETENTION_HOURS', 168)))
+        self.drain_timeout = float(os.environ.get('OUTBOX_DRAIN_SECONDS', 10))
+        if enabled is None:
+            enabled = os.environ.get('OUTBOX_DISPATCHER_ENABLED', 'true').lower() != 'false'
+        self.enabled = enabled
+
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._last_cleanup = 0.0
+        lifecycle.on_fork(self._reset_after_fork)
+        lifecycle.on_shutdown(self.stop)
+
+    def init_app(self, app):
+        self.app = app
+        if self.enabled and not app.testing:
+            # Started by the first request of each process rather than here, so
+            # a pre-loading gunicorn master never runs a dispatcher of its own
+            app.before_request(self.ensure_running)
+
+    def _reset_after_fork(self):
+        # The parent's thread does not exist in the child
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sheets-outbox', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """A roll was committed; deliver it soon"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(self.interval) and not self._stop.is_set():
+                self._stop.wait(self.linger)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Sheets outbox dispatch failed")
+
+    def drain(self, deadline: Optional[float] = None) -> int:
+        """Dispatch batches until nothing is due (or the deadline passes)"""
+        total = 0
+        while deadline is None or time.monotonic() < deadline:
+            sent = self.dispatch_once()
+            total += sent
+            if sent < self.batch_size:
+                break
+        self.report()
+        return total
+
+    def stop(self):
+        """Stop the thread, then deliver what is due before the process exits"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            thread.join(self.drain_timeout)
+        self._thread = None
+        if self.app is None or not self.enabled or self._pid != os.getpid():
+            return
+        try:
+            with self.app.app_context():
+                self.drain(time.monotonic() + self.drain_timeout)
+        except Exception:
+            logger.exception("Could not drain the Sheets outbox at shutdown")
+
+    def _claim(self, now: datetime, new_only: bool = False) -> str:
+        token = uuid.uuid4().hex
+        conditions = [SheetsOutbox.delivered_at.is_(None), SheetsOutbox.next_attempt_at <= now]
+        if new_only:
+            conditions.append(SheetsOutbox.attempts == 0)
+        due = (select(SheetsOutbox.id)
+               .where(*conditions)
+               .order_by(SheetsOutbox.id)
+               .limit(self.batch_size))
+        # Re-checking the conditions makes the claim safe against a concurrent dispatcher
+        db.session.execute(
+            update(SheetsOutbox)
+            .where(SheetsOutbox.id.in_(due.scalar_subquery()), *conditions)
+            .values(claim_token=token, next_attempt_at=now + timedelta(seconds=self.lease))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return token
+
+    def dispatch_once(self) -> int:
+        """Claim and send one batch. Returns the number of rows claimed"""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            # Without Sheets only new rows are claimed, for their local copy;
+            # all rows stay pending until Sheets is back
+            available = not sheets_service.use_fallback and sheets_service.service is not None
+            token = self._claim(now, new_only=not available)
+            rows = SheetsOutbox.query.filter_by(claim_token=token).order_by(SheetsOutbox.id).all()
+            if not rows:
+                self._cleanup(now, fallback=not available)
+                return 0
+
+            sheet_rows = [row.to_row() for row in rows]
+            # The local copy serves history while Sheets is unreachable; write it once per row
+            first_attempts = [r for row, r in zip(rows, sheet_rows) if row.attempts == 0]
+            if first_attempts:
+                try:
+                    sheets_service.save_rows_to_fallback(first_attempts)
+                except Exception as e:
+                    logger.warning("Could not save %s rolls to the fallback file: %s", len(first_attempts), e)
+
+            finished = datetime.utcnow()
+            if not available:
+                # Kept pending (and due) but marked attempted, so they are neither
+                # copied again nor claimed before Sheets is available
+                for row in rows:
+                    row.attempts += 1
+                    row.last_error = 'Google Sheets service not available'
+                    row.claim_token = None
+                    row.next_attempt_at = finished
+                SHEETS_OUTBOX_ROWS.inc('deferred', amount=len(rows))
+                db.session.commit()
+                history_index.invalidate()
+                return len(rows)
+
+            error = None
+            try:
+                sheets_service.append_rows(sheet_rows)
+                SHEETS_OUTBOX_BATCH_SIZE.observe(len(rows))
+            except Exception as e:
+                error = str(e)
+
+            finished = datetime.utcnow()
+            if error is None:
+                for row in rows:
+                    row.delivered_at = finished
+                    row.claim_token = None
+                SHEETS_OUTBOX_ROWS.inc('delivered', amount=len(rows))
+            else:
+                for row in rows:
+                    row.attempts += 1
+                    row.last_error = error[:500]
+                    row.claim_token = None
+                    row.next_attempt_at = finished + timedelta(seconds=self._backoff(row.attempts))
+                SHEETS_OUTBOX_ROWS.inc('retried', amount=len(rows))
+                logger.warning("Sheets append of %s rolls failed (attempt %s): %s",
+                               len(rows), rows[0].attempts, error)
+            db.session.commit()
+
+            if error is None:
+                history_index.invalidate()
+            return len(rows)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, 2 ** attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _cleanup(self, now: datetime, fallback: bool = False):
+        """
+        Delete delivered rows past the retention period, at most once a minute.
+        In fallback mode also delete pending rows that have their local copy
+        and are past the fallback retention period.
+        """
+        if time.monotonic() - self._last_cleanup < 60:
+            return
+        self._last_cleanup = time.monotonic()
+        SheetsOutbox.query.filter(SheetsOutbox.delivered_at < now - self.retention).delete(synchronize_session=False)
+        if fallback:
+            expired = SheetsOutbox.query.filter(
+                SheetsOutbox.delivered_at.is_(None),
+                SheetsOutbox.attempts > 0,
+                SheetsOutbox.created_at < now - self.fallback_retention,
+            ).delete(synchronize_session=False)
+            if expired:
+                SHEETS_OUTBOX_ROWS.inc('expired', amount=expired)
+                logger.warning("Dropped %s rolls that waited over %s for Google Sheets; "
+                               "they remain in the local fallback file", expired, self.fallback_retention)
+        db.session.commit()
+
+    def status(self) -> Dict:
+        """Backlog size and age; call inside an app context"""
+        pending, oldest, retrying = db.session.execute(
+            select(func.count(SheetsOutbox.id), func.min(SheetsOutbox.created_at),
+                   func.count(SheetsOutbox.id).filter(SheetsOutbox.attempts > 0))
+            .where(SheetsOutbox.delivered_at.is_(None))
+        ).one()
+        age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        return {'pending': pending, 'retrying': retrying, 'oldest_age_seconds': round(age, 3)}
+
+    def report(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            status = self.status()
+        SHEETS_OUTBOX_BACKLOG.set(status['pending'])
+        SHEETS_OUTBOX_OLDEST_AGE.set(status['oldest_age_seconds'])
+
+
+# Global instance
+outbox_dispatcher = OutboxDispatcher()
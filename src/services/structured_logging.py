@@ -0,0 +1,232 @@
+"""
+Structured, non-blocking logging.
+
+configure_logging() routes every log record through a QueueHandler: the
+request thread only puts the record on a bounded in-memory queue, and a
+QueueListener thread formats it (as one JSON object per line, or plain text
+with LOG_FORMAT=text) and writes it out. When the queue is full, records are
+dropped and counted instead of blocking the request.
+
+Records logged during a request carry its request_id, method and path.
+Log with %-style arguments (logger.info("x %s", y)) so messages below
+LOG_LEVEL are never formatted.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+from src.services import lifecycle
+
+# Attributes every LogRecord has; anything else came in through `extra`
+STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, 'request_id', None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+class RequestContextFilter(logging.Filter):
+    """Copies the current request's id, method and path onto the record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if has_request_context() and not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of waiting on a full queue"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message now (its arguments may change after this
+        # thread moves on) but leave the layout to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ThrottledLogger:
+    """
+    Rate-limits a repetitive message, such as one warning per bad sheet row.
+
+    The first `burst` calls in each `interval` are logged; after that only a
+    random `sample_rate` fraction is, each carrying the number of calls
+    suppressed since the previous logged one.
+    """
+
+    def __init__(self, logger: logging.Logger, burst: int = 5, interval: float = 60.0,
+                 sample_rate: float = 0.01):
+        self.logger = logger
+        self.burst = burst
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._count = 0
+        self._suppressed = 0
+
+    def warning(self, msg: str, *args):
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.interval:
+                self._window_start = now
+                self._count = 0
+            self._count += 1
+            if self._count > self.burst and random.random() >= self.sample_rate:
+                self._suppressed += 1
+                return
+            suppressed, self._suppressed = self._suppressed, 0
+        self.logger.warning(msg, *args, extra={'suppressed': suppressed} if suppressed else None)
+
+
+class _Pipeline:
+    def __init__(self):
+        self.queue_handler = None
+        self.listener = None
+        self.output_handlers = []
+
+
+_pipeline = _Pipeline()
+_configure_lock = threading.Lock()
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'text':
+        handler.setFormatter(TextFormatter())
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _start_listener():
+    log_queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    listener = logging.handlers.QueueListener(log_queue, *_pipeline.output_handlers, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    if _pipeline.queue_handler is not None:
+        root.removeHandler(_pipeline.queue_handler)
+    root.addHandler(queue_handler)
+    _pipeline.queue_handler = queue_handler
+    _pipeline.listener = listener
+
+
+def configure_logging():
+    """Install the queue-based JSON logging pipeline on the root logger (once)"""
+    with _configure_lock:
+        if _pipeline.listener is not None:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        _pipeline.output_handlers = [_build_output_handler()]
+        _start_listener()
+        lifecycle.on_fork(_restart_listener)
+        lifecycle.on_shutdown(stop_logging)
+
+
+def _restart_listener():
+    # The listener thread does not survive a fork; give the worker its own
+    _start_listener()
+
+
+def stop_logging():
+    """Flush queued records, then log synchronously for the rest of the process"""
+    if _pipeline.listener is None:
+        return
+    _pipeline.listener.stop()
+    _pipeline.listener = None
+    root = logging.getLogger()
+    root.removeHandler(_pipeline.queue_handler)
+    for handler in _pipeline.output_handlers:
+        handler.addFilter(RequestContextFilter())
+        root.addHandler(handler)
+    if _pipeline.queue_handler.dropped:
+        logging.warning("Dropped %d log records because the log queue was full", _pipeline.queue_handler.dropped)
+    _pipeline.queue_handler = None
+
+
+def init_request_logging(app):
+    """Assign request ids and log one timing record per request"""
+    access_logger = logging.getLogger('access')
+    log_requests = os.environ.get('LOG_REQUESTS', 'true').lower() != 'false'
+
+    @app.before_request
+    def assign_request_id():
+        g.request_start = time.perf_counter()
+        # Keep the id of an upstream proxy so logs can be joined across services
+        g.request_id = request.headers.get(REQUEST_ID_HEADER, '')[:64] or uuid.uuid4().hex
+
+    @app.after_request
+    def log_request(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        start = g.get('request_start')
+        if log_requests and start is not None:
+            access_logger.info(
+                "%s %s %s", request.method, request.path, response.status_code,
+                extra={
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+                    'endpoint': request.endpoint,
+                    'remote_addr': request.remote_addr,
+                },
+            )
+        return response
@@ -0,0 +1,196 @@
+"""
+Per-worker username -> user id cache for the hot routes.
+
+Rolls, roll checks and username lookups all start by resolving a username.
+Ids never change while a user exists, so a bounded LRU of recent answers
+saves that query on most requests. Unknown names are cached too (for a
+shorter time), since the page checks a new player before they first roll.
+
+Entries are only trusted while the cache generation says nothing changed
+underneath them. The generation has two parts: a reset epoch, bumped by
+/api/reset, which empties the cache, and a create count, bumped when users
+are created, which drops only the cached unknown names. Every worker
+compares it on each lookup. It lives in a small file holding both counters
+(only ever increased, and replaced atomically, so an old generation never
+comes back), or in two counters on the shared state server when
+SHARED_STATE_URL is set, so other nodes see it too.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.services.metrics import CACHE_HITS, CACHE_MISSES
+from src.services.shared_state import SharedStateError, shared_state
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: fall back to in-process locking only
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class UserIdCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = None, generation_file: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get('USER_CACHE_SIZE', 10000))
+        self.ttl = ttl if ttl is not None else float(os.environ.get('USER_CACHE_TTL', 300))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(
+            os.environ.get('USER_CACHE_NEGATIVE_TTL', 30))
+        self.generation_file = generation_file or os.environ.get(
+            'USER_CACHE_GENERATION_FILE',
+            os.path.join(os.path.dirname(__file__), '..', 'database', 'user_cache.gen')
+        )
+        self._lock = threading.Lock()
+        self._bump_lock = threading.Lock()
+        # username -> (user_id, expires_at), least recently used first
+        self._known: 'OrderedDict[str, tuple]' = OrderedDict()
+        # username -> expires_at, for names with no user
+        self._unknown: 'OrderedDict[str, float]' = OrderedDict()
+        self._generation = None
+
+    # Generation
+
+    def generation(self):
+        """(reset epoch, create count), or None when it cannot be read (nothing is cached then)"""
+        if shared_state.enabled:
+            try:
+                epoch, created = shared_state.backend.execute(
+                    'MGET', shared_state.key('users:epoch'), shared_state.key('users:created'))
+            except SharedStateError:
+                return None
+            return (epoch or '0', created or '0')
+        try:
+            with open(self.generation_file) as f:
+                content = f.read()
+        except FileNotFoundError:
+            return ('', '0')
+        except OSError:
+            return None
+        return self._parse(content)
+
+    @staticmethod
+    def _parse(content: str):
+        # "<file id> <epoch> <created>"; the id tells a re-created file from the old one
+        try:
+            file_id, epoch, created = content.split()
+        except ValueError:
+            return None
+        return (f"{file_id}:{epoch}", created)
+
+    def _bump_file(self, new_epoch: bool):
+        directory = os.path.dirname(self.generation_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Read-modify-write under a lock shared with the other workers
+        with self._bump_lock, open(f"{self.generation_file}.lock", 'a') as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.generation_file) as f:
+                        file_id, epoch, created = f.read().split()
+                    epoch, created = int(epoch), int(created)
+                except (FileNotFoundError, ValueError):
+                    file_id, epoch, created = uuid.uuid4().hex, 0, 0
+                if new_epoch:
+                    epoch += 1
+                else:
+                    created += 1
+                temp_path = f"{self.generation_file}.{os.getpid()}.tmp"
+                with open(temp_path, 'w') as f:
+                    f.write(f"{file_id} {epoch} {created}\n")
+                os.replace(temp_path, self.generation_file)
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _bump(self, new_epoch: bool):
+        name = 'users:epoch' if new_epoch else 'users:created'
+        try:
+            if shared_state.enabled:
+                shared_state.backend.execute('INCR', shared_state.key(name))
+            else:
+                self._bump_file(new_epoch)
+        except (SharedStateError, OSError) as e:
+            logger.warning("Could not bump the user cache generation (%s): %s", name, e)
+
+    def user_created(self):
+        """Users were created: every worker forgets the names it had cached as unknown"""
+        with self._lock:
+            self._unknown.clear()
+        self._bump(new_epoch=False)
+
+    def invalidate(self):
+        """Users were deleted or replaced: every worker empties its cache"""
+        self.clear()
+        self._bump(new_epoch=True)
+
+    # Entries
+
+    def _sync(self, generation):
+        """Drop what a generation change invalidated; call with the lock held"""
+        current = self._generation
+        if current is None or generation is None or generation[0] != current[0]:
+            self._known.clear()
+            self._unknown.clear()
+        elif generation[1] != current[1]:
+            self._unknown.clear()
+        self._generation = generation
+
+    def lookup(self, username: str, load: Callable[[str], Optional[int]]) -> Optional[int]:
+        """The user id for username (None if there is no such user), calling load on a miss"""
+        generation = self.generation()
+        now = time.monotonic()
+        with self._lock:
+            self._sync(generation)
+            entry = self._known.get(username)
+            if entry is not None and entry[1] > now:
+                self._known.move_to_end(username)
+                CACHE_HITS.inc('user')
+                return entry[0]
+            expires = self._unknown.get(username)
+            if expires is not None and expires > now:
+                CACHE_HITS.inc('user')
+                return None
+        CACHE_MISSES.inc('user')
+
+        user_id = load(username)
+        if generation is not None:
+            self.store(username, user_id, generation)
+        return user_id
+
+    def store(self, username: str, user_id: Optional[int], generation):
+        """
+        Remember an answer read under the given generation, unless the
+        generation has moved on since (a create or reset raced the read).
+        """
+        with self._lock:
+            if generation != self._generation or self.max_entries <= 0:
+                return
+            if user_id is not None:
+                self._unknown.pop(username, None)
+                entries, value = self._known, (user_id, time.monotonic() + self.ttl)
+            else:
+                entries, value = self._unknown, time.monotonic() + self.negative_ttl
+            entries[username] = value
+            entries.move_to_end(username)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        """Empty this worker's cache only"""
+        with self._lock:
+            self._known.clear()
+            self._unknown.clear()
+            self._generation = None
+
+
+# Global instance
+user_cache = UserIdCache()
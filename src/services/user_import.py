@@ -0,0 +1,150 @@
+"""
+Bulk user registration from CSV or JSON lines.
+
+Pre-registering the players of an event through POST /api/users costs a
+uniqueness query and a commit per player. Here usernames are streamed from
+the input, deduplicated in memory and inserted in executemany batches of
+INSERT ... ON CONFLICT (username) DO NOTHING, one commit per batch, so
+names that already exist (or that someone registers meanwhile) are skipped
+by the database instead of being looked up first.
+
+Used by import_users.py and POST /api/users/bulk, which needs ADMIN_TOKEN
+sent as X-Admin-Token.
+"""
+
+import csv
+import hmac
+import json
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.user import User, db
+from src.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', 1000))
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def check_import_token(token: Optional[str]) -> bool:
+    """Whether an X-Admin-Token header matches ADMIN_TOKEN (never when it is unset)"""
+    secret = os.environ.get('ADMIN_TOKEN')
+    return bool(secret and token and hmac.compare_digest(token, secret))
+
+
+# File extensions, then Content-Type substrings (text/csv, application/x-ndjson, ...)
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+MEDIA_TYPE_HINTS = (('csv', 'csv'), ('ndjson', 'jsonl'), ('jsonl', 'jsonl'), ('json-lines', 'jsonl'))
+
+
+def detect_format(name: Optional[str]) -> Optional[str]:
+    """'csv' or 'jsonl' from a file name or a Content-Type, None if neither"""
+    name = (name or '').lower()
+    # The extension wins: players_csv.jsonl is JSON lines
+    fmt = EXTENSIONS.get(os.path.splitext(name)[1])
+    if fmt:
+        return fmt
+    media_type = name.split(';', 1)[0]
+    return next((fmt for hint, fmt in MEDIA_TYPE_HINTS if hint in media_type), None)
+
+
+def iter_usernames(lines: Iterable[str], fmt: str) -> Iterator[Optional[str]]:
+    """
+    Usernames from CSV (a 'username' column if there is a header naming one,
+    else the first column) or JSON lines (a string or an object with a
+    'username' key per line). Unreadable rows yield None.
+    """
+    if fmt == 'csv':
+        column = 0
+        for index, row in enumerate(csv.reader(lines)):
+            if index == 0:
+                header = [cell.strip().lower() for cell in row]
+                if 'username' in header:
+                    column = header.index('username')
+                    continue
+            if not row:
+                continue
+            yield row[column] if column < len(row) else None
+    elif fmt == 'jsonl':
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            if isinstance(value, dict):
+                value = value.get('username')
+            yield value if isinstance(value, str) else None
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def _insert_batch(usernames: List[str]) -> int:
+    """Insert the usernames that do not exist yet and commit; returns how many were created"""
+    table = User.__table__
+    upsert = UPSERT_INSERTS.get(db.engine.dialect.name)
+    if upsert is not None:
+        statement = upsert(table).on_conflict_do_nothing(index_elements=['username']).returning(table.c.id)
+        created = len(db.session.execute(statement, [{'username': name} for name in usernames]).all())
+    else:
+        existing = set(db.session.scalars(select(table.c.username).where(table.c.username.in_(usernames))))
+        new = [{'username': name} for name in usernames if name not in existing]
+        if new:
+            db.session.execute(insert(table), new)
+        created = len(new)
+    db.session.commit()
+    return created
+
+
+def import_usernames(usernames: Iterable[Optional[str]], batch_size: Optional[int] = None) -> dict:
+    """
+    Register every new username. Returns counts: created, skipped (already
+    registered or repeated in the input) and invalid (empty, too long or
+    unreadable).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    max_length = User.__table__.c.username.type.length
+    counts = {'created': 0, 'skipped': 0, 'invalid': 0}
+    seen = set()
+    batch = []
+
+    def flush():
+        created = _insert_batch(batch)
+        counts['created'] += created
+        counts['skipped'] += len(batch) - created
+        batch.clear()
+        if created:
+            # Workers may have cached some of these names as unknown
+            user_cache.user_created()
+
+    for username in usernames:
+        username = username.strip() if isinstance(username, str) else ''
+        if not username or (max_length and len(username) > max_length):
+            counts['invalid'] += 1
+            continue
+        if username in seen:
+            counts['skipped'] += 1
+            continue
+        seen.add(username)
+        batch.append(username)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    logger.info("Imported users: %s created, %s skipped, %s invalid",
+                counts['created'], counts['skipped'], counts['invalid'])
+    return counts
@@ -26,8 +26,7 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     // Load initial data
-    loadRankings();
-    loadHistory();
+    loadDashboard();
 });
 
 // Start the game with username
@@ -60,29 +59,90 @@ function startGame() {
     document.getElementById('currentUsername').textContent = username;
     
     // Check if user has already rolled
-    checkUserRollStatus();
+    loadDashboard();
 }
 
-// Check if user has already rolled dice
-async function checkUserRollStatus() {
+// ETag of each dashboard section on the page, sent back so unchanged sections are skipped
+let dashboardEtags = {};
+
+// Newest history rows shown, newest first; reloads only fetch rows delivered after historyCursor
+const HISTORY_SIZE = 10;
+let historyRows = [];
+let historyCursor = null;
+
+// Load roll status, rankings and history in a single request
+async function loadDashboard() {
+    const params = new URLSearchParams();
+    if (currentUsername) {
+        params.set('username', currentUsername);
+    }
+    if (historyCursor !== null) {
+        params.set('history_after', historyCursor);
+    }
+    const query = params.toString();
+    const url = `${API_BASE_URL}/dashboard${query ? `?${query}` : ''}`;
+    const headers = {};
+    const etags = Object.values(dashboardEtags);
+    if (etags.length > 0) {
+        headers['If-None-Match'] = etags.map(tag => `"${tag}"`).join(', ');
+    }
+    
     try {
-        const response = await fetch(`${API_BASE_URL}/dice/check/${currentUsername}`);
+        const response = await fetch(url, { headers });
+        if (response.status === 304) {
+            // Nothing changed since the last load
+            return;
+        }
         const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
         
-        if (data.has_rolled) {
-            hasRolled = true;
-            const rollButton = document.getElementById('rollDiceBtn');
-            rollButton.disabled = true;
-            rollButton.innerHTML = '<i class="fas fa-check"></i> Already Rolled!';
-            
-            // Display the existing roll
-            if (data.roll) {
-                displayDiceResult(data.roll.dice1, data.roll.dice2, data.roll.dice3, data.roll.total_score);
-                showRollResult(`You already rolled: ${data.roll.dice1}, ${data.roll.dice2}, ${data.roll.dice3} = ${data.roll.total_score}`, 'success');
+        if (data.status) {
+            renderRollStatus(data.status);
+        }
+        if (data.rankings) {
+            renderRankings(data.rankings);
+        }
+        if (data.history) {
+            if (historyCursor === null || data.history_cursor < historyCursor) {
+                // First load, or the history was reset
+                historyRows = data.history;
+            } else {
+                // A roll delivered late can be older than rows already shown
+                historyRows = data.history.concat(historyRows)
+                    .sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp) || b.seq - a.seq)
+                    .slice(0, HISTORY_SIZE);
             }
+            renderHistory(historyRows);
+        }
+        if (data.history_cursor !== undefined) {
+            historyCursor = data.history_cursor;
         }
+        dashboardEtags = data.etags || {};
     } catch (error) {
-        console.error('Error checking roll status:', error);
+        console.error('Error loading dashboard:', error);
+        if (Object.keys(dashboardEtags).length === 0) {
+            document.getElementById('rankingsList').innerHTML = '<div class="loading">Error loading rankings</div>';
+            document.getElementById('historyList').innerHTML = '<div class="loading">Error loading history</div>';
+        }
+    }
+}
+
+// Show the roll the user already made this round
+function renderRollStatus(status) {
+    if (!status.has_rolled || hasRolled) {
+        return;
+    }
+    hasRolled = true;
+    const rollButton = document.getElementById('rollDiceBtn');
+    rollButton.disabled = true;
+    rollButton.innerHTML = '<i class="fas fa-check"></i> Rolled Today!';
+    
+    // Display the existing roll
+    if (status.roll) {
+        displayDiceResult(status.roll.dice1, status.roll.dice2, status.roll.dice3, status.roll.total_score);
+        showRollResult(`You already rolled today: ${status.roll.dice1}, ${status.roll.dice2}, ${status.roll.dice3} = ${status.roll.total_score}`, 'success');
     }
 }
 
@@ -104,10 +164,12 @@ async function rollDice() {
     animateDiceRoll();
     
     try {
-        const response = await fetch(`${API_BASE_URL}/dice/roll`, {
+        // Retries reuse the same key so the server replays the original result
+        const response = await fetchWithRetry(`${API_BASE_URL}/dice/roll`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Idempotency-Key': generateIdempotencyKey()
             },
             body: JSON.stringify({ username: currentUsername })
         });
@@ -124,12 +186,11 @@ async function rollDice() {
                 displayDiceResult(roll.dice1, roll.dice2, roll.dice3, roll.total_score);
                 showRollResult(`Great roll! You got: ${roll.dice1}, ${roll.dice2}, ${roll.dice3} = ${roll.total_score}`, 'success');
                 
-                rollButton.innerHTML = '<i class="fas fa-check"></i> Already Rolled!';
+                rollButton.innerHTML = '<i class="fas fa-check"></i> Rolled Today!';
                 loadingOverlay.classList.add('hidden');
                 
                 // Refresh rankings and history
-                loadRankings();
-                loadHistory();
+                loadDashboard();
             }, 1000);
         } else {
             // Error
@@ -145,6 +206,34 @@ async function rollDice() {
     }
 }
 
+// Unique key identifying one roll attempt across network retries
+function generateIdempotencyKey() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Retry on network errors and on server "in progress" / busy responses
+async function fetchWithRetry(url, options, retries = 2) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(url, options);
+            if (attempt < retries && (response.status === 409 || response.status === 503)) {
+                const retryAfter = parseInt(response.headers.get('Retry-After') || '1', 10);
+                await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+                continue;
+            }
+            return response;
+        } catch (error) {
+            if (attempt >= retries) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)));
+        }
+    }
+}
+
 // Animate dice rolling
 function animateDiceRoll() {
     const dice = document.querySelectorAll('.dice');
@@ -185,72 +274,51 @@ function showRollResult(message, type) {
     resultDiv.classList.remove('hidden');
 }
 
-// Load rankings from API
-async function loadRankings() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/rankings`);
-        const rankings = await response.json();
-        
-        const rankingsList = document.getElementById('rankingsList');
-        
-        if (rankings.length === 0) {
-            rankingsList.innerHTML = '<div class="loading">No rankings yet. Be the first to roll!</div>';
-            return;
-        }
-        
-        rankingsList.innerHTML = rankings.map(ranking => `
-            <div class="ranking-item ${ranking.is_highlighted ? 'highlighted' : ''}">
-                <div class="rank-number">${ranking.rank}</div>
-                <div class="player-name">${ranking.username}</div>
-                <div class="player-score">${ranking.highest_score}</div>
-            </div>
-        `).join('');
-        
-    } catch (error) {
-        console.error('Error loading rankings:', error);
-        document.getElementById('rankingsList').innerHTML = '<div class="loading">Error loading rankings</div>';
+// Render the rankings list
+function renderRankings(rankings) {
+    const rankingsList = document.getElementById('rankingsList');
+    
+    if (rankings.length === 0) {
+        rankingsList.innerHTML = '<div class="loading">No rankings yet. Be the first to roll!</div>';
+        return;
     }
+    
+    rankingsList.innerHTML = rankings.map(ranking => `
+        <div class="ranking-item ${ranking.is_highlighted ? 'highlighted' : ''}">
+            <div class="rank-number">${ranking.rank}</div>
+            <div class="player-name">${ranking.username}</div>
+            <div class="player-score">${ranking.highest_score}</div>
+        </div>
+    `).join('');
 }
 
-// Load history from API
-async function loadHistory() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/sheets/history`);
-        const history = await response.json();
-        
-        const historyList = document.getElementById('historyList');
-        
-        if (history.length === 0) {
-            historyList.innerHTML = '<div class="loading">No rolls yet. Start playing!</div>';
-            return;
-        }
-        
-        // Sort by timestamp (newest first) and take last 10
-        const sortedHistory = history.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp)).slice(0, 10);
-        
-        historyList.innerHTML = sortedHistory.map(roll => `
-            <div class="history-item">
-                <div class="history-player">
-                    <i class="fas fa-user"></i> ${roll.username}
-                </div>
-                <div class="history-dice">
-                    <div class="history-dice-value">${roll.dice1}</div>
-                    <div class="history-dice-value">${roll.dice2}</div>
-                    <div class="history-dice-value">${roll.dice3}</div>
-                </div>
-                <div class="history-score">
-                    Total: ${roll.total_score}
-                </div>
-                <div class="history-time">
-                    ${formatDateTime(roll.timestamp)}
-                </div>
-            </div>
-        `).join('');
-        
-    } catch (error) {
-        console.error('Error loading history:', error);
-        document.getElementById('historyList').innerHTML = '<div class="loading">Error loading history</div>';
+// Render the recent rolls list (newest first)
+function renderHistory(history) {
+    const historyList = document.getElementById('historyList');
+    
+    if (history.length === 0) {
+        historyList.innerHTML = '<div class="loading">No rolls yet. Start playing!</div>';
+        return;
     }
+    
+    historyList.innerHTML = history.map(roll => `
+        <div class="history-item">
+            <div class="history-player">
+                <i class="fas fa-user"></i> ${roll.username}
+            </div>
+            <div class="history-dice">
+                <div class="history-dice-value">${roll.dice1}</div>
+                <div class="history-dice-value">${roll.dice2}</div>
+                <div class="history-dice-value">${roll.dice3}</div>
+            </div>
+            <div class="history-score">
+                Total: ${roll.total_score}
+            </div>
+            <div class="history-time">
+                ${formatDateTime(roll.timestamp)}
+            </div>
+        </div>
+    `).join('');
 }
 
 // Format date and time
@@ -276,8 +344,7 @@ function showError(element, message) {
 // Refresh data periodically
 setInterval(() => {
     if (!document.getElementById('gameInterface').classList.contains('hidden')) {
-        loadRankings();
-        loadHistory();
+        loadDashboard();
     }
 }, 30000); // Refresh every 30 seconds
 
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Multi-process stress test for the local Sheets fallback store.
+
+Worker processes append roll records to one shared file as fast as they
+can while another process keeps compacting it, the way gunicorn workers and
+archive_rolls.py share sheets_data.json. Afterwards every record is checked
+for: none lost, none duplicated, snapshot readable. The old whole-file
+read-modify-write is run the same way for comparison.
+
+Usage:
+    python stress_fallback_store.py [--workers 8] [--records 500] [--compact-bytes 65536]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.fallback_store import FallbackStore
+
+
+def make_record(worker_id: int, seq: int) -> dict:
+    return {
+        'timestamp': f"2026-01-01T00:00:00.{worker_id:03d}{seq:06d}",
+        'username': f"worker{worker_id}",
+        'dice1': 1, 'dice2': 2, 'dice3': 3, 'total_score': 6,
+        'date': '2026-01-01', 'time': '00:00:00',
+        'seq': seq,
+    }
+
+
+def legacy_append(path: str, record: dict):
+    """The previous GoogleSheetsService._save_to_fallback"""
+    data = []
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            data = []
+    data.append(record)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def writer(mode: str, path: str, compact_bytes: int, worker_id: int, records: int, start_event, results):
+    store = FallbackStore(path, compact_bytes=compact_bytes)
+    start_event.wait()
+    start = time.perf_counter()
+    for seq in range(records):
+        record = make_record(worker_id, seq)
+        if mode == 'store':
+            store.append(record)
+        else:
+            legacy_append(path, record)
+    results.put(time.perf_counter() - start)
+
+
+def compactor(path: str, stop_event, start_event, results):
+    store = FallbackStore(path)
+    start_event.wait()
+    runs = 0
+    while not stop_event.is_set():
+        store.compact()
+        runs += 1
+        time.sleep(0.01)
+    results.put(runs)
+
+
+def run(mode: str, workers: int, records: int, compact_bytes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sheets_data.json')
+        start_event = multiprocessing.Event()
+        stop_event = multiprocessing.Event()
+        timings = multiprocessing.Queue()
+        compactions = multiprocessing.Queue()
+
+        processes = [
+            multiprocessing.Process(target=writer, args=(mode, path, compact_bytes, i, records, start_event, timings))
+            for i in range(workers)
+        ]
+        background = None
+        if mode == 'store':
+            background = multiprocessing.Process(target=compactor, args=(path, stop_event, start_event, compactions))
+            background.start()
+        for process in processes:
+            process.start()
+
+        start = time.perf_counter()
+        start_event.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        compaction_runs = 0
+        if background:
+            compaction_runs = compactions.get()
+            background.join()
+
+        if mode == 'store':
+            saved = FallbackStore(path).load()
+        else:
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except json.JSONDecodeError:
+                saved = None
+
+        expected = workers * records
+        if saved is None:
+            print(f"{mode:<8} {expected:>9,} {'-':>9} {'torn file':>9} {expected / elapsed:>10,.0f}")
+            return False
+        keys = [(r['username'], r['seq']) for r in saved]
+        unique = set(keys)
+        lost = expected - len(unique)
+        duplicated = len(keys) - len(unique)
+        print(f"{mode:<8} {expected:>9,} {len(unique):>9,} {lost:>9,} {duplicated:>6,} "
+              f"{expected / elapsed:>10,.0f} {compaction_runs:>8}")
+        return lost == 0 and duplicated == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fallback store multi-process stress test')
+    parser.add_argument('--workers', type=int, default=8, help='writer processes')
+    parser.add_argument('--records', type=int, default=500, help='records per writer')
+    parser.add_argument('--compact-bytes', type=int, default=64 * 1024,
+                        help='journal size that triggers a snapshot rewrite')
+    parser.add_argument('--skip-legacy', action='store_true', help='do not run the old read-modify-write')
+    args = parser.parse_args()
+
+    print(f"🧪 FALLBACK STORE STRESS TEST: {args.workers} processes x {args.records} records")
+    print("=" * 60)
+    print(f"{'mode':<8} {'expected':>9} {'saved':>9} {'lost':>9} {'dupes':>6} {'writes/s':>10} {'compacts':>8}")
+
+    ok = run('store', args.workers, args.records, args.compact_bytes)
+    if not args.skip_legacy:
+        run('legacy', args.workers, args.records, args.compact_bytes)
+
+    print()
+    print("✅ No records lost" if ok else "❌ Records lost or duplicated")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Shared fixtures. The services read their settings (file locations, feature
+switches) when first imported, so the environment is pointed at a scratch
+directory here, before any test imports the app.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='dice-tests-')
+for name, value in {
+    'RATE_LIMIT_ENABLED': 'false',
+    'OUTBOX_DISPATCHER_ENABLED': 'false',
+    'SHARED_STATE_URL': '',
+    'LOG_LEVEL': 'WARNING',
+    'SHEETS_FALLBACK_FILE': os.path.join(SCRATCH_DIR, 'sheets_data.json'),
+    'IDEMPOTENCY_DB': os.path.join(SCRATCH_DIR, 'idempotency.db'),
+    'USER_CACHE_GENERATION_FILE': os.path.join(SCRATCH_DIR, 'user_cache.gen'),
+    'ROLL_FILTER_DIR': os.path.join(SCRATCH_DIR, 'roll_filter'),
+    'PROFILE_DIR': os.path.join(SCRATCH_DIR, 'profiles'),
+    'ARCHIVE_DIR': os.path.join(SCRATCH_DIR, 'archive'),
+}.items():
+    os.environ[name] = value
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Builds apps with Sheets in fallback mode and no network, on a fresh SQLite file by default"""
+    from src.main import create_app
+    from src.services.google_sheets import sheets_service
+    from src.services.roll_filter import roll_filter
+    from src.services.user_cache import user_cache
+
+    # Offline: no API client and no public-sheet reads
+    monkeypatch.setattr(sheets_service, '_initialized', True)
+    monkeypatch.setattr(sheets_service, '_service', None)
+    monkeypatch.setattr(sheets_service, '_use_fallback', True)
+    monkeypatch.setattr(sheets_service, '_read_from_public_sheet', lambda: [])
+    monkeypatch.setattr(sheets_service, 'data_file', str(tmp_path / 'sheets_data.json'))
+
+    def make(uri=None, **config):
+        app = create_app(dict({
+            'SQLALCHEMY_DATABASE_URI': uri or f"sqlite:///{tmp_path / 'test.db'}",
+            'TESTING': True,
+        }, **config))
+        # Per-process caches outlive an app; start each one from its new database
+        user_cache.clear()
+        roll_filter.reset()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    """An app on a fresh SQLite database, with Sheets in fallback mode and no network"""
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
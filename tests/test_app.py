@@ -0,0 +1,26 @@
+from src.main import create_app
+from src.models.migrations import LATEST_VERSION, current_version
+from src.models.user import db
+from src.services.google_sheets import sheets_service
+
+
+def test_create_app_docstring_example(monkeypatch):
+    monkeypatch.setattr(sheets_service, '_initialized', False)
+
+    # The example from create_app's docstring, as is
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+
+    # No Google Sheets client was built
+    assert sheets_service._initialized is False
+    client = app.test_client()
+    assert client.get('/health').status_code == 200
+    assert client.get('/api/rankings').get_json() == []
+    with app.app_context():
+        assert current_version(db.engine) == LATEST_VERSION
+        db.engine.dispose()
+
+
+def test_apps_do_not_share_in_memory_databases(make_app):
+    first, second = make_app('sqlite://'), make_app('sqlite://')
+    assert first.test_client().post('/api/users', json={'username': 'alice'}).status_code == 201
+    assert second.test_client().get('/api/users').get_json() == []
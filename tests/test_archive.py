@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import pytest
+
+import src.routes.user
+from src.models.user import DiceRoll, User, db
+from src.services.archive import ROLLS, RollArchive, archive_rolls, roll_to_row
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = RollArchive(str(tmp_path / 'archive'))
+    monkeypatch.setattr(src.routes.user, 'roll_archive', archive)
+    return archive
+
+
+def add_roll(username, rolled_at, roll_id=None):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username)
+        db.session.add(user)
+        db.session.flush()
+    rolled_at = datetime.fromisoformat(rolled_at)
+    db.session.add(DiceRoll(id=roll_id, user_id=user.id, dice1=1, dice2=2, dice3=3, total_score=6,
+                            rolled_at=rolled_at, round_day=rolled_at.date()))
+    db.session.commit()
+
+
+def history(client, query=''):
+    return [(roll['username'], roll['rolled_at']) for roll in
+            client.get(f"/api/dice/history?{query}").get_json()]
+
+
+def test_archived_rolls_come_back_through_history(app, client, archive):
+    with app.app_context():
+        add_roll('alice', '2026-01-10T08:00:00')
+        add_roll('bob', '2026-02-03T09:00:00')
+        add_roll('alice', '2026-02-04T10:00:00')
+        add_roll('bob', '2026-03-05T11:00:00')
+        assert archive_rolls(date(2026, 3, 1), archive=archive, batch_size=2) == 3
+        assert DiceRoll.query.count() == 1
+
+    assert archive.stats()['partitions'] == 2
+    assert history(client) == [('bob', '2026-03-05T11:00:00')]
+    # Newest first: the database's rolls, then the archived ones
+    assert history(client, 'include_archive=true') == [
+        ('bob', '2026-03-05T11:00:00'),
+        ('alice', '2026-02-04T10:00:00'),
+        ('bob', '2026-02-03T09:00:00'),
+        ('alice', '2026-01-10T08:00:00'),
+    ]
+    assert history(client, 'include_archive=true&since=2026-02-04&until=2026-03-01') == [
+        ('alice', '2026-02-04T10:00:00'),
+    ]
+    assert history(client, 'include_archive=true&round=2026-01-10') == [('alice', '2026-01-10T08:00:00')]
+    # Only the partitions overlapping the range are opened
+    assert archive.partitions(ROLLS, since=date(2026, 2, 1)) == ['dice_rolls-2026-02.csv.gz']
+
+
+def test_batch_written_twice_is_read_once(app, client, archive):
+    with app.app_context():
+        add_roll('alice', '2026-01-10T08:00:00')
+        # A run that crashed after writing its batch, before deleting it
+        archive.append(ROLLS, [roll_to_row(roll) for roll in DiceRoll.query.all()], 'round_day')
+        # The re-run writes the batch again
+        assert archive_rolls(date(2026, 2, 1), archive=archive) == 1
+
+    assert archive.stats()['archived_rolls'] == 2
+    assert history(client, 'include_archive=true') == [('alice', '2026-01-10T08:00:00')]
+
+
+def test_reused_ids_are_kept_apart(app, client, archive):
+    with app.app_context():
+        add_roll('alice', '2026-01-10T08:00:00', roll_id=1)
+        archive_rolls(date(2026, 2, 1), archive=archive)
+        # After /api/reset, SQLite hands out id 1 again
+        add_roll('bob', '2026-01-20T09:00:00', roll_id=1)
+        archive_rolls(date(2026, 2, 1), archive=archive)
+
+    assert history(client, 'include_archive=true') == [
+        ('bob', '2026-01-20T09:00:00'),
+        ('alice', '2026-01-10T08:00:00'),
+    ]
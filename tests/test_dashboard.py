@@ -0,0 +1,43 @@
+from src.services.google_sheets import sheets_service
+from src.services.history_index import history_index
+
+
+def deliver(*rolls):
+    """Append rolls to the sheet (here the fallback file) as the outbox would"""
+    sheets_service.save_rows_to_fallback([
+        [timestamp, username, 1, 2, 3, 6, timestamp[:10], timestamp[11:]] for username, timestamp in rolls])
+    history_index.invalidate()
+
+
+def dashboard(client, etags=None, **args):
+    headers = {'If-None-Match': ', '.join(f'"{tag}"' for tag in etags.values())} if etags else {}
+    return client.get('/api/dashboard', query_string=args, headers=headers)
+
+
+def test_history_is_polled_by_delivery_cursor(client):
+    deliver(('alice', '2026-03-01T10:00:00'), ('bob', '2026-03-01T10:05:00'))
+    first = dashboard(client).get_json()
+    assert [row['username'] for row in first['history']] == ['bob', 'alice']
+    assert first['history_cursor'] == 2
+
+    # Nothing delivered, nothing else changed
+    assert dashboard(client, first['etags'], history_after=2).status_code == 304
+
+    # A roll from before bob's, delivered late: only it comes back
+    deliver(('cat', '2026-03-01T10:02:00'))
+    body = dashboard(client, first['etags'], history_after=2).get_json()
+    assert [row['username'] for row in body['history']] == ['cat']
+    assert body['history_cursor'] == 3
+    assert 'rankings' not in body
+    assert 'history' not in body['etags']
+
+
+def test_reset_history_is_sent_in_full(client):
+    deliver(('alice', '2026-03-01T10:00:00'), ('bob', '2026-03-01T10:05:00'))
+    first = dashboard(client).get_json()
+
+    sheets_service.fallback_store.replace([])
+    history_index.invalidate()
+    body = dashboard(client, first['etags'], history_after=first['history_cursor']).get_json()
+    assert body['history'] == []
+    assert body['history_cursor'] == 0
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from src.models.database import engine_options, get_read_engine, is_memory_sqlite, read_only_uri
+from src.models.user import db
+
+POOL_SIZING = {'pool_size', 'max_overflow', 'pool_timeout'}
+
+
+@pytest.mark.parametrize('uri', ['sqlite://', 'sqlite:///:memory:'])
+def test_in_memory_sqlite_gets_no_pool_sizing(uri):
+    assert is_memory_sqlite(uri)
+    assert not POOL_SIZING & set(engine_options(uri))
+
+
+@pytest.mark.parametrize('uri', ['sqlite:////srv/app.db', 'postgresql://db/dice'])
+def test_pooled_databases_are_sized(uri):
+    assert not is_memory_sqlite(uri)
+    assert POOL_SIZING <= set(engine_options(uri))
+
+
+@pytest.mark.parametrize('uri', ['sqlite://', 'sqlite:///:memory:'])
+def test_app_on_in_memory_sqlite(make_app, uri):
+    app = make_app(uri)
+    client = app.test_client()
+
+    assert client.post('/api/users', json={'username': 'alice'}).status_code == 201
+    assert client.get('/api/users/by-username/alice').get_json()['username'] == 'alice'
+    with app.app_context():
+        db.engine.dispose()
+
+
+
+@pytest.fixture
+def statements(app):
+    """SQL run on the primary and the read engine"""
+    ran = {'primary': [], 'read': []}
+    with app.app_context():
+        engines = {'primary': db.engine, 'read': get_read_engine(app)}
+    listeners = {}
+    for name, engine in engines.items():
+        def record(conn, cursor, statement, *args, name=name):
+            ran[name].append(statement.lstrip())
+        listeners[name] = record
+        event.listen(engine, 'before_cursor_execute', record)
+    yield ran
+    for name, engine in engines.items():
+        event.remove(engine, 'before_cursor_execute', listeners[name])
+
+
+def test_read_engine_is_a_read_only_connection_to_the_same_file(app):
+    engine = get_read_engine(app)
+    assert 'mode=ro' in str(engine.url)
+    with app.app_context():
+        assert engine.url.database.endswith(db.engine.url.database)
+    with engine.connect() as conn, pytest.raises(OperationalError):
+        conn.execute(text("INSERT INTO user (username) VALUES ('mallory')"))
+
+
+def test_read_only_routes_use_the_read_engine(client, statements):
+    assert client.post('/api/users', json={'username': 'alice'}).status_code == 201
+    assert any(s.startswith('INSERT') for s in statements['primary'])
+    assert statements['read'] == []
+
+    statements['primary'].clear()
+    assert [user['username'] for user in client.get('/api/users').get_json()] == ['alice']
+    assert statements['read'] and all(s.startswith('SELECT') for s in statements['read'])
+    assert statements['primary'] == []
+
+
+def test_read_only_uri(monkeypatch):
+    monkeypatch.delenv('DATABASE_REPLICA_URL', raising=False)
+    assert read_only_uri('sqlite:////srv/app.db') == 'sqlite:///file:/srv/app.db?mode=ro&uri=true'
+    assert read_only_uri('postgresql://db/dice') is None
+    monkeypatch.setenv('DATABASE_REPLICA_URL', 'postgresql://replica/dice')
+    assert read_only_uri('postgresql://db/dice') == 'postgresql://replica/dice'
+
+
+@pytest.mark.parametrize('uri', ['sqlite://', 'sqlite:///:memory:'])
+def test_in_memory_reads_use_the_primary(make_app, uri):
+    assert read_only_uri(uri) is None
+    app = make_app(uri)
+    assert get_read_engine(app) is None
+
+    client = app.test_client()
+    client.post('/api/users', json={'username': 'alice'})
+    # A read-only route still sees the data, from the one shared connection
+    assert [user['username'] for user in client.get('/api/users').get_json()] == ['alice']
+    with app.app_context():
+        db.engine.dispose()
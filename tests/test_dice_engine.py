@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from src.services import lifecycle
+from src.services.dice_engine import (NUMPY_AVAILABLE, DiceEngine, DiceExpression, PooledBackend, RandomBackend,
+                                      create_backend, dice_engine, parse_expression)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('3d6', DiceExpression(3, 6, 0)),
+    ('d20', DiceExpression(1, 20, 0)),
+    ('2d8+3', DiceExpression(2, 8, 3)),
+    (' 4 D 10 - 2 ', DiceExpression(4, 10, -2)),
+])
+def test_parse_expression(text, expected):
+    assert parse_expression(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', '3x6', '0d6', '1001d6', '3d1', '3d1001', '3d6*2'])
+def test_parse_expression_rejects(text):
+    with pytest.raises(ValueError):
+        parse_expression(text)
+
+
+@pytest.mark.parametrize('name', ['random', 'secrets'] + (['numpy'] if NUMPY_AVAILABLE else []))
+def test_backends_draw_every_face_and_nothing_else(name):
+    values = create_backend(name).draw(6, 6000)
+    assert len(values) == 6000
+    assert set(values) == {1, 2, 3, 4, 5, 6}
+
+
+def test_secrets_backend_handles_more_than_256_sides():
+    values = create_backend('secrets').draw(1000, 2000)
+    assert all(1 <= value <= 1000 for value in values)
+
+
+@pytest.mark.parametrize('name', ['random'] + (['numpy'] if NUMPY_AVAILABLE else []))
+def test_seeded_backends_repeat(name):
+    assert create_backend(name, seed=7).draw(20, 50) == create_backend(name, seed=7).draw(20, 50)
+    assert create_backend(name, seed=7).draw(20, 50) != create_backend(name, seed=8).draw(20, 50)
+
+
+def test_create_backend_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        create_backend('secrets', seed=1)
+    with pytest.raises(ValueError):
+        create_backend('dev-urandom')
+
+
+def test_pooled_backend_serves_the_wrapped_sequence():
+    pooled = create_backend('random', seed=3, pool_size=64)
+    assert pooled.name == 'pooled-random'
+    draws = [value for _ in range(40) for value in pooled.draw(6, 5)]
+
+    # Blocks of 64 are used up before a new one is drawn; a draw that does not fit starts the next block
+    plain = RandomBackend(seed=3)
+    expected = []
+    for _ in range(4):
+        expected.extend(plain.draw(6, 64)[:60])
+    assert draws[:200] == expected[:200]
+
+
+def test_pooled_backend_passes_large_draws_through():
+    pooled = PooledBackend(RandomBackend(seed=3), pool_size=16)
+    assert pooled.draw(6, 100) == RandomBackend(seed=3).draw(6, 100)
+
+
+def test_roll_adds_the_modifier():
+    result = DiceEngine(RandomBackend(seed=1)).roll('3d6+2')
+    assert len(result.dice) == 3
+    assert result.total == sum(result.dice) + 2
+    assert str(result.expression) == '3d6+2'
+
+
+def test_roll_many_matches_single_rolls():
+    totals = list(DiceEngine(RandomBackend(seed=5)).roll_many('2d6-1', 100))
+    single = DiceEngine(RandomBackend(seed=5))
+    assert totals == [single.roll('2d6-1').total for _ in range(100)]
+    assert all(1 <= total <= 11 for total in totals)
+
+
+def rolls_in_forked_worker(count: int = 2):
+    """Dice rolled by `count` forked children after the fork hooks, as gunicorn's post_fork runs them"""
+    sequences = []
+    for _ in range(count):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                lifecycle.run_fork_hooks()
+                os.write(write_end, repr(dice_engine.roll('20d6').dice).encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as f:
+            sequences.append(f.read())
+        os.waitpid(pid, 0)
+    return sequences
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_workers_roll_different_dice(monkeypatch):
+    monkeypatch.delenv('DICE_SEED', raising=False)
+    first, second = rolls_in_forked_worker()
+    assert first != second
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_configured_seed_survives_fork(monkeypatch):
+    monkeypatch.setenv('DICE_SEED', '42')
+    first, second = rolls_in_forked_worker()
+    assert first == second
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.services import fallback_store
+from src.services.fallback_store import FallbackStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'sheets_data.json')
+
+
+def test_records_survive_a_reload(path):
+    store = FallbackStore(path)
+    store.append({'username': 'alice', 'score': 9})
+    store.extend([{'username': 'bob', 'score': 12}, {'username': 'cat', 'score': 4}])
+
+    assert [r['username'] for r in FallbackStore(path).load()] == ['alice', 'bob', 'cat']
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(path):
+    store = FallbackStore(path, compact_bytes=100)
+    for i in range(10):
+        store.append({'username': f"player{i}", 'score': i})
+
+    with open(path) as f:
+        snapshot = json.load(f)
+    # Each record is a 36-byte line: folded every third append
+    assert len(snapshot) == 9
+    assert os.path.getsize(store.journal_path) == 36
+    assert [r['score'] for r in FallbackStore(path).load()] == list(range(10))
+
+
+def test_snapshot_in_the_original_format_is_read(path):
+    with open(path, 'w') as f:
+        json.dump([{'username': 'old', 'score': 3}], f)
+    store = FallbackStore(path)
+    store.append({'username': 'new', 'score': 5})
+    assert [r['username'] for r in store.load()] == ['old', 'new']
+
+
+def test_half_written_journal_line_is_skipped_until_complete(path):
+    store = FallbackStore(path)
+    store.append({'username': 'alice', 'score': 9})
+    with open(store.journal_path, 'a') as f:
+        f.write('{"username": "bo')
+    assert [r['username'] for r in FallbackStore(path).load()] == ['alice']
+
+    with open(store.journal_path, 'a') as f:
+        f.write('b", "score": 12}\n')
+    assert [r['username'] for r in store.load()] == ['alice', 'bob']
+
+
+def test_failed_snapshot_write_leaves_the_old_one(path, monkeypatch):
+    store = FallbackStore(path)
+    store.replace([{'username': 'alice', 'score': 9}])
+
+    def crash(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(fallback_store.os, 'replace', crash)
+    with pytest.raises(OSError):
+        store.replace([{'username': 'bob', 'score': 12}])
+    monkeypatch.undo()
+
+    assert [r['username'] for r in FallbackStore(path).load()] == ['alice']
+
+
+def test_concurrent_writers_lose_nothing(path):
+    # One store per thread: separate lock file handles, like separate workers
+    def write(worker):
+        store = FallbackStore(path, compact_bytes=2000)
+        for i in range(50):
+            store.append({'username': f"w{worker}-{i}", 'score': i})
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    usernames = [r['username'] for r in FallbackStore(path).load()]
+    assert len(usernames) == 200
+    assert len(set(usernames)) == 200
@@ -0,0 +1,84 @@
+import pytest
+
+from src.services.google_sheets import sheets_service
+from src.services.history_index import HistoryIndex, history_index
+
+
+def record(username, timestamp):
+    return {'timestamp': timestamp, 'username': username, 'total_score': 9}
+
+
+@pytest.fixture
+def sheet():
+    """Rows in the order they were appended to the sheet"""
+    return []
+
+
+@pytest.fixture
+def index(sheet):
+    return HistoryIndex(lambda: list(sheet), ttl=0)
+
+
+def usernames(rows):
+    return [row['username'] for row in rows]
+
+
+def test_late_delivery_is_not_missed(sheet, index):
+    sheet += [record('alice', '2026-03-01T10:00:00'), record('bob', '2026-03-01T10:05:00')]
+    rows, cursor = index.changes(10, 'desc')
+    assert usernames(rows) == ['bob', 'alice']
+    assert cursor == 2
+
+    # cat rolled before bob, but her append failed and was retried
+    sheet.append(record('cat', '2026-03-01T10:02:00'))
+    rows, cursor = index.changes(10, 'desc', after=cursor)
+    assert usernames(rows) == ['cat']
+    assert rows[0]['seq'] == 3
+    assert index.changes(10, 'desc', after=cursor) == ([], 3)
+
+    # Without a cursor everything comes in timestamp order
+    assert usernames(index.query(order='asc')) == ['alice', 'cat', 'bob']
+
+
+def test_asc_pages_through_every_row_in_delivery_order(sheet, index):
+    sheet += [record(f"p{i}", f"2026-03-01T10:{59 - i:02d}:00") for i in range(5)]
+    seen, cursor = [], None
+    while True:
+        rows, cursor = index.changes(2, 'asc', after=cursor)
+        if not rows:
+            break
+        seen += usernames(rows)
+    assert sorted(seen) == ['p0', 'p1', 'p2', 'p3', 'p4']
+    assert len(seen) == 5
+    assert cursor == 5
+
+
+def test_desc_limit_keeps_the_newest(sheet, index):
+    sheet += [record('alice', '2026-03-01T10:00:00'), record('bob', '2026-03-01T11:00:00'),
+              record('cat', '2026-03-01T09:00:00')]
+    assert usernames(index.query(2, 'desc')) == ['bob', 'alice']
+    assert usernames(index.query(2, 'desc', after=1)) == ['bob', 'cat']
+
+
+def test_cursor_from_before_a_reset_starts_over(sheet, index):
+    sheet += [record('alice', '2026-03-01T10:00:00'), record('bob', '2026-03-01T10:05:00')]
+    _, cursor = index.changes(10, 'desc')
+    sheet[:] = [record('dan', '2026-03-02T08:00:00')]
+    assert index.changes(10, 'desc', after=cursor) == (index.query(10, 'desc'), 1)
+    assert usernames(index.query(10, 'desc', after=cursor)) == ['dan']
+
+
+def test_history_route_returns_the_cursor(client):
+    sheets_service.save_rows_to_fallback([['2026-03-01T10:00:00', 'alice', 1, 2, 3, 6, '2026-03-01', '10:00:00'],
+                                          ['2026-03-01T10:05:00', 'bob', 2, 3, 4, 9, '2026-03-01', '10:05:00']])
+    history_index.invalidate()
+    response = client.get('/api/sheets/history?limit=10')
+    assert usernames(response.get_json()) == ['bob', 'alice']
+    cursor = response.headers['X-History-Cursor']
+    assert cursor == '2'
+
+    sheets_service.save_rows_to_fallback([['2026-03-01T09:55:00', 'cat', 1, 1, 1, 3, '2026-03-01', '09:55:00']])
+    history_index.invalidate()
+    response = client.get(f"/api/sheets/history?limit=10&after={cursor}")
+    assert usernames(response.get_json()) == ['cat']
+    assert response.headers['X-History-Cursor'] == '3'
@@ -0,0 +1,35 @@
+import uuid
+
+from src.models.user import DiceRoll
+
+
+def roll(client, key, username='alice'):
+    return client.post('/api/dice/roll', json={'username': username}, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_stored_response(app, client):
+    key = uuid.uuid4().hex
+    first = roll(client, key)
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = roll(client, key)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    # Not rolled again: a second roll would have been refused with 400
+    with app.app_context():
+        assert DiceRoll.query.count() == 1
+
+
+def test_key_reused_for_another_request_is_rejected(client):
+    key = uuid.uuid4().hex
+    assert roll(client, key, 'alice').status_code == 201
+    assert roll(client, key, 'bob').status_code == 422
+
+
+def test_new_key_runs_the_view(client):
+    assert roll(client, uuid.uuid4().hex).status_code == 201
+    second = roll(client, uuid.uuid4().hex)
+    assert second.status_code == 400
+    assert 'Idempotent-Replayed' not in second.headers
@@ -0,0 +1,33 @@
+def sample(client, line_start):
+    """Value of the /metrics sample line starting with line_start, 0 if absent"""
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+def test_requests_are_counted_by_endpoint_and_status(client):
+    ok = 'http_requests_total{endpoint="user.get_users",method="GET",status="200"}'
+    created = 'http_requests_total{endpoint="user.create_user",method="POST",status="201"}'
+    taken = 'http_requests_total{endpoint="user.create_user",method="POST",status="400"}'
+    # Counters are per process and outlive an app
+    before = {name: sample(client, name) for name in (ok, created, taken)}
+
+    client.get('/api/users')
+    client.get('/api/users')
+    client.post('/api/users', json={'username': 'alice'})
+    client.post('/api/users', json={'username': 'alice'})
+
+    assert sample(client, ok) == before[ok] + 2
+    assert sample(client, created) == before[created] + 1
+    assert sample(client, taken) == before[taken] + 1
+
+
+def test_exposition_format(client):
+    client.get('/api/users')
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_requests_total counter' in body
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="user.get_users",method="GET",le="+Inf"}' in body
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src.main import create_app
+from src.models import migrations
+from src.models.migrations import LATEST_VERSION, MIGRATIONS, current_version, run_migrations
+from src.models.user import db
+
+# The schema before versioned migrations: no round_day, no indexes, duplicate rankings possible
+BASELINE_SCHEMA = [
+    'CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE)',
+    'CREATE TABLE dice_roll (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id),'
+    ' dice1 INTEGER NOT NULL, dice2 INTEGER NOT NULL, dice3 INTEGER NOT NULL,'
+    ' total_score INTEGER NOT NULL, rolled_at DATETIME)',
+    'CREATE TABLE ranking (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id),'
+    ' username VARCHAR(80) NOT NULL, highest_score INTEGER NOT NULL, total_rolls INTEGER,'
+    ' last_updated DATETIME)',
+    "INSERT INTO user (id, username) VALUES (1, 'alice'), (2, 'bob')",
+    "INSERT INTO dice_roll (id, user_id, dice1, dice2, dice3, total_score, rolled_at) VALUES"
+    " (1, 1, 3, 4, 2, 9, '2026-03-01 10:00:00.000000'),"
+    " (2, 2, 6, 6, 5, 17, '2026-03-02 23:30:00.000000')",
+    "INSERT INTO ranking (id, user_id, username, highest_score, total_rolls) VALUES"
+    " (1, 1, 'alice', 9, 1), (2, 2, 'bob', 17, 1), (3, 1, 'alice', 14, 2)",
+]
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    yield engine
+    engine.dispose()
+
+
+def migrate(engine):
+    """What create_app does on startup"""
+    db.metadata.create_all(engine)
+    return run_migrations(engine)
+
+
+def index_names(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def test_empty_database_is_created_at_the_latest_version(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'new.db'}", 'TESTING': True})
+    with app.app_context():
+        assert current_version(db.engine) == LATEST_VERSION
+        assert run_migrations(db.engine) == []
+        assert {'uq_dice_roll_user_round', 'ix_dice_roll_round_rolled_at'} <= index_names(db.engine, 'dice_roll')
+        db.engine.dispose()
+
+
+def test_baseline_schema_is_upgraded(baseline_engine):
+    assert current_version(baseline_engine) == 0
+    assert migrate(baseline_engine) == [m.version for m in MIGRATIONS]
+    assert current_version(baseline_engine) == LATEST_VERSION
+
+    with baseline_engine.connect() as conn:
+        round_days = conn.execute(text('SELECT id, round_day FROM dice_roll ORDER BY id')).all()
+        rankings = conn.execute(text(
+            'SELECT id, user_id, highest_score, total_rolls FROM ranking ORDER BY id')).all()
+    assert [(id, str(day)) for id, day in round_days] == [(1, '2026-03-01'), (2, '2026-03-02')]
+    # alice's two rankings folded into her oldest row
+    assert rankings == [(1, 1, 14, 3), (2, 2, 17, 1)]
+
+    assert {'uq_dice_roll_user_round', 'ix_dice_roll_round_score', 'ix_dice_roll_rolled_at',
+            'ix_dice_roll_round_rolled_at'} <= index_names(baseline_engine, 'dice_roll')
+    ranking_indexes = index_names(baseline_engine, 'ranking')
+    assert {'ix_ranking_user_id', 'ix_ranking_score_user'} <= ranking_indexes
+    assert 'ix_ranking_highest_score' not in ranking_indexes
+    assert inspect(baseline_engine).has_table('sheets_outbox')
+
+
+def test_second_run_does_nothing(baseline_engine):
+    migrate(baseline_engine)
+    with baseline_engine.connect() as conn:
+        before = conn.execute(text('SELECT version, name, applied_at FROM schema_version ORDER BY version')).all()
+
+    assert migrate(baseline_engine) == []
+    with baseline_engine.connect() as conn:
+        after = conn.execute(text('SELECT version, name, applied_at FROM schema_version ORDER BY version')).all()
+    assert after == before
+    assert len(after) == len(MIGRATIONS)
+
+
+def test_partly_migrated_database_gets_the_rest(baseline_engine, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, 'MIGRATIONS', MIGRATIONS[:2])
+        assert migrations.run_migrations(baseline_engine) == [1, 2]
+    assert current_version(baseline_engine) == 2
+
+    assert migrate(baseline_engine) == [m.version for m in MIGRATIONS[2:]]
+    assert current_version(baseline_engine) == LATEST_VERSION
+
+
+def test_version_recorded_by_another_worker_is_skipped(baseline_engine, monkeypatch):
+    migrate(baseline_engine)
+    # A worker that checked the version just before another one recorded the last migration
+    monkeypatch.setattr(migrations, 'current_version', lambda engine: LATEST_VERSION - 1)
+    assert run_migrations(baseline_engine) == []
+    with baseline_engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM schema_version')).scalar() == len(MIGRATIONS)
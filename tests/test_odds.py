@@ -0,0 +1,107 @@
+from collections import Counter
+from fractions import Fraction
+from itertools import product
+
+import pytest
+
+from src.services import odds
+from src.services.dice_engine import parse_expression
+
+
+def brute_force(count, sides, drop_lowest=0):
+    """Exact probabilities of the kept sum, by enumerating every roll"""
+    sums = Counter(sum(sorted(roll)[drop_lowest:]) for roll in product(range(1, sides + 1), repeat=count))
+    return {total: Fraction(ways, sides ** count) for total, ways in sums.items()}
+
+
+def test_exact_2d6():
+    distribution = odds.get_distribution('2d6')
+    assert distribution.method == 'exact'
+    assert (distribution.minimum, distribution.maximum) == (2, 12)
+    assert distribution.probability(7) == pytest.approx(6 / 36)
+    assert distribution.probability(2) == pytest.approx(1 / 36)
+    assert distribution.probability(13) == 0.0
+    assert distribution.mean() == pytest.approx(7)
+
+
+@pytest.mark.parametrize('count, sides', [(3, 6), (4, 4), (2, 20), (5, 3)])
+def test_exact_matches_enumeration(count, sides):
+    distribution = odds.exact_distribution(parse_expression(f"{count}d{sides}"))
+    assert distribution.total_weight == sides ** count
+    expected = brute_force(count, sides)
+    assert {t: Fraction(w, distribution.total_weight)
+            for t, w in enumerate(distribution.weights, distribution.minimum)} == expected
+
+
+def test_modifier_shifts_the_distribution():
+    distribution = odds.get_distribution('3d6+2')
+    assert (distribution.minimum, distribution.maximum) == (5, 20)
+    assert distribution.probability(12) == pytest.approx(27 / 216)
+    below, at_most = distribution.cumulative(5)
+    assert (below, at_most) == (0, pytest.approx(1 / 216))
+
+
+def test_simulation_approximates_drop_lowest():
+    distribution = odds.get_distribution('4d6', odds.Variant(drop_lowest=1), trials=100000, seed=1)
+    assert distribution.method == 'monte_carlo'
+    assert distribution.total_weight == 100000
+    for total, probability in brute_force(4, 6, drop_lowest=1).items():
+        assert distribution.probability(total) == pytest.approx(float(probability), abs=0.005)
+
+
+def test_seeded_simulation_repeats():
+    variant = odds.Variant(reroll_below=1)
+    first = odds.simulate_distribution(parse_expression('3d6'), variant, trials=2000, seed=9)
+    second = odds.simulate_distribution(parse_expression('3d6'), variant, trials=2000, seed=9)
+    assert first == second
+    # Rerolling a 1 once lifts a d6's mean from 3.5 to 5/6 * 4 + 1/6 * 3.5
+    assert first.mean() == pytest.approx(3 * (5 / 6 * 4 + 1 / 6 * 3.5), abs=0.2)
+
+
+def test_simulation_in_the_process_pool(monkeypatch):
+    # Chunks of 500 trials: four tasks for the pool
+    monkeypatch.setattr(odds, 'CHUNK_DICE', 1000)
+    try:
+        distribution = odds.simulate_distribution(
+            parse_expression('2d6'), odds.Variant(drop_highest=1), trials=2000, seed=3)
+    finally:
+        odds.shutdown_pool()
+    assert distribution.total_weight == 2000
+    assert (distribution.minimum, distribution.maximum) == (1, 6)
+    # The lower of two d6 is 1 with probability 11/36
+    assert distribution.probability(1) == pytest.approx(11 / 36, abs=0.04)
+
+
+@pytest.mark.parametrize('expression, variant, trials', [
+    ('4d6', odds.Variant(drop_lowest=1), 0),
+    ('4d6', odds.Variant(drop_lowest=1), odds.MAX_TRIALS + 1),
+    # Within MAX_TRIALS, but over MAX_SIMULATED_DICE dice in total
+    ('20d6', odds.Variant(drop_lowest=1), odds.MAX_SIMULATED_DICE // 20 + 1),
+    ('3d6', odds.Variant(drop_lowest=3), 1000),
+    ('3d6', odds.Variant(reroll_below=6), 1000),
+    ('3d6', odds.Variant(drop_lowest=-1), 1000),
+])
+def test_simulation_limits(expression, variant, trials):
+    with pytest.raises(ValueError):
+        odds.simulate_distribution(parse_expression(expression), variant, trials=trials)
+
+
+def test_odds_route(client):
+    response = client.get('/api/odds?dice=2d6&total=7')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['method'] == 'exact'
+    assert body['probability_exact'] == pytest.approx(6 / 36)
+    assert body['probability_at_most'] == pytest.approx(21 / 36)
+    assert body['percentile'] == pytest.approx(50.0)
+
+
+@pytest.mark.parametrize('query', [
+    f"dice=4d6&drop_lowest=1&trials={odds.MAX_TRIALS + 1}",
+    f"dice=100d6&drop_lowest=1&trials={odds.MAX_TRIALS}",
+    'dice=2x6',
+])
+def test_odds_route_rejects_oversized_requests(client, query):
+    response = client.get(f"/api/odds?{query}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
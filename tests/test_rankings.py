@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import src.routes.user
+from src.models.user import Ranking, User, db
+from src.services.shared_state import SharedState
+
+# Three players tied on 12, in the order they reached it
+SCORES = [('ann', 15), ('ben', 12), ('cat', 12), ('dan', 12), ('eve', 5)]
+EXPECTED = {
+    # rank, percentile: share of the 4 others with a lower score, ties counted as half
+    'ann': (1, 100.0),
+    'ben': (2, 50.0),
+    'cat': (3, 50.0),
+    'dan': (4, 50.0),
+    'eve': (5, 0.0),
+}
+
+
+@pytest.fixture
+def rankings(app):
+    start = datetime(2026, 3, 1, 12, 0)
+    with app.app_context():
+        for i, (username, score) in enumerate(SCORES):
+            user = User(username=username)
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Ranking(user_id=user.id, username=username, highest_score=score,
+                                   total_rolls=1, last_updated=start + timedelta(minutes=i)))
+        db.session.commit()
+
+
+@pytest.fixture(params=['database', 'shared'])
+def leaderboard(request, rankings, monkeypatch):
+    """Rank lookups from the database, or from the shared leaderboard seeded from it"""
+    if request.param == 'shared':
+        monkeypatch.setattr(src.routes.user, 'shared_state', SharedState('memory://'))
+    return request.param
+
+
+@pytest.mark.parametrize('username', sorted(EXPECTED))
+def test_rank_and_percentile_with_ties(client, leaderboard, username):
+    body = client.get(f"/api/rankings/{username}").get_json()
+    assert (body['rank'], body['percentile']) == EXPECTED[username]
+    # Only shared leaderboard entries carry achieved_at
+    assert ('achieved_at' in body) == (leaderboard == 'shared')
+
+
+def test_neighbors_follow_the_tie_order(client, leaderboard):
+    body = client.get('/api/rankings/cat?neighbors=1').get_json()
+    assert [(entry['username'], entry['rank']) for entry in body['above']] == [('ben', 2)]
+    assert [(entry['username'], entry['rank']) for entry in body['below']] == [('dan', 4)]
+
+    body = client.get('/api/rankings/ann?neighbors=2').get_json()
+    assert body['above'] == []
+    assert [(entry['username'], entry['rank']) for entry in body['below']] == [('ben', 2), ('cat', 3)]
+
+
+def test_only_player_is_top(client, app):
+    with app.app_context():
+        user = User(username='solo')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Ranking(user_id=user.id, username='solo', highest_score=3, total_rolls=1))
+        db.session.commit()
+    body = client.get('/api/rankings/solo').get_json()
+    assert (body['rank'], body['percentile']) == (1, 100.0)
+
+
+def test_unranked_player(client, rankings):
+    assert client.get('/api/rankings/nobody').status_code == 404
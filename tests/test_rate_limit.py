@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from src.services.rate_limit import ConcurrencyLimiter, sheets_admission
+from src.services.shared_state import SharedState
+
+SHEETS_ROUTES = [
+    ('get', '/api/sheets/history'),
+    ('get', '/api/sheets/status'),
+    ('get', '/api/sheets/leaderboard'),
+    ('get', '/api/sheets/user/alice'),
+    ('get', '/api/sheets/export'),
+    ('get', '/api/sheets/latest'),
+    ('get', '/api/reset/confirm'),
+    ('post', '/api/reset'),
+]
+
+
+@pytest.mark.parametrize('method, path', SHEETS_ROUTES)
+def test_sheets_routes_are_shed_when_the_worker_is_full(client, monkeypatch, method, path):
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(sheets_admission, '_semaphore', full)
+
+    response = getattr(client, method)(path)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_global_cap_is_shared_by_every_worker(app):
+    state = SharedState('memory://')
+    # Two workers: each has room of its own, but one global slot between them
+    worker, other_worker = (ConcurrencyLimiter(4, max_global=1, name='sheets', state=state) for _ in range(2))
+    answers = []
+
+    @other_worker
+    def inner():
+        return 'served'
+
+    @worker
+    def outer():
+        answers.append(inner())
+        return 'served'
+
+    with app.test_request_context():
+        assert outer() == 'served'
+        assert answers[0].status_code == 503
+        # The slot was released: the other worker gets it now
+        assert inner() == 'served'
+
+
+def test_global_cap_off_without_shared_state(app):
+    limiter = ConcurrencyLimiter(4, max_global=1, state=SharedState(''))
+
+    @limiter
+    def view():
+        return 'served'
+
+    with app.test_request_context():
+        assert view() == 'served'
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from src.models.user import db
+from src.services import roll_filter as roll_filter_module
+from src.services.roll_filter import RollFilter, roll_filter
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    """Roll filter answers, as counted in /metrics"""
+    counted = []
+    monkeypatch.setattr(roll_filter_module.ROLL_FILTER_CHECKS, 'inc', lambda result: counted.append(result))
+    return counted
+
+
+def test_false_positive_for_unknown_player_asks_the_database(app, client, checks):
+    with app.app_context():
+        assert roll_filter.record('ghost')
+
+    response = client.get('/api/dice/check/ghost')
+    assert response.get_json() == {'has_rolled': False, 'roll': None}
+    assert checks == ['maybe', 'false_positive']
+
+
+def test_false_positive_for_registered_player_can_still_roll(app, client, checks):
+    assert client.post('/api/users', json={'username': 'carol'}).status_code == 201
+    with app.app_context():
+        roll_filter.record('carol')
+
+    assert client.get('/api/dice/check/carol').get_json() == {'has_rolled': False, 'roll': None}
+    assert client.post('/api/dice/roll', json={'username': 'carol'}).status_code == 201
+    assert client.get('/api/dice/check/carol').get_json()['has_rolled'] is True
+
+
+def test_roll_that_never_commits_is_only_a_false_positive(app, client, monkeypatch):
+    assert client.post('/api/users', json={'username': 'dave'}).status_code == 201
+
+    # The worker dies between journaling the roll and committing it
+    def crash():
+        raise RuntimeError('worker killed')
+    with monkeypatch.context() as patch, pytest.raises(RuntimeError):
+        patch.setattr(db.session, 'commit', crash)
+        client.post('/api/dice/roll', json={'username': 'dave'})
+
+    with app.app_context():
+        # Another worker, building its filter from the database and the journal
+        assert RollFilter().might_have_rolled('dave')
+    assert client.get('/api/dice/check/dave').get_json() == {'has_rolled': False, 'roll': None}
+
+
+def test_per_node_journal_is_not_trusted_with_a_shared_database(app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'name', 'postgresql')
+        assert RollFilter().might_have_rolled('nobody')
+
+        shared = RollFilter()
+        shared.journal.shared = True
+        assert not shared.might_have_rolled('nobody')
+
+
+@pytest.fixture
+def slow_scan(monkeypatch):
+    """Holds the database scan of a rebuild until released; the database has alice's roll"""
+    scan = threading.Event(), threading.Event()
+
+    def load_rolled_usernames(day):
+        scan[0].set()
+        assert scan[1].wait(5)
+        return iter(['alice'])
+    monkeypatch.setattr(roll_filter_module, 'load_rolled_usernames', load_rolled_usernames)
+    return scan
+
+
+def start_rebuild(app, rolls, scan):
+    def check():
+        with app.app_context():
+            rolls.might_have_rolled('alice')
+    thread = threading.Thread(target=check)
+    thread.start()
+    assert scan[0].wait(5)
+    return thread
+
+
+def test_first_build_does_not_block_other_requests(app, slow_scan):
+    started, release = slow_scan
+    rolls = RollFilter()
+    with app.app_context():
+        builder = start_rebuild(app, rolls, slow_scan)
+        # No filter yet: a maybe, straight away, and rolls are still journaled
+        assert rolls.might_have_rolled('bob')
+        assert rolls.record('bob')
+        release.set()
+        builder.join(5)
+
+        assert rolls.might_have_rolled('alice')
+        assert rolls.might_have_rolled('bob')
+        assert not rolls.might_have_rolled('nobody-at-all')
+
+
+def test_old_filter_serves_while_it_is_rebuilt(app, slow_scan):
+    started, release = slow_scan
+    rolls = RollFilter(max_age=300)
+    with app.app_context():
+        release.set()
+        assert not rolls.might_have_rolled('nobody-at-all')
+        started.clear()
+        release.clear()
+
+        old = rolls._filter
+        rolls._built_at -= 301
+        builder = start_rebuild(app, rolls, slow_scan)
+        assert not rolls.might_have_rolled('nobody-at-all')
+        release.set()
+        builder.join(5)
+        assert rolls._filter is not old
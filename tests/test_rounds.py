@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+
+import src.models.user
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Sets the UTC time the round is taken from"""
+    now = {}
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now['utc']
+
+    monkeypatch.setattr(src.models.user, 'datetime', FrozenDatetime)
+
+    def set_time(value):
+        now['utc'] = datetime.fromisoformat(value)
+    return set_time
+
+
+def roll(client, username):
+    return client.post('/api/dice/roll', json={'username': username})
+
+
+def test_round_changes_at_utc_midnight(client, clock):
+    clock('2026-03-01T23:59:59')
+    first = roll(client, 'alice')
+    assert first.status_code == 201
+    assert first.get_json()['roll']['round_day'] == '2026-03-01'
+    assert roll(client, 'alice').status_code == 400
+
+    clock('2026-03-02T00:00:00')
+    second = roll(client, 'alice')
+    assert second.status_code == 201
+    assert second.get_json()['roll']['round_day'] == '2026-03-02'
+
+    rounds = client.get('/api/rounds').get_json()
+    assert [(r['round_day'], r['rolls'], r['is_current']) for r in rounds] == [
+        ('2026-03-02', 1, True),
+        ('2026-03-01', 1, False),
+    ]
+
+
+def test_check_follows_the_current_round(client, clock):
+    clock('2026-03-01T12:00:00')
+    assert roll(client, 'bob').status_code == 201
+    assert client.get('/api/dice/check/bob').get_json()['has_rolled'] is True
+
+    clock('2026-03-02T00:00:01')
+    assert client.get('/api/dice/check/bob').get_json() == {'has_rolled': False, 'roll': None}
+    rankings = client.get('/api/rankings?round=2026-03-01').get_json()
+    assert [entry['username'] for entry in rankings] == ['bob']
+    assert client.get('/api/rankings?round=current').get_json() == []
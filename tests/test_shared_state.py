@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytest
+
+from src.services.shared_state import SharedState
+
+ROWS = [(f"player{i}", i % 18 + 3, 1, datetime(2026, 3, 1, 12, 0)) for i in range(2500)]
+
+
+@pytest.fixture
+def leaderboard():
+    return SharedState('memory://').leaderboard
+
+
+def test_seed_loads_every_row_once(leaderboard):
+    calls = []
+
+    def load_rows():
+        calls.append(1)
+        return iter(ROWS)
+
+    leaderboard.seed(load_rows)
+    leaderboard.seed(load_rows)
+    assert len(calls) == 1
+    assert leaderboard.backend.execute('ZCARD', leaderboard.scores_key) == len(ROWS)
+    assert leaderboard.backend.execute('EXISTS', leaderboard.seeded_key) == 1
+
+
+def test_failed_seed_is_retried(leaderboard):
+    def failing_rows():
+        # Past the first pipeline flush, then the database goes away
+        yield from ROWS[:1500]
+        raise ConnectionError('database went away')
+
+    with pytest.raises(ConnectionError):
+        leaderboard.seed(failing_rows)
+    assert leaderboard.backend.execute('EXISTS', leaderboard.seeded_key) == 0
+
+    # The next request seeds again, from the start
+    leaderboard.seed(lambda: iter(ROWS))
+    assert leaderboard.backend.execute('ZCARD', leaderboard.scores_key) == len(ROWS)
+    assert leaderboard.backend.execute('EXISTS', leaderboard.seeded_key) == 1
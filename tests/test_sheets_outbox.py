@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.user import SheetsOutbox, db
+from src.services.google_sheets import sheets_service
+from src.services.sheets_outbox import outbox_dispatcher
+
+
+def roll(client, username):
+    response = client.post('/api/dice/roll', json={'username': username})
+    assert response.status_code == 201
+
+
+def outbox_rows(app):
+    with app.app_context():
+        return [(row.delivered_at, row.attempts, row.last_error, row.next_attempt_at)
+                for row in SheetsOutbox.query.order_by(SheetsOutbox.id)]
+
+
+@pytest.fixture
+def sheets_online(monkeypatch):
+    """Sheets configured; the test replaces append_rows"""
+    monkeypatch.setattr(sheets_service, '_service', object())
+    monkeypatch.setattr(sheets_service, '_use_fallback', False)
+
+
+def test_rows_stay_pending_when_append_fails(app, client, sheets_online, monkeypatch):
+    def fail(rows):
+        raise TimeoutError('The read operation timed out')
+    monkeypatch.setattr(sheets_service, 'append_rows', fail)
+
+    roll(client, 'alice')
+    roll(client, 'bob')
+    assert outbox_dispatcher.dispatch_once() == 2
+
+    rows = outbox_rows(app)
+    assert all(delivered_at is None for delivered_at, _, _, _ in rows)
+    assert all(attempts == 1 and 'timed out' in error for _, attempts, error, _ in rows)
+    # Backed off: not due again straight away
+    assert all(next_attempt > datetime.utcnow() for _, _, _, next_attempt in rows)
+    assert outbox_dispatcher.dispatch_once() == 0
+
+
+def test_delivered_rows_are_marked(app, client, sheets_online, monkeypatch):
+    sent = []
+    monkeypatch.setattr(sheets_service, 'append_rows', lambda rows: sent.extend(rows) or len(rows))
+
+    roll(client, 'alice')
+    assert outbox_dispatcher.dispatch_once() == 1
+    assert [row[1] for row in sent] == ['alice']
+    assert all(delivered_at is not None for delivered_at, _, _, _ in outbox_rows(app))
+
+
+def test_rows_wait_for_sheets_in_fallback_mode(app, client, monkeypatch):
+    roll(client, 'alice')
+    outbox_dispatcher.dispatch_once()
+
+    # Copied locally once, but not counted as delivered
+    rows = outbox_rows(app)
+    assert [(delivered_at, attempts) for delivered_at, attempts, _, _ in rows] == [(None, 1)]
+    assert len(sheets_service.load_data()) == 1
+    assert outbox_dispatcher.dispatch_once() == 0
+
+    # Credentials restored: the pending roll is sent
+    sent = []
+    monkeypatch.setattr(sheets_service, '_service', object())
+    monkeypatch.setattr(sheets_service, '_use_fallback', False)
+    monkeypatch.setattr(sheets_service, 'append_rows', lambda rows: sent.extend(rows) or len(rows))
+    assert outbox_dispatcher.dispatch_once() == 1
+    assert [row[1] for row in sent] == ['alice']
+    assert all(delivered_at is not None for delivered_at, _, _, _ in outbox_rows(app))
+    assert len(sheets_service.load_data()) == 1
+
+
+def test_fallback_mode_drops_rows_past_retention(app, client, monkeypatch):
+    roll(client, 'alice')
+    roll(client, 'bob')
+    outbox_dispatcher.dispatch_once()
+    with app.app_context():
+        # alice has waited just over a week for credentials
+        row = SheetsOutbox.query.filter_by(username='alice').one()
+        row.created_at = datetime.utcnow() - outbox_dispatcher.fallback_retention - timedelta(minutes=1)
+        db.session.commit()
+
+    monkeypatch.setattr(outbox_dispatcher, '_last_cleanup', 0.0)
+    assert outbox_dispatcher.dispatch_once() == 0
+    with app.app_context():
+        assert [row.username for row in SheetsOutbox.query] == ['bob']
+    # The local copy is what remains of it
+    assert sorted(record['username'] for record in sheets_service.load_data()) == ['alice', 'bob']
+
+
+def test_pending_rows_are_kept_while_sheets_is_online(app, client, sheets_online, monkeypatch):
+    def fail(rows):
+        raise TimeoutError('The read operation timed out')
+    monkeypatch.setattr(sheets_service, 'append_rows', fail)
+    roll(client, 'alice')
+    outbox_dispatcher.dispatch_once()
+    with app.app_context():
+        row = SheetsOutbox.query.one()
+        row.created_at = datetime.utcnow() - outbox_dispatcher.fallback_retention - timedelta(minutes=1)
+        db.session.commit()
+
+    # Failing appends are retried, however old the row
+    monkeypatch.setattr(outbox_dispatcher, '_last_cleanup', 0.0)
+    assert outbox_dispatcher.dispatch_once() == 0
+    assert len(outbox_rows(app)) == 1
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.resp = SimpleNamespace(status=status)
+
+
+def fake_sheets_api(errors):
+    """A Sheets client whose append calls raise the given errors in turn, then succeed"""
+    ranges = []
+
+    def append(range, body, **kwargs):
+        ranges.append(range)
+
+        def execute():
+            if errors:
+                raise errors.pop(0)
+            return {'updates': {'updatedRows': len(body['values'])}}
+        return SimpleNamespace(execute=execute)
+
+    values = SimpleNamespace(append=append)
+    return SimpleNamespace(spreadsheets=lambda: SimpleNamespace(values=lambda: values)), ranges
+
+
+def test_append_rows_tries_next_range_only_after_a_range_error(monkeypatch):
+    service, ranges = fake_sheets_api([FakeHttpError(400, 'Unable to parse range: A:H')])
+    monkeypatch.setattr(sheets_service, '_initialized', True)
+    monkeypatch.setattr(sheets_service, '_service', service)
+    monkeypatch.setattr(sheets_service, '_use_fallback', False)
+
+    assert sheets_service.append_rows([['row']]) == 1
+    assert ranges == ['A:H', 'Sheet1!A:H']
+
+
+def test_append_rows_does_not_repeat_after_a_timeout(monkeypatch):
+    service, ranges = fake_sheets_api([TimeoutError('The read operation timed out')])
+    monkeypatch.setattr(sheets_service, '_initialized', True)
+    monkeypatch.setattr(sheets_service, '_service', service)
+    monkeypatch.setattr(sheets_service, '_use_fallback', False)
+
+    # The first append may have reached the sheet; a second one would duplicate it
+    with pytest.raises(TimeoutError):
+        sheets_service.append_rows([['row']])
+    assert ranges == ['A:H']
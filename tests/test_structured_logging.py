@@ -0,0 +1,90 @@
+import json
+import logging
+import queue
+import threading
+
+import pytest
+from flask import Flask
+
+from src.services import lifecycle, structured_logging
+from src.services.structured_logging import (JsonFormatter, NonBlockingQueueHandler, configure_logging,
+                                             init_request_logging, stop_logging)
+
+
+class CaptureHandler(logging.Handler):
+    """Output handler that keeps each formatted line and the thread that wrote it"""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append((threading.current_thread(), json.loads(self.format(record))))
+
+
+@pytest.fixture
+def output(monkeypatch):
+    """configure_logging() on a fresh pipeline, writing to a CaptureHandler"""
+    handler = CaptureHandler()
+    root = logging.getLogger()
+    saved_level = root.level
+    monkeypatch.setattr(structured_logging, '_pipeline', structured_logging._Pipeline())
+    monkeypatch.setattr(structured_logging, '_build_output_handler', lambda: handler)
+    monkeypatch.setattr(lifecycle, '_fork_hooks', [])
+    monkeypatch.setattr(lifecycle, '_shutdown_hooks', [])
+    monkeypatch.setenv('LOG_LEVEL', 'INFO')
+    configure_logging()
+    yield handler
+    stop_logging()
+    # stop_logging() moved the output handler onto the root logger
+    root.removeHandler(handler)
+    root.setLevel(saved_level)
+
+
+def test_records_go_through_the_queue(output):
+    root = logging.getLogger()
+    assert isinstance(structured_logging._pipeline.queue_handler, NonBlockingQueueHandler)
+    assert structured_logging._pipeline.queue_handler in root.handlers
+    # Only the listener thread writes to the output
+    assert output not in root.handlers
+
+    items = ['first']
+    logging.getLogger('game').info("items %s", items)
+    # The message is resolved when logged, not when the listener gets to it
+    items.append('second')
+    logging.getLogger('game').debug("below LOG_LEVEL")
+    stop_logging()
+
+    assert len(output.lines) == 1
+    thread, entry = output.lines[0]
+    assert thread is not threading.current_thread()
+    assert (entry['level'], entry['logger'], entry['message']) == ('INFO', 'game', "items ['first']")
+
+
+def test_records_carry_the_request(output):
+    app = Flask(__name__)
+    init_request_logging(app)
+
+    @app.route('/ping')
+    def ping():
+        logging.getLogger('game').warning("pinged")
+        return 'pong'
+
+    response = app.test_client().get('/ping', headers={'X-Request-ID': 'abc123'})
+    assert response.headers['X-Request-ID'] == 'abc123'
+    stop_logging()
+
+    entries = {entry['logger']: entry for _, entry in output.lines}
+    assert entries['game']['request_id'] == 'abc123'
+    assert (entries['game']['method'], entries['game']['path']) == ('GET', '/ping')
+    assert entries['access']['status'] == 200
+    assert entries['access']['request_id'] == 'abc123'
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(logging.makeLogRecord({'msg': f"record {i}", 'levelno': logging.INFO}))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
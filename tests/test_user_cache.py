@@ -0,0 +1,32 @@
+from src.services.user_cache import UserIdCache
+
+
+def test_generation_never_repeats(tmp_path):
+    cache = UserIdCache(generation_file=str(tmp_path / 'user_cache.gen'))
+    seen = [cache.generation()]
+    for new_epoch in (False, False, True, False, True, True, False):
+        cache._bump(new_epoch)
+        seen.append(cache.generation())
+    assert len(set(seen)) == len(seen)
+
+
+def test_reset_in_another_worker_drops_cached_ids(tmp_path):
+    path = str(tmp_path / 'user_cache.gen')
+    worker, other_worker = UserIdCache(generation_file=path), UserIdCache(generation_file=path)
+    ids = {'alice': 1}
+
+    assert worker.lookup('alice', ids.get) == 1
+    other_worker.invalidate()
+    ids['alice'] = 7
+    assert worker.lookup('alice', ids.get) == 7
+
+
+def test_created_user_replaces_cached_unknown(tmp_path):
+    path = str(tmp_path / 'user_cache.gen')
+    worker, other_worker = UserIdCache(generation_file=path), UserIdCache(generation_file=path)
+    ids = {}
+
+    assert worker.lookup('bob', ids.get) is None
+    ids['bob'] = 3
+    other_worker.user_created()
+    assert worker.lookup('bob', ids.get) == 3
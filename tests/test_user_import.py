@@ -0,0 +1,50 @@
+import pytest
+
+from src.services.user_import import detect_format
+
+CSV = b"username\nalice\nbob\nalice\n"
+
+
+def bulk(client, **headers):
+    return client.post('/api/users/bulk', data=CSV, content_type='text/csv', headers=headers)
+
+
+def test_bulk_import_needs_the_admin_token(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    monkeypatch.setenv('PROFILE_SECRET', 'profiler-secret')
+    assert bulk(client).status_code == 403
+
+    # Unset: nobody may import, whatever they send
+    assert bulk(client, **{'X-Admin-Token': 'anything'}).status_code == 403
+
+    monkeypatch.setenv('ADMIN_TOKEN', 'admin-secret')
+    assert bulk(client, **{'X-Admin-Token': 'wrong'}).status_code == 403
+    # The profiler's token does not unlock it
+    assert bulk(client, **{'X-Profile-Token': 'profiler-secret'}).status_code == 403
+    assert bulk(client, **{'X-Admin-Token': 'profiler-secret'}).status_code == 403
+
+
+def test_bulk_import_with_the_admin_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'admin-secret')
+
+    response = bulk(client, **{'X-Admin-Token': 'admin-secret'})
+    assert response.status_code == 200
+    assert response.get_json() == {'created': 2, 'skipped': 1, 'invalid': 0}
+    assert bulk(client, **{'X-Admin-Token': 'admin-secret'}).get_json() == {'created': 0, 'skipped': 3, 'invalid': 0}
+
+
+@pytest.mark.parametrize('name, fmt', [
+    ('players.csv', 'csv'),
+    ('players_csv.jsonl', 'jsonl'),
+    ('csv-export.ndjson', 'jsonl'),
+    ('jsonl_dump.CSV', 'csv'),
+    ('text/csv', 'csv'),
+    ('text/csv; charset=utf-8', 'csv'),
+    ('application/x-ndjson', 'jsonl'),
+    ('application/jsonl', 'jsonl'),
+    ('players.txt', None),
+    ('application/json', None),
+    (None, None),
+])
+def test_detect_format(name, fmt):
+    assert detect_format(name) == fmt